@@ -1,5 +1,6 @@
 # For open source Pymol installations, please refer to https://github.com/schrodinger/pymol-open-source
 
+import numpy as np
 from pymol import cmd
 
 # Define custom pLDDT colors (RGB in 0–1 range)
@@ -8,25 +9,57 @@ cmd.set_color("plddt_h",  [0.416, 0.796, 0.945])  # High (90 >= x > 70)
 cmd.set_color("plddt_l",  [0.996, 0.851, 0.212])  # Low  (70 >= x > 50)
 cmd.set_color("plddt_vl", [0.992, 0.490, 0.302])  # Very low (<=50)
 
+# bin k of np.searchsorted(PLDDT_EDGES, b, side="left") -> color name
+# side="left" keeps the upper edge inclusive: b<=50 -> 0, 50<b<=70 -> 1, 70<b<=90 -> 2, b>90 -> 3
+# (same as np.digitize(b, PLDDT_EDGES, right=True), without digitize's monotonicity checks)
+# b is NOT quantized to uint8 first: truncation would move e.g. 50.4 from "low" into "very low"
+PLDDT_EDGES = np.array([50.0, 70.0, 90.0], dtype=np.float32)
+PLDDT_COLORS = ["plddt_vl", "plddt_l", "plddt_h", "plddt_vh"]
+
 def af3_color_plddt(selection="all"):
     """
     Color AlphaFold(3) structures by pLDDT (stored in B-factor).
     Usage: af3_color_plddt sele
+
+    Notes:
+    - 1, B-factors are read once with cmd.iterate and binned with np.searchsorted,
+    instead of letting PyMOL re-parse and re-scan "b>90"-style selections four times.
+    - 2, atom index is only unique within one object, so every color call is built per object ("model"),
+    with runs of consecutive indices written as "a-b" ranges.
     """
 
-    # Use 'between a, b' (inclusive) to avoid '<=' parser issues
-    cmd.color("plddt_vh", f"({selection}) and b>90")
-    cmd.color("plddt_h",  f"({selection}) and (b>70 and not b>90)")  # ≈ 70<b<=90
-    cmd.color("plddt_l",  f"({selection}) and (b>50 and not b>70)")  # ≈ 50<b<=70
-    cmd.color("plddt_vl", f"({selection}) and not b>50")             # ≈ b<=50
+    # one pass over the atoms, filling 3 columns directly: object name, atom index, b-factor
+    models, indices, bfactors = [], [], []
+    cmd.iterate(
+        selection,
+        "models_append(model); indices_append(index); bfactors_append(b)",
+        space={"models_append": models.append, "indices_append": indices.append, "bfactors_append": bfactors.append},
+    )
+    if not bfactors:
+        return
+
+    models = np.asarray(models)
+    indices = np.asarray(indices, dtype=np.int64)
+    b = np.asarray(bfactors, dtype=np.float32)
+
+    # 0..3 per atom, see PLDDT_EDGES above
+    bins = np.searchsorted(PLDDT_EDGES, b, side="left")
 
-    '''
-    cmd.color("plddt_vh", f"({selection}) and b > 90")
-    cmd.color("plddt_h",  f"({selection}) and b <= 90 and b > 70")
-    cmd.color("plddt_l",  f"({selection}) and b <= 70 and b > 50")
-    cmd.color("plddt_vl", f"({selection}) and b <= 50")
-    '''
+    for model in np.unique(models):
+        in_model = models == model
+        for k, color in enumerate(PLDDT_COLORS):
+            idx = indices[in_model & (bins == k)]
+            if idx.size == 0:
+                continue
+            # consecutive indices collapsed into "a-b" ranges: pLDDT bins come in residue-long runs, so the selection
+            # string (and PyMOL's parse of it) is a few tokens per run instead of one per atom
+            idx = np.sort(idx)
+            breaks = np.flatnonzero(np.diff(idx) != 1) + 1
+            starts = idx[np.r_[0, breaks]].tolist()
+            ends = idx[np.r_[breaks - 1, idx.size - 1]].tolist()
+            idx_str = "+".join(str(s) if s == e else f"{s}-{e}" for s, e in zip(starts, ends))
+            cmd.color(color, f"model {model} and index {idx_str}")
 
 # register PyMOL command
 cmd.extend("af3_color_plddt", af3_color_plddt)
-cmd.auto_arg[0]["af3_color_plddt"] = [cmd.object_sc, "object", ""]
\ No newline at end of file
+cmd.auto_arg[0]["af3_color_plddt"] = [cmd.object_sc, "object", ""]
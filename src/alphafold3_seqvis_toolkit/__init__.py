@@ -1,4 +1,18 @@
-from .modules import confidence_metrics_plot, contact_map_comparison_monomer, contact_map_comparison_multimer, contact_map_visualization_with_track, contact_map_visualization_without_track
+# submodules and public functions are resolved lazily (PEP 562), see modules/__init__.py
+import importlib
+
+_SUBMODULES = ("confidence_metrics_plot", "contact_map_comparison_monomer", "contact_map_comparison_multimer", "contact_map_visualization_with_track", "contact_map_visualization_without_track")
 
 __all__ = ["contact_map_diff_monomer", "contact_map_diff_multimer", "plot_local_confidence", "plot_global_confidence", "contact_map_vis_with_track", "contact_map_vis_without_track"]
-__version__ = "0.2.0"
\ No newline at end of file
+__version__ = "0.2.0"
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        value = importlib.import_module(f".modules.{name}", __name__)
+    elif name in __all__:
+        value = getattr(importlib.import_module(".modules", __name__), name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
@@ -0,0 +1,45 @@
+# entry point of the `af3-vis` command (and of `python -m alphafold3_seqvis_toolkit`)
+# *** Fast path for help/version ***
+# -1. importing typer (+ rich, click) and building the rich help panels takes ~100 ms, just to print the command list
+# -2. so the top-level `af3-vis`, `af3-vis -h/--help` and `af3-vis --version` are answered here with plain text,
+# everything else (including `af3-vis <command> --help`) goes to the typer app in cli.py
+import sys
+
+# keep in sync with the commands registered in cli.py (checked by _check_static_help() there, every time cli.py is imported)
+_STATIC_HELP = """\
+Usage: af3-vis [OPTIONS] COMMAND [ARGS]...
+
+  AlphaFold3 SeqVis Toolkit
+
+Options:
+  --version             Show the version and exit.
+  --install-completion  Install completion for the current shell.
+  --show-completion     Show completion for the current shell, to copy it or customize the installation.
+  -h, --help            Show this message and exit.
+
+Commands:
+  confidence        Plot global (ipTM/pTM etc.) and/or local (PAE/contact/atom pLDDT) confidence metrics.
+  contact-map-diff  Compare contact maps between two AlphaFold3/General mmCIF structures (for the same
+                    molecule with an identical sequence), and plot the distance/diff matrices.
+                    Supports both monomer and multimer modes.
+  contact-map-vis   Visualize contact map from an AlphaFold3 mmCIF structure or a general mmCIF structure.
+                    Supports 'no-track' (simple) and 'track' (custom annotation) modes.
+
+Run 'af3-vis COMMAND --help' for the options of a command.
+"""
+
+def main():
+    argv = sys.argv[1:]
+    if not argv or argv == ["-h"] or argv == ["--help"]:
+        sys.stdout.write(_STATIC_HELP)
+        return
+    if argv == ["--version"]:
+        from alphafold3_seqvis_toolkit import __version__
+        print(__version__)
+        return
+
+    from alphafold3_seqvis_toolkit.cli import app
+    app(prog_name="af3-vis")
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,207 @@
 import typer # For building CLI applications, command-line interfaces
 from typing import List, Optional, Dict, Any
 import os
-from alphafold3_seqvis_toolkit.modules.confidence_metrics_plot import plot_local_confidence, plot_global_confidence
-from alphafold3_seqvis_toolkit.modules.contact_map_comparison_monomer import contact_map_diff_monomer
-from alphafold3_seqvis_toolkit.modules.contact_map_comparison_multimer import contact_map_diff_multimer
-from alphafold3_seqvis_toolkit.modules.contact_map_visualization_with_track import contact_map_vis_with_track
-from alphafold3_seqvis_toolkit.modules.contact_map_visualization_without_track import contact_map_vis_without_track
+import re
+import importlib
+import inspect
+from functools import lru_cache
+# NOTE: the plotting modules (matplotlib, numpy, BioPython, pandas ...) are imported inside each command below,
+# so that `af3-vis --help` or a wrong subcommand does not pay for importing them
 
-app = typer.Typer(help="AlphaFold3 SeqVis Toolkit", no_args_is_help=True)
+# -h is accepted next to --help on every command, like the plain-text fast path in __main__.py
+app = typer.Typer(help="AlphaFold3 SeqVis Toolkit", no_args_is_help=True, context_settings={"help_option_names": ["-h", "--help"]})
+
+def _use_agg_backend():
+    """
+    The CLI only writes figure files, so we select the non-interactive Agg backend before pyplot is imported,
+    this skips probing/importing GUI toolkits (Tk, Qt ...) at startup. MPLBACKEND still takes precedence if set.
+    """
+    if not os.environ.get("MPLBACKEND"):
+        import matplotlib
+        matplotlib.use("Agg")
+
+# *** Argument validation before any heavy import ***
+# -1. the helpers below only use the standard library, a typo in a flag fails immediately with a precise message
+# -2. instead of after importing matplotlib/numpy/BioPython and parsing the mmCIF files
+
+# one --region-pair: "start:end,start:end" (or "start-end,start-end"), each side optionally prefixed by "Chain:"
+# compiled once when cli.py is imported, then reused for every --region-pair
+_REGION_PAIR_RE = re.compile(
+    r"^\s*(?:(?P<ca>[A-Za-z0-9]+)\s*:)?\s*(?P<s1>\d+)\s*[:\-]\s*(?P<e1>\d+)\s*,"
+    r"\s*(?:(?P<cb>[A-Za-z0-9]+)\s*:)?\s*(?P<s2>\d+)\s*[:\-]\s*(?P<e2>\d+)\s*$"
+)
+
+def _parse_region_pair(pair: str) -> Optional[tuple]:
+    """
+    Split one --region-pair string into (chain_1, start_1, end_1, chain_2, start_2, end_2),
+    chains are None when not given. Returns None if the string does not match _REGION_PAIR_RE.
+    """
+    m = _REGION_PAIR_RE.match(pair)
+    if m is None:
+        return None
+    return (m["ca"], int(m["s1"]), int(m["e1"]), m["cb"], int(m["s2"]), int(m["e2"]))
+
+# single-option checks run as typer callbacks, click calls them while parsing the command line,
+# so a wrong value is reported (as "Invalid value for '--mode'") before the command body runs
+def _choice_cb(*choices: str):
+    """
+    Callback factory: the option value must be one of choices.
+    """
+    def _cb(value: str) -> str:
+        if value not in choices:
+            raise typer.BadParameter(f"must be one of {', '.join(repr(c) for c in choices)}, got {value!r}.")
+        return value
+    return _cb
+
+def _int_range_cb(low: int, high: int):
+    """
+    Callback factory: the option value must be an integer in [low, high].
+    """
+    def _cb(value: int) -> int:
+        if not low <= value <= high:
+            raise typer.BadParameter(f"must be between {low} and {high}, got {value}.")
+        return value
+    return _cb
+
+def _positive_int_cb(value: int) -> int:
+    if value <= 0:
+        raise typer.BadParameter(f"must be a positive integer, got {value}.")
+    return value
+
+def _optional_positive_int_cb(value: Optional[int]) -> Optional[int]:
+    return value if value is None else _positive_int_cb(value)
+
+def _optional_positive_float_cb(value: Optional[float]) -> Optional[float]:
+    if value is not None and not value > 0:
+        raise typer.BadParameter(f"must be a positive number, got {value}.")
+    return value
+
+def _input_file_cb(value: Optional[str]) -> Optional[str]:
+    """
+    Input files are checked (and '~' expanded) once here, a wrong path fails at parse time
+    instead of after the imports, inside the parser, with a long traceback.
+    Paths stay str, the modules derive job names and formats (.bcif, .gz) from them with string operations.
+    """
+    if value is None:
+        return None
+    path = os.path.expanduser(value)
+    if not os.path.isfile(path):
+        raise typer.BadParameter(f"file '{value}' does not exist.")
+    if not os.access(path, os.R_OK):
+        raise typer.BadParameter(f"file '{value}' is not readable.")
+    return path
+
+def _region_pair_cb(value: Optional[List[str]]) -> Optional[List[str]]:
+    for pair in value or []:
+        parsed = _parse_region_pair(pair)
+        if parsed is None:
+            raise typer.BadParameter(f"'{pair}', expected 'start:end,start:end' (or 'Chain:start:end,Chain:start:end').")
+        _, s1, e1, _, s2, e2 = parsed
+        if e1 < s1 or e2 < s2:
+            raise typer.BadParameter(f"'{pair}', end < start.")
+    return value
+
+def _validate_confidence_args(mode: str, global_json: Optional[str], full_json: Optional[str]):
+    """
+    Check the --mode / input file combination of `af3-vis confidence`, raise typer.Exit on error.
+    (the value of --mode itself is checked by its callback)
+    """
+    if mode == "all" and not global_json and not full_json:
+        raise typer.Exit("Error: In 'all' mode, need at least one of --global-json or --full-json.")
+    if mode == "global" and not global_json:
+        raise typer.Exit("Error: --global-json is required when mode is 'global'.")
+    if mode == "local" and not full_json:
+        raise typer.Exit("Error: --full-json is required when mode is 'local'.")
+
+def _validate_diff_args(mode: str, chain_a: str, chain_b: str):
+    """
+    Check the chains of `af3-vis contact-map-diff` against each other and the mode, raise typer.Exit on error.
+    Returns the chain ids of --chain-a and --chain-b split once, as tuples.
+    (--mode and every --region-pair are checked by their callbacks)
+    """
+    chains_a = tuple(c.strip() for c in chain_a.split(","))
+    chains_b = tuple(c.strip() for c in chain_b.split(","))
+    n_a, n_b = len(chains_a), len(chains_b)
+    if n_a != n_b:
+        raise typer.Exit(f"Error: --chain-a and --chain-b must have the same number of chains, got {n_a} vs {n_b}.")
+    if mode == "monomer" and n_a != 1:
+        raise typer.Exit("Error: monomer mode compares a single chain, use --mode multimer for several chains.")
+    return chains_a, chains_b
+
+# output directories already created/checked by this process, a CLI function called in a loop (scripts, typer.testing)
+# over many inputs with the same output directory skips the repeated mkdir/stat syscalls
+_CREATED_DIRS = set()
+
+def _ensure_dir(path: str):
+    """
+    os.makedirs(path, exist_ok=True), once per path and process.
+    """
+    if path in _CREATED_DIRS:
+        return
+    os.makedirs(path, exist_ok=True)
+    _CREATED_DIRS.add(path)
+
+# *** mode -> plotting function registry of the contact map commands ***
+# -1. (module, function) names only, the module is imported on first use (see _run_mode)
+# -2. each command builds ONE kwargs dict, _run_mode passes every function only the parameters it declares
+# (e.g. tick_step is not a parameter of contact_map_diff_monomer, track_bed_file only of contact_map_vis_with_track)
+_DIFF_MODES = {
+    "monomer": ("contact_map_comparison_monomer", "contact_map_diff_monomer"),
+    "multimer": ("contact_map_comparison_multimer", "contact_map_diff_multimer"),
+}
+_VIS_MODES = {
+    "track": ("contact_map_visualization_with_track", "contact_map_vis_with_track"),
+    "no-track": ("contact_map_visualization_without_track", "contact_map_vis_without_track"),
+}
+
+@lru_cache(maxsize=None)
+def _accepted_params(fn) -> frozenset:
+    return frozenset(inspect.signature(fn).parameters)
+
+def _run_mode(registry: Dict[str, tuple], mode: str, kwargs: Dict[str, Any]):
+    """
+    Import the function registered for mode and call it with the subset of kwargs it accepts.
+    """
+    module_name, func_name = registry[mode]
+    fn = getattr(importlib.import_module(f"alphafold3_seqvis_toolkit.modules.{module_name}"), func_name)
+    accepted = _accepted_params(fn)
+    return fn(**{k: v for k, v in kwargs.items() if k in accepted})
+
+def _status(message: str):
+    """
+    Transient spinner on stderr (rich, installed with typer) for the steps that can take seconds on large complexes,
+    so that the CLI does not look hung. It is cleared when the step ends and does nothing visible if stderr is not a terminal.
+    """
+    from rich.console import Console
+    return Console(stderr=True).status(message)
+
+def _version_cb(value: bool) -> None:
+    """
+    Eager --version: printed (and exit) before the command line is checked further, as in __main__.py.
+    """
+    if value:
+        from alphafold3_seqvis_toolkit import __version__
+        typer.echo(__version__)
+        raise typer.Exit()
+
+@app.callback()
+def _main(
+    version: bool = typer.Option(False, "--version", help="Show the version and exit.", callback=_version_cb, is_eager=True),
+):
+    pass
 
 @app.command(
     "confidence",
     no_args_is_help=True
 )
 def confidence_cmd(
-    global_json: Optional[str] = typer.Option(None, "--global-json", help="fold_{YOUR-JOB-NAME}_summary_confidences_{i}.json (Required for global/all mode)", rich_help_panel="Input"),
-    full_json: Optional[str] = typer.Option(None, "--full-json", help="fold_{YOUR-JOB-NAME}_full_data_{i}.json (Required for local/all mode)", rich_help_panel="Input"),
+    global_json: Optional[str] = typer.Option(None, "--global-json", help="fold_{YOUR-JOB-NAME}_summary_confidences_{i}.json (Required for global/all mode)", rich_help_panel="Input", callback=_input_file_cb),
+    full_json: Optional[str] = typer.Option(None, "--full-json", help="fold_{YOUR-JOB-NAME}_full_data_{i}.json (Required for local/all mode)", rich_help_panel="Input", callback=_input_file_cb),
     output_path: str = typer.Option(".", "--output-path", "-o", help="Directory for outputs, default is current directory", rich_help_panel="Output"),
-    mode: str = typer.Option("all", "--mode", "-m", help="Analysis mode: 'all' (default), 'global', or 'local'.", rich_help_panel="Mode"),
+    mode: str = typer.Option("all", "--mode", "-m", help="Analysis mode: 'all' (default), 'global', or 'local'.", rich_help_panel="Mode", callback=_choice_cb("all", "global", "local")),
     chains: Optional[List[str]] = typer.Option(None, "--chains", "-c", help="Repeatable: chain IDs for local subset. Only used in 'local' or 'all' mode with --full-json.", rich_help_panel="Local Plot Options"),
     tick_step: int = typer.Option(100, "--tick-step", help="Residue tick step for local plots", rich_help_panel="Local Plot Options"),
+    json_backend: str = typer.Option("auto", "--json-backend", help="JSON parser: 'auto' (default, orjson if installed), 'stdlib', 'orjson' or 'simdjson'", rich_help_panel="Performance", callback=_choice_cb("auto", "stdlib", "orjson", "simdjson")),
 ):
     """
     Plot global (ipTM/pTM etc.) and/or local (PAE/contact/atom pLDDT) confidence metrics.
@@ -33,6 +215,8 @@ def confidence_cmd(
     - 2, [--chains] option is only effective for LOCAL metrics (PAE, contact probs, atom pLDDT).
     - 3, There may be NULL values in the above metrics produced by AlphaFold3, so we will convert them to NaN (these values may appear as NA when output, and this handling also applies to plotting). Therefore, if you are confused about the output, it is recommended to first check your original data.
     - 4, All residue indices in this module are 0-based logic driven.    
+    - 5, full_data JSON files of large complexes can be hundreds of MB, --json-backend orjson/simdjson parses them several times faster (optional dependencies).
+    With the default --json-backend auto, files of 200 MB or more are streamed with ijson if it is installed (pip install alphafold3-seqvis-toolkit\\[stream]): slower, but the PAE/contact matrices never exist as python lists, which keeps peak memory low.
     
     \b
     Examples:
@@ -48,30 +232,33 @@ def confidence_cmd(
     """
 
     # Basic validation
-    if mode == "all" and not global_json and not full_json:
-        raise typer.Exit("Error: In 'all' mode, need at least one of --global-json or --full-json.")
+    _validate_confidence_args(mode, global_json, full_json)
 
-    import os
-    os.makedirs(output_path, exist_ok=True)
+    _use_agg_backend()
+    from alphafold3_seqvis_toolkit.modules.confidence_metrics_plot import plot_local_confidence, plot_global_confidence
 
-    # Logic for Global
-    if mode in ["all", "global"]:
-        if global_json:
-            plot_global_confidence(confid_json_file_path=global_json, output_path=output_path)
-        elif mode == "global":
-            raise typer.Exit("Error: --global-json is required when mode is 'global'.")
+    _ensure_dir(output_path)
 
+    # one list of plot tasks instead of two independent mode checks
+    tasks = []
+    # Logic for Global
+    if mode in ("all", "global") and global_json:
+        tasks.append((plot_global_confidence, dict(confid_json_file_path=global_json, output_path=output_path, json_backend=json_backend)))
     # Logic for Local
-    if mode in ["all", "local"]:
-        if full_json:
-            plot_local_confidence(
-                full_json_file_path=full_json,
-                output_path=output_path,
-                chains=chains,
-                tick_step=tick_step,
-            )
-        elif mode == "local":
-            raise typer.Exit("Error: --full-json is required when mode is 'local'.")
+    if mode in ("all", "local") and full_json:
+        tasks.append((plot_local_confidence, dict(
+            full_json_file_path=full_json,
+            output_path=output_path,
+            chains=chains,
+            tick_step=tick_step,
+            json_backend=json_backend,
+        )))
+
+    # one after the other, like every other command: no worker process is forked once numpy/BLAS and matplotlib are loaded
+    # (a forked child can deadlock on a lock held by a BLAS/OpenMP/numba thread), and no threads either, both modules
+    # draw through pyplot's global "current figure" (plt.figure/plt.savefig/plt.close), which is not thread-safe
+    for fn, kwargs in tasks:
+        fn(**kwargs)
 
 
 @app.command(
@@ -79,21 +266,29 @@ def confidence_cmd(
     no_args_is_help=True
 )
 def contact_map_diff_cmd(
-    mmcif_a: str = typer.Option(..., "--mmcif-a", help="Path to mmCIF file A", rich_help_panel="Inputs"),
-    mmcif_b: str = typer.Option(..., "--mmcif-b", help="Path to mmCIF file B", rich_help_panel="Inputs"),
+    mmcif_a: str = typer.Option(..., "--mmcif-a", help="Path to mmCIF file A (.cif/.cif.gz, or BinaryCIF .bcif/.bcif.gz)", rich_help_panel="Inputs", callback=_input_file_cb),
+    mmcif_b: str = typer.Option(..., "--mmcif-b", help="Path to mmCIF file B (.cif/.cif.gz, or BinaryCIF .bcif/.bcif.gz)", rich_help_panel="Inputs", callback=_input_file_cb),
     chain_a: Optional[str] = typer.Option(..., "--chain-a", help="Chain ID(s) for mmCIF file A. Monomer mode: single chain (e.g. 'A'). Multimer mode: one or more chains (e.g. 'A' or 'A,B').", rich_help_panel="Inputs"),
     chain_b: Optional[str] = typer.Option(..., "--chain-b", help="Chain ID(s) for mmCIF file B. Must align with chain-a (⚠️  same number and sequence!).", rich_help_panel="Inputs"),
     region_1: Optional[str] = typer.Option(None, "--region-1", help="(Legacy) Select a region to focus on/compare (highlighted with a green box). In multimer mode, supports 'Chain:Start:End'.", rich_help_panel="Legacy"),
     region_2: Optional[str] = typer.Option(None, "--region-2", help="(Legacy) Select a second region to compare against region-1.", rich_help_panel="Legacy"),
-    region_pair: List[str] = typer.Option(None, "--region-pair", help="Repeatable region pair(s) selected to focus on/compare (highlighted with green boxes): 'Start:End,Start:End' format like 'a:b,c:d' or 'a-b,c-d' for monomer mode, Chains-specified 'Chain:Start:End' format like 'A:a:b,B:c:d' or 'A:a-b,B:c-d' for multimer mode. Use multiple --region-pair to add more.", rich_help_panel="Regions"),
+    region_pair: List[str] = typer.Option(None, "--region-pair", help="Repeatable region pair(s) selected to focus on/compare (highlighted with green boxes): 'Start:End,Start:End' format like 'a:b,c:d' or 'a-b,c-d' for monomer mode, Chains-specified 'Chain:Start:End' format like 'A:a:b,B:c:d' or 'A:a-b,B:c-d' for multimer mode. Use multiple --region-pair to add more.", rich_help_panel="Regions", callback=_region_pair_cb),
     vmax: Optional[float] = typer.Option(None, help="vmax for distance heatmap", rich_help_panel="Color scaling"),
     vmax_percentile: float = typer.Option(95.0, help="Percentile used if vmax is not set", rich_help_panel="Color scaling"),
     vdiff: Optional[float] = typer.Option(None, help="Max abs value for diff heatmap (0-centered)", rich_help_panel="Color scaling"),
     vdiff_percentile: float = typer.Option(95.0, help="Percentile used if vdiff is not set", rich_help_panel="Color scaling"),
+    percentile_sample: Optional[int] = typer.Option(None, "--percentile-sample", help="Estimate the vmax/vdiff percentiles from this many randomly drawn values per map (e.g. 65536) instead of all N*N values, default is exact", rich_help_panel="Color scaling", callback=_optional_positive_int_cb),
     include_nonstandard_residue: bool = typer.Option(False, "--include-nonstandard/--no-include-nonstandard", help="Include non-standard amino acid residues"),
     out_path: Optional[str] = typer.Option(".", "--out-path", help="Directory to save figure files (png/pdf), default is current directory", rich_help_panel="Output"),
-    mode: str = typer.Option("multimer", "--mode", "-m", help="Comparison mode: 'multimer' (default) or 'monomer'.", rich_help_panel="Mode"),
+    mode: str = typer.Option("multimer", "--mode", "-m", help="Comparison mode: 'multimer' (default) or 'monomer'.", rich_help_panel="Mode", callback=_choice_cb("multimer", "monomer")),
     tick_step: int = typer.Option(100, "--tick-step", help="Step size for ticks on the axes (multimer mode only)", rich_help_panel="Plot Options"),
+    use_cache: bool = typer.Option(True, "--cache/--no-cache", help="Cache parsed mmCIF files under $XDG_CACHE_HOME/af3-vis (default ~/.cache/af3-vis) to skip re-parsing on the next run", rich_help_panel="Performance"),
+    dtype: str = typer.Option("float32", "--dtype", help="Float type of the distance matrices: 'float32' (default) or 'float64'", rich_help_panel="Performance", callback=_choice_cb("float32", "float64")),
+    mmap_dir: Optional[str] = typer.Option(None, "--mmap-dir", help="Directory for the distance/difference maps as memory-mapped .npy files instead of RAM, for very large complexes", rich_help_panel="Performance"),
+    dist_backend: str = typer.Option("auto", "--dist-backend", help="Distance matrix backend: 'auto' (default, numba for small structures if installed), 'blas' or 'numba'", rich_help_panel="Performance", callback=_choice_cb("auto", "blas", "numba")),
+    device: str = typer.Option("cpu", "--device", help="Device for distance matrices: 'cpu' (default) or 'cuda' (needs cupy)", rich_help_panel="Performance", callback=_choice_cb("cpu", "cuda")),
+    dpi: int = typer.Option(300, "--dpi", help="Resolution of the PNG output, default is 300", rich_help_panel="Output", callback=_positive_int_cb),
+    png_compress_level: int = typer.Option(1, "--png-compress-level", help="zlib level of the PNG output (0-9), default is 1 (fast to write, ~25% larger than 6)", rich_help_panel="Output", callback=_int_range_cb(0, 9)),
 ):
     """
     Compare contact maps between two AlphaFold3/General mmCIF structures (for the same molecule with an identical sequence), and plot the distance/diff matrices. Supports both monomer and multimer modes.
@@ -108,6 +303,12 @@ def contact_map_diff_cmd(
     - 5, Use --mode to switch between 'monomer' and 'multimer' (default) comparison logic.
     - 6, All residue indices in this module are 0-based logic driven.
     - 7, chain_a and chain_b should strictly align in order with same sequence! E.g., in multimer mode, if chain_a is "A,B,C", chain_b is "D,E,F", then it should be A aligns with D, B aligns with E, and C aligns with F.
+    - 8, Parsed mmCIF files are cached on disk by default (keyed on path, mtime, size and the cache format version, the 256 most recently used files are kept), use --no-cache to disable it.
+    - 9, Distance matrices are computed in float32 by default (error < 0.01 Å), use --dtype float64 for full precision.
+    - 10, --dist-backend numba needs the optional numba dependency (pip install alphafold3-seqvis-toolkit\\[numba]), otherwise BLAS is used.
+    - 11, --device cuda computes distance matrices on the GPU with cupy (pip install alphafold3-seqvis-toolkit\\[cuda]), useful for large complexes (N > ~2000).
+    - 12, --percentile-sample N estimates the color limits from N sampled values per map, much faster for large complexes (N > ~2000), the limits may differ slightly from the exact ones.
+    - 13, --mmap-dir DIR writes the 4 (N, N) maps to DIR/{dist_a,dist_b,diff_ab,diff_ba}.npy and works on them memory-mapped, so structures whose maps exceed the RAM still run (slower, disk-bound).
 
     \b
     Examples:
@@ -147,52 +348,76 @@ def contact_map_diff_cmd(
 --out-path .
     """
     
-    if mode == "monomer":
-        contact_map_diff_monomer(
-            mmcif_file_a=mmcif_a,
-            mmcif_file_b=mmcif_b,
-            chain_a=chain_a,
-            chain_b=chain_b,
-            region_1=region_1,
-            region_2=region_2,
-            region_pairs=region_pair if region_pair else None,
-            vmax=vmax,
-            vmax_percentile=vmax_percentile,
-            vdiff=vdiff,
-            vdiff_percentile=vdiff_percentile,
-            include_nonstandard_residue=include_nonstandard_residue,
-            out_path=out_path,
-        )
-    else:  # multimer mode
-        contact_map_diff_multimer(
-            mmcif_file_a=mmcif_a,
-            mmcif_file_b=mmcif_b,
-            chain_a=chain_a,
-            chain_b=chain_b,
-            region_1=region_1,
-            region_2=region_2,
-            region_pairs=region_pair if region_pair else None,
-            vmax=vmax,
-            vmax_percentile=vmax_percentile,
-            vdiff=vdiff,
-            vdiff_percentile=vdiff_percentile,
-            include_nonstandard_residue=include_nonstandard_residue,
-            out_path=out_path,
-            tick_step=tick_step,
-        )
+    chains_a, chains_b = _validate_diff_args(mode, chain_a, chain_b)
+
+    _use_agg_backend()
+    from concurrent.futures import ThreadPoolExecutor
+    from alphafold3_seqvis_toolkit.utils.structure_utils import load_or_cache, load_representative_atoms
+
+    # both structures are loaded here and handed to the module, parsed structures are cached on disk (--cache),
+    # so re-running on the same files skips mmCIF parsing
+    # A and B are independent, so they are loaded in 2 threads: the file reads (and gzip decompression) of one
+    # overlap with the parsing of the other, wall time is closer to max(A, B) than A + B on a cold cache
+    _ensure_dir(out_path)
+    loader = load_or_cache if use_cache else load_representative_atoms
+    with _status(f"Loading {os.path.basename(mmcif_a)} and {os.path.basename(mmcif_b)} ..."):
+        if os.path.realpath(mmcif_a) == os.path.realpath(mmcif_b):
+            preloaded_a = preloaded_b = loader(mmcif_a, include_nonstandard_residue)
+        else:
+            with ThreadPoolExecutor(max_workers=2) as ex:
+                future_a = ex.submit(loader, mmcif_a, include_nonstandard_residue)
+                future_b = ex.submit(loader, mmcif_b, include_nonstandard_residue)
+                preloaded_a, preloaded_b = future_a.result(), future_b.result()
+
+    # one kwargs dict for both modes, see _DIFF_MODES / _run_mode() above
+    # chains are split once by _validate_diff_args(), monomer takes the single chain id, multimer the tuple
+    kwargs = dict(
+        mmcif_file_a=mmcif_a,
+        mmcif_file_b=mmcif_b,
+        chain_a=chains_a[0] if mode == "monomer" else chains_a,
+        chain_b=chains_b[0] if mode == "monomer" else chains_b,
+        region_1=region_1,
+        region_2=region_2,
+        region_pairs=region_pair if region_pair else None,
+        vmax=vmax,
+        vmax_percentile=vmax_percentile,
+        vdiff=vdiff,
+        vdiff_percentile=vdiff_percentile,
+        percentile_sample=percentile_sample,
+        mmap_dir=mmap_dir,
+        include_nonstandard_residue=include_nonstandard_residue,
+        out_path=out_path,
+        tick_step=tick_step,
+        preloaded_a=preloaded_a,
+        preloaded_b=preloaded_b,
+        dtype=dtype,
+        dist_backend=dist_backend,
+        device=device,
+        dpi=dpi,
+        png_compress_level=png_compress_level,
+    )
+    with _status("Computing distance matrices and plotting ..."):
+        _run_mode(_DIFF_MODES, mode, kwargs)
 
 @app.command(
     "contact-map-vis",
     no_args_is_help=True
 )
 def contact_map_vis_cmd(
-    mmcif_file: str = typer.Option(..., "--mmcif-file", help="Path to mmCIF file", rich_help_panel="Input"),
+    mmcif_file: str = typer.Option(..., "--mmcif-file", help="Path to mmCIF file (.cif/.cif.gz, or BinaryCIF .bcif/.bcif.gz)", rich_help_panel="Input", callback=_input_file_cb),
     chains: Optional[List[str]] = typer.Option(None, "--chains", "-c", help="Repeatable: chain IDs to include, default is all chains", rich_help_panel="Input"),
     out_path: str = typer.Option(".", "--out-path", "-o", help="Directory for outputs, default is current directory", rich_help_panel="Output"),
-    mode: str = typer.Option("no-track", "--mode", "-m", help="Visualization mode: 'no-track' (default) or 'track'.", rich_help_panel="Mode"),
-    track_bed_file: Optional[str] = typer.Option(None, "--track-bed-file", help="Path to BED file for custom tracks, e.g., domains、IDRs (Required if mode is 'track')", rich_help_panel="Custom Tracks"),
+    mode: str = typer.Option("no-track", "--mode", "-m", help="Visualization mode: 'no-track' (default) or 'track'.", rich_help_panel="Mode", callback=_choice_cb("no-track", "track")),
+    track_bed_file: Optional[str] = typer.Option(None, "--track-bed-file", help="Path to BED file for custom tracks, e.g., domains、IDRs (Required if mode is 'track')", rich_help_panel="Custom Tracks", callback=_input_file_cb),
     color_config: Optional[str] = typer.Option("tab10", "--color-config", help="Path to color config file (JSON) or colormap name (Only used if mode is 'track')", rich_help_panel="Custom Tracks"),
     tick_step: int = typer.Option(100, "--tick-step", help="Step size for ticks on the axes", rich_help_panel="Plot Options"),
+    contact_cutoff: Optional[float] = typer.Option(None, "--contact-cutoff", help="Contact distance in Å, e.g. 12: only pairs within it are computed and the colors saturate at it, default is the full distance map", rich_help_panel="Plot Options", callback=_optional_positive_float_cb),
+    use_cache: bool = typer.Option(True, "--cache/--no-cache", help="Cache parsed mmCIF files under $XDG_CACHE_HOME/af3-vis (default ~/.cache/af3-vis) to skip re-parsing on the next run", rich_help_panel="Performance"),
+    dist_backend: str = typer.Option("auto", "--dist-backend", help="Distance matrix backend: 'auto' (default, numba for small structures if installed), 'blas' or 'numba'", rich_help_panel="Performance", callback=_choice_cb("auto", "blas", "numba")),
+    device: str = typer.Option("cpu", "--device", help="Device for distance matrices: 'cpu' (default) or 'cuda' (needs cupy)", rich_help_panel="Performance", callback=_choice_cb("cpu", "cuda")),
+    dpi: int = typer.Option(300, "--dpi", help="Resolution of the PNG output, default is 300", rich_help_panel="Output", callback=_positive_int_cb),
+    png_compress_level: int = typer.Option(1, "--png-compress-level", help="zlib level of the PNG output (0-9), default is 1 (fast to write, ~25% larger than 6)", rich_help_panel="Output", callback=_int_range_cb(0, 9)),
+    dtype: str = typer.Option("float32", "--dtype", help="Float type of the distance matrix: 'float32' (default) or 'float64'", rich_help_panel="Performance", callback=_choice_cb("float32", "float64")),
 ):
     """
     Visualize contact map from an AlphaFold3 mmCIF structure or a general mmCIF structure. Supports 'no-track' (simple) and 'track' (custom annotation) modes.
@@ -208,6 +433,12 @@ def contact_map_vis_cmd(
     - 4, By default, all chains in the mmCIF file are included. Use --chains to specify particular chains if needed.
     - 5, A color configuration file can be provided to customize the colors of categorical tracks (only for 'track' mode).
     - 6, Modify the tick_step parameter to adjust the spacing of residue ticks on the axes as needed.
+    - 7, Parsed mmCIF files are cached on disk by default (keyed on path, mtime, size and the cache format version, the 256 most recently used files are kept), use --no-cache to disable it.
+    - 8, --dist-backend numba needs the optional numba dependency (pip install alphafold3-seqvis-toolkit\\[numba]), otherwise BLAS is used.
+    - 9, --device cuda computes the distance matrix on the GPU with cupy (pip install alphafold3-seqvis-toolkit\\[cuda]), useful for large complexes (N > ~2000).
+    - 10, Coordinates and the distance matrix are float32 by default (error < 0.01 Å), use --dtype float64 for full precision.
+    - 11, --contact-cutoff draws a contact map: only residue pairs within the cutoff are computed (KD-tree, fast for large complexes),
+          farther pairs get the color of the cutoff, --dist-backend and --device are not used then.
 
     \b
     Examples:
@@ -222,25 +453,51 @@ def contact_map_vis_cmd(
 -o out_path
     """
 
-    if mode == "track":
-        if not track_bed_file:
-            raise typer.Exit("Error: --track-bed-file is required when --mode is 'track'")
-        
-        contact_map_vis_with_track(
-            mmcif_file=mmcif_file,
-            chains=chains,
-            out_path=out_path,
-            track_bed_file=track_bed_file,
-            color_config=color_config,
-            tick_step=tick_step,
-        )
-    else:  # no-track mode
-        contact_map_vis_without_track(
-            mmcif_file=mmcif_file,
-            chains=chains,
-            out_path=out_path,
-            tick_step=tick_step,
-        )
+    if mode == "track" and not track_bed_file:
+        raise typer.Exit("Error: --track-bed-file is required when --mode is 'track'")
+
+    _use_agg_backend()
+    from alphafold3_seqvis_toolkit.utils.structure_utils import load_or_cache
+
+    # parsed structure is cached on disk, so re-running on the same file skips mmCIF parsing
+    _ensure_dir(out_path)
+    if use_cache:
+        with _status(f"Loading {os.path.basename(mmcif_file)} ..."):
+            preloaded = load_or_cache(mmcif_file)
+    else:
+        preloaded = None
+
+    # same dispatch as contact_map_diff_cmd, the bed file and color config only go to the track module
+    kwargs = dict(
+        mmcif_file=mmcif_file,
+        chains=chains,
+        out_path=out_path,
+        track_bed_file=track_bed_file,
+        color_config=color_config,
+        tick_step=tick_step,
+        preloaded=preloaded,
+        dist_backend=dist_backend,
+        device=device,
+        dpi=dpi,
+        png_compress_level=png_compress_level,
+        dtype=dtype,
+        contact_cutoff=contact_cutoff,
+    )
+    with _status("Computing the distance matrix and plotting ..."):
+        _run_mode(_VIS_MODES, mode, kwargs)
+
+def _check_static_help():
+    """
+    The plain-text help in __main__.py lists the commands without importing this module,
+    fail loudly as soon as it no longer matches the commands registered above.
+    """
+    from alphafold3_seqvis_toolkit.__main__ import _STATIC_HELP
+    listed = set(re.findall(r"^  ([a-z][a-z0-9-]*) ", _STATIC_HELP.split("Commands:", 1)[1], flags=re.M))
+    registered = {info.name for info in app.registered_commands}
+    if listed != registered:
+        raise RuntimeError(f"_STATIC_HELP in __main__.py is out of sync with cli.py: lists {sorted(listed)}, registered {sorted(registered)}")
+
+_check_static_help()
 
 if __name__ == "__main__":
     app()
\ No newline at end of file
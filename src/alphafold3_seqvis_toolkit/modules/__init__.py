@@ -1,7 +1,27 @@
-from .confidence_metrics_plot import plot_local_confidence, plot_global_confidence
-from .contact_map_comparison_monomer import contact_map_diff_monomer
-from .contact_map_comparison_multimer import contact_map_diff_multimer
-from .contact_map_visualization_with_track import contact_map_vis_with_track
-from .contact_map_visualization_without_track import contact_map_vis_without_track
+# public functions are resolved lazily (PEP 562), so that importing the package (e.g. by the CLI entry point)
+# does not import matplotlib/BioPython/pandas until one of them is actually used
+import importlib
 
-__all__ = ["plot_local_confidence", "plot_global_confidence", "contact_map_diff_monomer", "contact_map_diff_multimer", "contact_map_vis_with_track", "contact_map_vis_without_track"]
\ No newline at end of file
+_EXPORTS = {
+    "plot_local_confidence": "confidence_metrics_plot",
+    "plot_global_confidence": "confidence_metrics_plot",
+    "contact_map_diff_monomer": "contact_map_comparison_monomer",
+    "contact_map_diff_multimer": "contact_map_comparison_multimer",
+    "contact_map_vis_with_track": "contact_map_visualization_with_track",
+    "contact_map_vis_without_track": "contact_map_visualization_without_track",
+}
+
+__all__ = ["plot_local_confidence", "plot_global_confidence", "contact_map_diff_monomer", "contact_map_diff_multimer", "contact_map_vis_with_track", "contact_map_vis_without_track"]
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    # list the lazy exports too (tab completion, help()), they are not in globals() before first access
+    return sorted(set(globals()) | set(__all__))
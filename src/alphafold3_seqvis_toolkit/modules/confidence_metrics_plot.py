@@ -3,28 +3,234 @@
 import json
 import os 
 import re
+import string
+from functools import lru_cache
 import numpy as np
 import matplotlib.pyplot as plt
 from mpl_toolkits.axes_grid1.axes_divider import make_axes_locatable
 from typing import Dict, Optional, Tuple
 import matplotlib.patches as mpatches
 from matplotlib.colors import ListedColormap
+from matplotlib.collections import PolyCollection
+from alphafold3_seqvis_toolkit.utils.figure_utils import save_pdf_and_png
+
+# orjson is optional (pip install alphafold3-seqvis-toolkit[fast]), it parses the large full_data_*.json files several times faster than json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# JSON parsers supported by load_json_data()
+JSON_BACKENDS = ("auto", "stdlib", "orjson", "simdjson")
+
+# AlphaFold3 server output file names, the job name is group(1)
+_SUMMARY_RE = re.compile(r'fold_(.*)_summary_confidences_\d+\.json')
+_FULL_RE = re.compile(r'fold_(.*)_full_data_\d+\.json')
+
+def _job_name(pattern, json_file_path):
+    """Return the AlphaFold3 job name from a JSON file name, raise a ValueError if the name does not follow the pattern."""
+    basename = os.path.basename(json_file_path)
+    m = pattern.match(basename)
+    if m is None:
+        raise ValueError(f"Unexpected file name: {basename}, expected an AlphaFold3 output name like '{pattern.pattern}'.")
+    return m.group(1)
+
+# chain labels used on the global confidence plots: A..Z, AA..ZZ, AAA, ... (spreadsheet-column style)
+_CHAIN_LETTERS = np.array(list(string.ascii_uppercase))
+
+def _chain_labels_vec(n):
+    """
+    Description
+    -----------
+    build the first n chain labels (A, B, ..., Z, AA, AB, ...) at once.
+
+    Args
+    ----
+    n : int
+        number of chain labels to build.
+
+    Returns
+    -------
+    list of str, label i is the same as number_to_chain_idx(i) in plot_global_confidence().
+
+    Notes
+    -----
+    - 1, n <= 26 is a slice of the letter LUT; n <= 702 (A..ZZ) takes the first/second letter
+    with integer arithmetic on np.arange(n) and joins them with np.char.add, no per-chain Python loop.
+    - 2, labels with 3+ letters (n > 702) are rare enough to be built by the scalar loop.
+    """
+    if n <= 26:
+        return _CHAIN_LETTERS[:n].tolist()
+
+    a = np.arange(min(n, 702))
+    first = a // 26 - 1   # -1 -> single letter
+    second = a % 26
+    labels = np.char.add(np.where(first < 0, "", _CHAIN_LETTERS[np.maximum(first, 0)]), _CHAIN_LETTERS[second]).tolist()
+
+    for num in range(702, n):
+        letter = ""
+        while num >= 0:
+            letter = chr(num % 26 + ord('A')) + letter
+            num = num // 26 - 1
+        labels.append(letter)
+    return labels
+
+
+# save one figure as <base>.pdf and <base>.png (dpi 300), both cropped like bbox_inches='tight'
+def _save_fig_dual(fig, base, dpi=300, png_compress_level=1):
+    """
+    Description
+    -----------
+    save a figure as a pdf and a png file with the same tight crop.
+
+    Args
+    ----
+    fig : matplotlib.figure.Figure
+        figure to save.
+    base : str
+        output path without extension.
+    dpi : int, optional
+        resolution of the png file. Default is 300.
+    png_compress_level : int, optional
+        zlib level of the png file (0-9). Default is 1, faster to write than the PIL default 6, same pixels.
+
+    Notes
+    -----
+    - 1, savefig(bbox_inches='tight') runs a full (draw-disabled) layout pass of the figure just to measure
+    the tight box, and it did that once per file; here the box is measured once and passed to both savefig calls.
+    - 2, the pdf and the png still each render the figure once, they are different renderers (vector vs Agg raster),
+    so a single shared draw is not possible.
+    """
+    # measured at the png dpi: text extents are hinted per dpi, so this gives the png exactly the crop
+    # savefig would compute for it (the pdf may move by a fraction of a point, invisible in a vector file)
+    screen_dpi = fig.dpi
+    fig.set_dpi(dpi)
+    try:
+        fig.draw_without_rendering()
+        bbox = fig.get_tightbbox().padded(plt.rcParams["savefig.pad_inches"])
+    finally:
+        fig.set_dpi(screen_dpi)
+    save_pdf_and_png(fig, base, dpi=dpi, png_compress_level=png_compress_level, bbox_inches=bbox)
 
 
 # function to load JSON data from a file
-def load_json_data(json_file_path):
+def load_json_data(json_file_path, backend: str = "auto"):
+    """
+    Load a JSON file into python objects (dict/list), returns None if it fails.
+
+    backend: one of JSON_BACKENDS
+        - "auto" (default): orjson if installed, otherwise the stdlib json
+        - "stdlib": the stdlib json module
+        - "orjson": orjson (pip install alphafold3-seqvis-toolkit[fast])
+        - "simdjson": pysimdjson (pip install alphafold3-seqvis-toolkit[simdjson]), SIMD parser, useful for the largest full_data_*.json files
+    """
+    if backend not in JSON_BACKENDS:
+        raise ValueError(f"Invalid JSON backend: {backend}, should be one of {JSON_BACKENDS}.")
+    if backend == "orjson" and orjson is None:
+        print("Warning: orjson is not installed, falling back to the stdlib json parser.")
+        backend = "stdlib"
+
     try:
-        with open(json_file_path, "r") as f:
-            data = json.load(f)
+        if backend == "simdjson":
+            try:
+                import simdjson
+            except ImportError:
+                print("Warning: pysimdjson is not installed, falling back to the stdlib json parser.")
+                backend = "stdlib"
+            else:
+                # parser.load reads the file directly, as_dict()/as_list() turn the parsed document into plain python objects
+                doc = simdjson.Parser().load(json_file_path)
+                if isinstance(doc, simdjson.Object):
+                    return doc.as_dict()
+                if isinstance(doc, simdjson.Array):
+                    return doc.as_list()
+                return doc
+
+        # read raw bytes once, orjson parses bytes directly without decoding to str first
+        with open(json_file_path, "rb") as f:
+            buf = f.read()
+        if backend in ("auto", "orjson") and orjson is not None:
+            try:
+                return orjson.loads(buf)
+            except orjson.JSONDecodeError:
+                # orjson is strict (e.g. rejects NaN/Infinity tokens), fall back to json for such files
+                pass
+        data = json.loads(buf)
         return data
     except Exception as e:
         print(f"Error loading JSON file: {e}")
         return None
 
 
+# *** Streaming load of very large full_data_*.json files ***
+# -1. a whole-file parse materializes every PAE/contact_probs cell as a python float (N_token^2 * 2 objects, ~1 GB for
+# N_token = 5000) before numpy sees them; streaming the two matrices row by row keeps only one row of python floats alive
+# -2. needs ijson (pip install alphafold3-seqvis-toolkit[stream]), used by plot_local_confidence(json_backend="auto")
+# for files of at least FULL_JSON_STREAM_MIN_BYTES
+FULL_JSON_STREAM_MIN_BYTES = 200 * 1024 * 1024
+
+def load_full_data_streaming(json_file_path, matrix_keys=("pae", "contact_probs"),
+                             other_keys=("atom_chain_ids", "atom_plddts", "token_chain_ids", "token_res_ids"),
+                             dtype=np.float32):
+    """
+    Description
+    -----------
+    load the fields of a full_data_*.json file needed by plot_local_confidence(), with the (N, N) matrices streamed.
+
+    Args
+    ----
+    json_file_path : str
+        path to the full_data JSON file.
+    matrix_keys : tuple of str, optional
+        top-level keys of square matrices, filled row by row into preallocated arrays of dtype.
+    other_keys : tuple of str, optional
+        top-level keys loaded as plain python lists.
+    dtype : numpy dtype, optional
+        dtype of the matrices. Default is np.float32.
+
+    Returns
+    -------
+    dict of the keys found in the file, or None if ijson is not installed.
+
+    Notes
+    -----
+    - 1, every key is one streaming pass over the file (ijson skips the rest without building objects),
+    so this is slower than a whole-file orjson parse, it trades time for a much lower peak memory.
+    - 2, JSON null cells become NaN, as with np.asarray(..., dtype=float).
+    """
+    try:
+        import ijson
+    except ImportError:
+        return None
+
+    data = {}
+    with open(json_file_path, "rb") as f:
+        for key in matrix_keys:
+            f.seek(0)
+            mat = None
+            n_rows = 0
+            for row in ijson.items(f, f"{key}.item", use_float=True):
+                if mat is None:
+                    mat = np.empty((len(row), len(row)), dtype=dtype)
+                if n_rows >= mat.shape[0]:
+                    raise ValueError(f"'{key}' in {json_file_path} is not a square matrix.")
+                mat[n_rows] = np.asarray(row, dtype=dtype)
+                n_rows += 1
+            if mat is not None:
+                data[key] = mat[:n_rows]
+
+        for key in other_keys:
+            f.seek(0)
+            for value in ijson.items(f, key, use_float=True):
+                data[key] = value
+                break
+    return data
+
+
 
 # 1, For Global confidence measures and ipTM matrix
-def plot_global_confidence(confid_json_file_path, output_path):
+def plot_global_confidence(confid_json_file_path, output_path, json_backend: str = "auto"):
     """
     Description
     -----------
@@ -36,6 +242,8 @@ def plot_global_confidence(confid_json_file_path, output_path):
         path to the JSON file containing global confidence metrics.
     output_path : str
         path to save the output plots and data files.
+    json_backend : str, optional
+        JSON parser used to read the file, see load_json_data(). Default is "auto".
 
     Returns
     -------
@@ -50,7 +258,7 @@ def plot_global_confidence(confid_json_file_path, output_path):
     and the folder will be named by the system for your convenience.
     """
 
-    global_confidence = load_json_data(confid_json_file_path)
+    global_confidence = load_json_data(confid_json_file_path, backend=json_backend)
 
     # extract global confidence measures
     chain_iptm = np.asarray(global_confidence['chain_iptm'], dtype=float) # list
@@ -74,7 +282,7 @@ def plot_global_confidence(confid_json_file_path, output_path):
     # print(f"Ranking Score: {ranking_score}")
     
     # write them to a tsv file
-    job_name = re.match(r'fold_(.*)_summary_confidences_\d+\.json', os.path.basename(confid_json_file_path)).group(1) 
+    job_name = _job_name(_SUMMARY_RE, confid_json_file_path)
     with open(f"{output_path}/{job_name}_global_confidence_SCALAR_measures.tsv", "w") as f:
         f.write(f"Fraction Disordered\t{fraction_disordered}\n")
         f.write(f"Has Clash\t{has_clash}\n")
@@ -92,6 +300,11 @@ def plot_global_confidence(confid_json_file_path, output_path):
             num = num // 26 - 1
         return letter
 
+    # labels are built once for the largest chain count seen in this file and sliced/indexed below
+    # (line/bar plot ticks, the tsv, both heatmaps); number_to_chain_idx() is kept as the scalar reference
+    n_labels = max(len(chain_iptm), *chain_pair_iptm.shape, *chain_pair_pae_min.shape)
+    chain_labels = _chain_labels_vec(n_labels)
+
 
     # (2) For list value, we output them as a dataframe, and plot them as a line plot or bar plot (chain id as x axis)
     # for chain_iptm or chain_ptm, we can plot them as line plot and bar plot
@@ -103,13 +316,11 @@ def plot_global_confidence(confid_json_file_path, output_path):
     plt.title("Chain ipTM/pTM Scores")
     plt.xlabel("Chain Index")
     plt.ylabel("ipTM/pTM Score")
-    plt.xticks(x, [number_to_chain_idx(i) for i in x])
+    plt.xticks(x, chain_labels[:len(x)])
     plt.legend()
     plt.grid()
-    # we save the figure into a pdf file
-    plt.savefig(f"{output_path}/{job_name}_global_confidence_chain_ptm_iptm_lineplot.pdf", bbox_inches='tight')
-    # also save as png, dpi 300
-    plt.savefig(f"{output_path}/{job_name}_global_confidence_chain_ptm_iptm_lineplot.png", bbox_inches='tight', dpi=300)
+    # save the figure as pdf and png (dpi 300)
+    _save_fig_dual(plt.gcf(), f"{output_path}/{job_name}_global_confidence_chain_ptm_iptm_lineplot")
     plt.close()
 
     # and bar plot
@@ -120,57 +331,199 @@ def plot_global_confidence(confid_json_file_path, output_path):
     plt.title("Chain ipTM/pTM Scores")
     plt.xlabel("Chain Index")
     plt.ylabel("ipTM/pTM Score")
-    plt.xticks(x, [number_to_chain_idx(i) for i in x])
+    plt.xticks(x, chain_labels[:len(x)])
     plt.legend()
     plt.grid()
-    # we save the figure into a pdf file
-    plt.savefig(f"{output_path}/{job_name}_global_confidence_chain_ptm_iptm_barplot.pdf", bbox_inches='tight')
-    # also save as png, dpi 300
-    plt.savefig(f"{output_path}/{job_name}_global_confidence_chain_ptm_iptm_barplot.png", bbox_inches='tight', dpi=300)
+    # save the figure as pdf and png (dpi 300)
+    _save_fig_dual(plt.gcf(), f"{output_path}/{job_name}_global_confidence_chain_ptm_iptm_barplot")
     plt.close()
 
 
     # write them to a tsv file
     with open(f"{output_path}/{job_name}_global_confidence_chain_ptm_iptm.tsv", "w") as f:
-        f.write("Chain_Index\tChain_ipTM_Score\tChain_pTM_Score\n")
-        for i in range(len(chain_iptm)):
-            f.write(f"{number_to_chain_idx(i)}\t{chain_iptm[i]}\t{chain_ptm[i]}\n")
+        # rows formatted in one pass and written at once (.tolist(): python floats print like the numpy scalars did)
+        lines = ["Chain_Index\tChain_ipTM_Score\tChain_pTM_Score\n"]
+        lines += [f"{label}\t{a}\t{b}\n" for label, a, b in zip(chain_labels, chain_iptm.tolist(), chain_ptm.tolist())]
+        f.write("".join(lines))
 
 
     # (3) For 2D ndarray value, we output them as heatmap plot (chain id as x and y axis)
-    import seaborn as sns
-    # for chain_pair_iptm
-    plt.figure(figsize=(8,6))
-    sns.heatmap(chain_pair_iptm, annot=True, fmt=".2f", cmap="coolwarm",
-                xticklabels=[number_to_chain_idx(i) for i in range(chain_pair_iptm.shape[0])],
-                yticklabels=[number_to_chain_idx(i) for i in range(chain_pair_iptm.shape[1])])
-    plt.title("Chain Pair ipTM Scores Heatmap")
-    plt.xlabel("Chain Index")
-    plt.ylabel("Chain Index")
-    # we save the figure into a pdf file
-    plt.savefig(f"{output_path}/{job_name}_global_confidence_chain_pair_iptm_heatmap.pdf", bbox_inches='tight')
-    # also save as png, dpi 300
-    plt.savefig(f"{output_path}/{job_name}_global_confidence_chain_pair_iptm_heatmap.png", bbox_inches='tight', dpi=300)
-    plt.close()
+    # imshow + one text artist per cell, same look as seaborn.heatmap(annot=True, fmt=".2f", cmap="coolwarm")
+    # without importing seaborn (and pandas) or building its DataFrame/pcolormesh for a tiny (N_chain, N_chain) matrix
+    def _annotated_heatmap(matrix, title, outfilename, cmap_name="coolwarm"):
+        fig, ax = plt.subplots(figsize=(8,6))
+        im = ax.imshow(matrix, cmap=cmap_name, aspect="auto", interpolation="nearest")
+        cbar = fig.colorbar(im, ax=ax)
+        cbar.outline.set_linewidth(0)
+        for spine in ax.spines.values():
+            spine.set_visible(False)
+
+        n_rows, n_cols = matrix.shape
+        ax.set_xticks(np.arange(n_cols))
+        ax.set_xticklabels(chain_labels[:n_cols])
+        ax.set_yticks(np.arange(n_rows))
+        # seaborn draws the y labels vertically, centered on the row
+        ax.set_yticklabels(chain_labels[:n_rows], rotation=90, va="center")
+
+        # text color per cell from the luminance of its color (seaborn's rule): dark text on light cells, white on dark
+        rgb = im.cmap(im.norm(matrix))[..., :3]
+        rgb = np.where(rgb <= .03928, rgb / 12.92, ((rgb + .055) / 1.055) ** 2.4)
+        luminance = rgb @ np.array([.2126, .7152, .0722])
+        text_colors = np.where(luminance > .408, ".15", "w")
+        for i, j in zip(*np.nonzero(~np.isnan(matrix))):
+            ax.text(j, i, f"{matrix[i, j]:.2f}", ha="center", va="center", color=text_colors[i, j])
+
+        ax.set_title(title)
+        ax.set_xlabel("Chain Index")
+        ax.set_ylabel("Chain Index")
+        # save the figure as pdf and png (dpi 300)
+        _save_fig_dual(fig, f"{output_path}/{job_name}_{outfilename}")
+        plt.close(fig)
 
+    # for chain_pair_iptm
+    _annotated_heatmap(chain_pair_iptm, "Chain Pair ipTM Scores Heatmap", "global_confidence_chain_pair_iptm_heatmap")
     # for chain_pair_pae_min
-    plt.figure(figsize=(8,6))
-    sns.heatmap(chain_pair_pae_min, annot=True, fmt=".2f", cmap="coolwarm",
-                xticklabels=[number_to_chain_idx(i) for i in range(chain_pair_pae_min.shape[0])],
-                yticklabels=[number_to_chain_idx(i) for i in range(chain_pair_pae_min.shape[1])])
-    plt.title("Chain Pair PAE Min Heatmap")
-    plt.xlabel("Chain Index")
-    plt.ylabel("Chain Index")
-    # we save the figure into a pdf file
-    plt.savefig(f"{output_path}/{job_name}_global_confidence_chain_pair_pae_min_heatmap.pdf", bbox_inches='tight')
-    # also save as png, dpi 300
-    plt.savefig(f"{output_path}/{job_name}_global_confidence_chain_pair_pae_min_heatmap.png", bbox_inches='tight', dpi=300)
-    plt.close()
+    _annotated_heatmap(chain_pair_pae_min, "Chain Pair PAE Min Heatmap", "global_confidence_chain_pair_pae_min_heatmap")
+
+
+
+# *** pLDDT statistics in one pass ***
+# -1. mean/std and the 4 category fractions of _plddt_statistics() used 4 nan-aware reductions + 6 boolean masks per chain,
+# the numba kernel gets all of them from one streaming pass (the median still needs np.nanmedian, i.e. a partition)
+# -2. numba costs ~0.5 s to import, which only pays off for very large atom arrays, below that numpy is used (same values)
+PLDDT_NUMBA_MIN_N = 1_000_000
+# upper-inclusive pLDDT category edges: <=50 very low, (50, 70] low, (70, 90] high, >90 very high
+PLDDT_EDGES = np.array([50.0, 70.0, 90.0])
+
+def _plddt_stats_from_vals(vals):
+    """
+    Description
+    -----------
+    pLDDT statistics of one set of atoms.
+
+    Args
+    ----
+    vals : np.ndarray
+        1D array of atom pLDDT scores (may contain NaN).
+
+    Returns
+    -------
+    tuple of 7 floats: (mean, median, std, fraction >90, fraction 70-90, fraction 50-70, fraction <=50).
+
+    Notes
+    -----
+    - 1, mean/median/std ignore NaN (as np.nanmean etc.), the fractions are over all atoms including NaN.
+    mean/std are accumulated in float64 also for float32 input.
+    - 2, arrays with at least PLDDT_NUMBA_MIN_N atoms use the one-pass numba kernel if numba is installed.
+    """
+    if vals.size == 0:
+        return (np.nan, np.nan, np.nan, 0.0, 0.0, 0.0, 0.0)
+    n = vals.size
+
+    kernel = _get_plddt_stats_kernel() if n >= PLDDT_NUMBA_MIN_N else None
+    if kernel is not None:
+        mean, std, n_vh, n_h, n_l, n_vl = kernel(np.ascontiguousarray(vals, dtype=np.float64))
+        median = float(np.nanmedian(vals))
+        return (float(mean), median, float(std), n_vh / n, n_h / n, n_l / n, n_vl / n)
+
+    # mean/std accumulate in float64 even for float32 input
+    mean = float(np.nanmean(vals, dtype=np.float64))
+    median = float(np.nanmedian(vals))
+    std = float(np.nanstd(vals, dtype=np.float64))
+    # category counts from one binning pass: 0 (<=50), 1 (50-70], 2 (70-90], 3 (>90), NaN -> 4 (not counted)
+    # (searchsorted alone would put NaN after every edge, i.e. into >90)
+    cat = np.searchsorted(PLDDT_EDGES, vals, side="left")
+    cat[np.isnan(vals)] = 4
+    n_vl, n_l, n_h, n_vh = np.bincount(cat, minlength=5)[:4].tolist()
+    return (mean, median, std, n_vh / n, n_h / n, n_l / n, n_vl / n)
+
+
+# numba kernel for _plddt_stats_from_vals(), compiled on first use
+@lru_cache(maxsize=None)
+def _get_plddt_stats_kernel():
+    """
+    Return the compiled kernel, or None if numba is not installed.
+    """
+    try:
+        from numba import njit
+    except ImportError:
+        return None
+
+    # no fastmath: it lets numba assume there is no NaN, and the NaN checks below would be dropped
+    # std is accumulated around the first valid value (shifted sums), which avoids the cancellation of sum(x^2) - n*mean^2
+    # explicit signature: compiled (or loaded from the cache) at definition, no type inference on the first call
+    @njit("Tuple((float64, float64, int64, int64, int64, int64))(float64[::1])", cache=True)
+    def _plddt_stats(vals):
+        n_valid = 0
+        shift = 0.0
+        s = 0.0
+        s2 = 0.0
+        n_vh = 0
+        n_h = 0
+        n_l = 0
+        n_vl = 0
+        for i in range(vals.size):
+            v = vals[i]
+            if np.isnan(v):
+                continue
+            if n_valid == 0:
+                shift = v
+            n_valid += 1
+            t = v - shift
+            s += t
+            s2 += t * t
+            if v > 90:
+                n_vh += 1
+            elif v > 70:
+                n_h += 1
+            elif v > 50:
+                n_l += 1
+            else:
+                n_vl += 1
+        if n_valid == 0:
+            return np.nan, np.nan, n_vh, n_h, n_l, n_vl
+        m = s / n_valid
+        var = max(s2 / n_valid - m * m, 0.0)
+        return shift + m, np.sqrt(var), n_vh, n_h, n_l, n_vl
+
+    return _plddt_stats
+
+
+# contiguous chain blocks of a per-token/per-atom chain id array, used for the chain bars of the local confidence plots
+def _chain_blocks(chain_ids):
+    """
+    Description
+    -----------
+    split a chain id array into runs of the same chain.
+
+    Args
+    ----
+    chain_ids : np.ndarray
+        1D array of chain ids (per token or per atom).
+
+    Returns
+    -------
+    unique_chains : np.ndarray, sorted unique chain ids.
+    codes : np.ndarray, index of each entry's chain in unique_chains (the color index of the chain bar).
+    chain_blocks : list of (chain_id, start, end) tuples, end inclusive, in array order.
+
+    Notes
+    -----
+    - 1, run boundaries are where codes changes (np.diff), no per-element comparison of numpy string scalars.
+    """
+    unique_chains, codes = np.unique(chain_ids, return_inverse=True)
+    codes = codes.reshape(-1)
+    if codes.size == 0:
+        return unique_chains, codes, []
+    boundaries = np.flatnonzero(np.diff(codes)) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.append(boundaries, codes.size) - 1
+    chain_blocks = list(zip(unique_chains[codes[starts]], starts.tolist(), ends.tolist()))
+    return unique_chains, codes, chain_blocks
 
-    
 
 # 2, For local confidence measures
-def plot_local_confidence(full_json_file_path, output_path, chains: Optional[object]=None, tick_step: int = 100):
+def plot_local_confidence(full_json_file_path, output_path, chains: Optional[object]=None, tick_step: int = 100, json_backend: str = "auto"):
     """
     Description
     -----------
@@ -188,6 +541,8 @@ def plot_local_confidence(full_json_file_path, output_path, chains: Optional[obj
         - list or tuple: multiple chain ids, e.g., ['A', 'B']
     tick_step : int, optional
         step size for residue ticks on axes. Default is 100.
+    json_backend : str, optional
+        JSON parser used to read the (large) full_data file, see load_json_data(). Default is "auto".
 
     Returns
     -------
@@ -196,17 +551,27 @@ def plot_local_confidence(full_json_file_path, output_path, chains: Optional[obj
     """
 
     # load local confidence data
-    local_confidence = load_json_data(full_json_file_path)
+    # very large files are streamed (if ijson is installed), see load_full_data_streaming()
+    local_confidence = None
+    if json_backend == "auto" and os.path.getsize(full_json_file_path) >= FULL_JSON_STREAM_MIN_BYTES:
+        local_confidence = load_full_data_streaming(full_json_file_path)
+    if local_confidence is None:
+        local_confidence = load_json_data(full_json_file_path, backend=json_backend)
     if local_confidence is None:
         raise ValueError("Failed to load local confidence data from JSON file.")
     
     # extract local confidence measures
-    pae_matrix = np.asarray(local_confidence['pae'], dtype=float)  # 2D ndarray
-    contact_probs = np.asarray(local_confidence['contact_probs'], dtype=float)  # 2D ndarray
+    # Note: np.asarray(..., dtype=float) already converts JSON null (None) to NaN in C, no per-cell python check is needed
+    # the two (N_token, N_token) matrices are only plotted, so float32 is precise enough and halves their memory
+    pae_matrix = np.asarray(local_confidence['pae'], dtype=np.float32)  # 2D ndarray
+    contact_probs = np.asarray(local_confidence['contact_probs'], dtype=np.float32)  # 2D ndarray
     atom_chain_ids = np.asarray(local_confidence['atom_chain_ids'], dtype=str)  # list of str   
-    atom_plddts = np.asarray(local_confidence['atom_plddts'], dtype=float)  # list of float
+    # atom pLDDT is plotted and summarized (the statistics accumulate in float64, see _plddt_stats_from_vals()), float32 as well
+    atom_plddts = np.asarray(local_confidence['atom_plddts'], dtype=np.float32)  # list of float
     token_chain_ids = np.asarray(local_confidence['token_chain_ids'], dtype=str)  # list of str
-    token_res_ids = np.asarray(local_confidence['token_res_ids'], dtype=int)  # list of int
+    token_res_ids = np.asarray(local_confidence['token_res_ids'], dtype=np.int32)  # list of int
+    # the parsed JSON (nested python lists, ~N_token^2 python floats) is not needed anymore, free it before plotting
+    del local_confidence
 
 
     # convert chains param into a hashable list
@@ -221,13 +586,23 @@ def plot_local_confidence(full_json_file_path, output_path, chains: Optional[obj
 
     # select token indices for the specified chains
     if selected_chains is not None:
-        missing = [chain_id for chain_id in selected_chains if chain_id not in np.unique(token_chain_ids)]
+        # available chain ids computed once (not once per selected chain), a hash set instead of np.unique's sort
+        available_chains = set(token_chain_ids.tolist())
+        missing = [chain_id for chain_id in selected_chains if chain_id not in available_chains]
         if missing:
             raise ValueError(f"Specified chains not found in data: {missing}")
-        
+
+        # boolean mask of the entries in the selected chains: one == comparison per selected chain OR-ed in place,
+        # np.isin would sort the (long) id array for a handful of chain ids
+        def _chain_mask(chain_ids_arr):
+            m = chain_ids_arr == selected_chains[0]
+            for chain_id in selected_chains[1:]:
+                np.logical_or(m, chain_ids_arr == chain_id, out=m)
+            return m
+
         # create a boolean mask for selected chains, res in selected chains will be True
         # token/res level
-        mask = np.isin(token_chain_ids, selected_chains)
+        mask = _chain_mask(token_chain_ids)
         idx = np.where(mask)[0] # tuple to index array
 
         if idx.size == 0:
@@ -235,15 +610,28 @@ def plot_local_confidence(full_json_file_path, output_path, chains: Optional[obj
         
         # filter pae_matrix and contact_probs based on selected chains, and other token-based arrays
         # Note: we only filter token-based arrays here, atom-based arrays will be filtered later
-        pae_matrix_sub = pae_matrix[np.ix_(idx, idx)]
-        contact_probs_sub = contact_probs[np.ix_(idx, idx)]
-        token_chain_ids_sub = token_chain_ids[idx]
-        token_res_ids_sub = token_res_ids[idx]
-
-        # atom level
-        atom_mask = np.isin(atom_chain_ids, selected_chains)
-        atom_chain_ids_sub = atom_chain_ids[atom_mask]
-        atom_plddts_sub = atom_plddts[atom_mask]
+        # the tokens of one chain (or of chains that follow each other) are a contiguous range: basic slicing gives views,
+        # np.ix_ (gather into new (n, n) arrays) is only needed for non-contiguous selections like chains A + C
+        if idx[-1] - idx[0] + 1 == idx.size:
+            sel = slice(idx[0], idx[-1] + 1)
+            pae_matrix_sub = pae_matrix[sel, sel]
+            contact_probs_sub = contact_probs[sel, sel]
+        else:
+            sel = idx
+            pae_matrix_sub = pae_matrix[np.ix_(idx, idx)]
+            contact_probs_sub = contact_probs[np.ix_(idx, idx)]
+        token_chain_ids_sub = token_chain_ids[sel]
+        token_res_ids_sub = token_res_ids[sel]
+
+        # atom level, same contiguous-range shortcut
+        atom_mask = _chain_mask(atom_chain_ids)
+        atom_idx = np.flatnonzero(atom_mask)
+        if atom_idx.size and atom_idx[-1] - atom_idx[0] + 1 == atom_idx.size:
+            atom_sel = slice(atom_idx[0], atom_idx[-1] + 1)
+        else:
+            atom_sel = atom_mask
+        atom_chain_ids_sub = atom_chain_ids[atom_sel]
+        atom_plddts_sub = atom_plddts[atom_sel]
 
         if atom_plddts_sub.size == 0:
             raise ValueError("No atoms found for the specified chains.")
@@ -262,19 +650,18 @@ def plot_local_confidence(full_json_file_path, output_path, chains: Optional[obj
         atom_plddts_sub = atom_plddts
         
     # compute tick positions and labels for the selected chains
-    xticks_loc = []
-    xticks_labels = []
-    for index, res in enumerate(token_res_ids_sub):
-        # Note that index is the index in the sub-matrix, while res is the residue id
-        # for example, index 728 in submatrix may correspond to residue 1 in chain B
-        
-        # ⚠️ Note that res is 1-based residue id, so we convert it to 0-based for tick logic
-        res_0b = res - 1
-        if res == 1 or (tick_step and res_0b % tick_step == 0):
-            xticks_loc.append(index)
-            xticks_labels.append(int(res_0b))
-
-    job_name = re.match(r'fold_(.*)_full_data_\d+\.json', os.path.basename(full_json_file_path)).group(1) 
+    # Note that a tick position is the index in the sub-matrix, while its label comes from the residue id
+    # for example, index 728 in submatrix may correspond to residue 1 in chain B
+    # ⚠️ Note that res is 1-based residue id, so we convert it to 0-based for tick logic
+    # a tick at the first residue of every chain, plus every tick_step residues (tick_step 0/None: first residues only)
+    res_0b = token_res_ids_sub - 1
+    tick_mask = token_res_ids_sub == 1
+    if tick_step:
+        tick_mask |= (res_0b % tick_step) == 0
+    xticks_loc = np.flatnonzero(tick_mask).tolist()
+    xticks_labels = res_0b[xticks_loc].tolist()
+
+    job_name = _job_name(_FULL_RE, full_json_file_path)
 
     # Cause PAE and contact_probs matrices are similar in plotting style and chain_id segmentation need, so we define a general plotting function here.
     def _plot_matrix_with_chain_bars(matrix, title, xlabel, ylabel, cbar_label,cmap_name, outfilename):
@@ -295,7 +682,8 @@ def plot_local_confidence(full_json_file_path, output_path, chains: Optional[obj
 
         # if multiple chains present (either full file with >1 chain, or selected_chains with >1 chain)
         # draw small colored bars on top and left showing chain segmentation
-        unique_chains = np.unique(token_chain_ids_sub)
+        # sorted unique chains, chain color index per token and contiguous blocks (chain_id, start, end) in token order
+        unique_chains, chain_codes, chain_blocks = _chain_blocks(token_chain_ids_sub)
         draw_bars = len(unique_chains) > 1
         # if chain left > 1, we will draw bars and segmentation lines
         if draw_bars:
@@ -303,17 +691,8 @@ def plot_local_confidence(full_json_file_path, output_path, chains: Optional[obj
             ax_top = divider.append_axes("top", size="5%", pad=0.03)
             ax_left = divider.append_axes("left", size="5%", pad=0.03)
 
-            # build contiguous blocks (chain_id, start, end) relative to token_chain_ids_sub order
-            chain_blocks = []
-            start = 0
-            for i in range(1, len(token_chain_ids_sub) + 1):
-                if i == len(token_chain_ids_sub) or token_chain_ids_sub[i] != token_chain_ids_sub[start]:
-                    chain_blocks.append((token_chain_ids_sub[start], start, i - 1))
-                    start = i
-            
-            # create a color map for chains, map chain ids -> integers for colors
-            chain_to_int = {chain_id: i for i, chain_id in enumerate(unique_chains)}
-            chain_row = np.asarray([chain_to_int[chain_id] for chain_id in token_chain_ids_sub]).reshape(1, -1)
+            # create a color map for chains, chain ids -> integers (index in unique_chains) for colors
+            chain_row = chain_codes.reshape(1, -1)
     
             # use pastel colors for the top/left chain bars and slightly transparent
             # 20 coloars should be enough for most cases!  
@@ -352,9 +731,8 @@ def plot_local_confidence(full_json_file_path, output_path, chains: Optional[obj
 
         # save figure
         sel_name = "_".join(selected_chains) if selected_chains else "all"
-        plt.savefig(f"{output_path}/{job_name}_{outfilename}_{sel_name}.pdf", bbox_inches='tight')
-        # also save as png, dpi 300
-        plt.savefig(f"{output_path}/{job_name}_{outfilename}_{sel_name}.png", bbox_inches='tight', dpi=300)
+        # as pdf and png (dpi 300)
+        _save_fig_dual(fig, f"{output_path}/{job_name}_{outfilename}_{sel_name}")
         plt.close(fig)
 
     # Now, we can directly use the above function to plot PAE matrix and contact probability matrix
@@ -391,8 +769,7 @@ def plot_local_confidence(full_json_file_path, output_path, chains: Optional[obj
         n = len(atom_plddt)
         fig, ax = plt.subplots(figsize=(20,10))
         x = np.arange(n)
-        ax.plot(x, atom_plddt, color='black', linewidth=0.8)
-        ax.fill_between(x, atom_plddt, 0, color='skyblue', alpha=0.2)
+        # the curve is drawn after the category fills (below), on top of them; the fills already cover everything but NaN atoms
         ax.set_xlabel("Atom Index (token order)", fontsize=15)
         ax.set_ylabel("pLDDT Score", fontsize=15)
         ax.set_title(title, fontsize=15)
@@ -404,18 +781,38 @@ def plot_local_confidence(full_json_file_path, output_path, chains: Optional[obj
         color_l  = (0.996, 0.851, 0.212)   # 70 > x > 50
         color_vl = (0.992, 0.490, 0.302)   # <=50
 
-        # masks for thresholds (per-atom)
+        # category per atom: 0 (<=50), 1 (50-70], 2 (70-90], 3 (>90), NaN -> -1 (not filled, as fill_between's where did)
         p = np.asarray(atom_plddt)
-        mask_vh = p > 90
-        mask_h  = (p <= 90) & (p > 70)
-        mask_l  = (p <= 70) & (p > 50)
-        mask_vl = p <= 50
+        cat = np.searchsorted(PLDDT_EDGES, p, side="left")
+        cat[np.isnan(p)] = -1
 
         # fill under curve with different colors for each category
-        ax.fill_between(x, p, 0, where=mask_vh, facecolor=color_vh, interpolate=True, alpha=0.7)
-        ax.fill_between(x, p, 0, where=mask_h,  facecolor=color_h,  interpolate=True, alpha=0.7)
-        ax.fill_between(x, p, 0, where=mask_l,  facecolor=color_l,  interpolate=True, alpha=0.7)
-        ax.fill_between(x, p, 0, where=mask_vl, facecolor=color_vl, interpolate=True, alpha=0.7)
+        # one polygon per run of equal category, all in a single PolyCollection instead of 4 fill_between calls that each scan all atoms
+        # the polygons are the ones fill_between(x, p, 0, where=mask, interpolate=True) built:
+        # start -> curve points of the run -> end -> back along 0, where start/end is the lower of the run's first/last point
+        # and its outer neighbour (what its interpolation step returns for a curve that never reaches 0)
+        run_starts = np.concatenate(([0], np.flatnonzero(np.diff(cat)) + 1)) if n > 0 else np.empty(0, dtype=np.intp)
+        run_ends = np.append(run_starts[1:], n)
+        # polygons of neighbouring runs overlap by up to one atom step and are semi-transparent, so they are drawn in the old
+        # category order (>90 first, <=50 last) for identical compositing; NaN runs (-1) are dropped
+        order = np.argsort(-cat[run_starts], kind="stable")
+        order = order[cat[run_starts][order] >= 0]
+        run_starts, run_ends = run_starts[order], run_ends[order]
+        prev = np.maximum(run_starts - 1, 0)
+        start_idx = np.where(p[prev] <= p[run_starts], prev, run_starts)
+        last = run_ends - 1
+        nxt = np.minimum(run_ends, n - 1)
+        end_idx = np.where(p[nxt] < p[last], nxt, last)
+        category_colors = np.array([color_vl, color_l, color_h, color_vh])
+        verts = [
+            np.column_stack((np.r_[a, x[s:e], b, x[s:e][::-1]], np.r_[p[a], p[s:e], p[b], np.zeros(e - s)]))
+            for s, e, a, b in zip(run_starts, run_ends, start_idx, end_idx)
+        ]
+        if verts:
+            ax.add_collection(PolyCollection(verts, facecolors=category_colors[cat[run_starts]], alpha=0.7))
+            ax.autoscale_view()
+        # thin outline of the curve on top of the fills (thinner for long tracks, where lines would merge into a band)
+        ax.plot(x, p, color='black', linewidth=0.3 if n > 20000 else 0.5, zorder=5)
 
         # small legend like the reference image
         patches = [
@@ -442,18 +839,10 @@ def plot_local_confidence(full_json_file_path, output_path, chains: Optional[obj
             ax.set_xlim(0, n - 1)
 
         # build contiguous chain blocks for atoms
-        chain_blocks_atoms = []
-        start = 0
-        for i in range(1, n + 1):
-            if i == n or atom_chain_ids_arr[i] != atom_chain_ids_arr[start]:
-                chain_blocks_atoms.append((atom_chain_ids_arr[start], start, i - 1))
-                start = i
-
-        unique_chains_atoms = np.unique(atom_chain_ids_arr)
+        unique_chains_atoms, chain_codes_atoms, chain_blocks_atoms = _chain_blocks(np.asarray(atom_chain_ids_arr))
         if len(unique_chains_atoms) > 1:
             # map chain -> integer color index
-            chain_to_int_atoms = {cid: i for i, cid in enumerate(unique_chains_atoms)}
-            chain_row = np.asarray([chain_to_int_atoms[c] for c in atom_chain_ids_arr]).reshape(1, -1)
+            chain_row = chain_codes_atoms.reshape(1, -1)
 
             # Automatically generate colors based on number of chains
             if len(unique_chains_atoms) <= 20:
@@ -486,9 +875,8 @@ def plot_local_confidence(full_json_file_path, output_path, chains: Optional[obj
                 
         # save figure
         sel_name = "_".join(selected_chains) if selected_chains else "all"
-        plt.savefig(f"{output_path}/{job_name}_{outfilename}_{sel_name}.pdf", bbox_inches='tight')
-        # also save as png, dpi 300
-        plt.savefig(f"{output_path}/{job_name}_{outfilename}_{sel_name}.png", bbox_inches='tight', dpi=300)
+        # as pdf and png (dpi 300)
+        _save_fig_dual(fig, f"{output_path}/{job_name}_{outfilename}_{sel_name}")
         plt.close(fig)
     
     # 3, now we can use the above function to plot atom pLDDT scores
@@ -507,20 +895,9 @@ def plot_local_confidence(full_json_file_path, output_path, chains: Optional[obj
         Statistics include mean, median, std, and confidence category fractions.
         """
 
-        # first we define a function to compute statistics
-        def _stats_from_vals(vals):
-            if vals.size == 0:
-                return (np.nan, np.nan, np.nan, 0.0, 0.0, 0.0, 0.0)
-            mean = float(np.nanmean(vals))
-            median = float(np.nanmedian(vals))
-            std = float(np.nanstd(vals))
-            n = vals.size
-            vh = float(np.sum(vals > 90)) / n
-            h  = float(np.sum((vals <= 90) & (vals > 70))) / n
-            l  = float(np.sum((vals <= 70) & (vals > 50))) / n
-            vl = float(np.sum(vals <= 50)) / n
-            return (mean, median, std, vh, h, l, vl)
-        
+        # statistics of one set of atoms, see _plddt_stats_from_vals() above (numba for very large inputs)
+        _stats_from_vals = _plddt_stats_from_vals
+
         rows = []
         # overall (all atoms)
         rows.append(("All",) + _stats_from_vals(atom_plddt))
@@ -533,9 +910,9 @@ def plot_local_confidence(full_json_file_path, output_path, chains: Optional[obj
         
         # write to tsv file
         with open(f"{output_path}/{job_name}_{outfilename}_plddt_statistics.tsv", "w") as f:
-            f.write("Chain_ID\tMean_pLDDT\tMedian_pLDDT\tStd_pLDDT\tFraction_Very_High(>90)\tFraction_High(90-70)\tFraction_Low(70-50)\tFraction_Very_Low(<=50)\n")
-            for row in rows:
-                f.write("\t".join([f"{x:.2f}" if isinstance(x, float) else str(x) for x in row]) + "\n")
+            lines = ["Chain_ID\tMean_pLDDT\tMedian_pLDDT\tStd_pLDDT\tFraction_Very_High(>90)\tFraction_High(90-70)\tFraction_Low(70-50)\tFraction_Very_Low(<=50)\n"]
+            lines += ["\t".join([f"{x:.2f}" if isinstance(x, float) else str(x) for x in row]) + "\n" for row in rows]
+            f.write("".join(lines))
     # compute and save pLDDT statistics
     _plddt_statistics(
         atom_plddt=atom_plddts,
@@ -10,13 +10,19 @@
 
 
 from typing import Optional, Tuple, List, Union
-from Bio.PDB import MMCIFParser, Polypeptide
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.colors import TwoSlopeNorm
 from matplotlib.patches import Rectangle
 import os
+from concurrent.futures import ThreadPoolExecutor
 import re
+from alphafold3_seqvis_toolkit.utils.structure_utils import load_representative_atoms_cached
+from alphafold3_seqvis_toolkit.utils.matrix_utils import nanpercentile_partition, sample_values, nanmean_fast, pairwise_distance, pairwise_distance_cached, diff_and_abs, downsample_for_display
+from alphafold3_seqvis_toolkit.utils.figure_utils import save_pdf_and_png
+
+# "start1:end1,start2:end2" or "start1-end1,start2-end2" (separators can be mixed), compiled once at import time
+_REGION_PAIR_RE = re.compile(r"\s*(\d+)\s*[:\-]\s*(\d+)\s*,\s*(\d+)\s*[:\-]\s*(\d+)\s*")
 
 def contact_map_diff_monomer(
         mmcif_file_a: str,
@@ -30,11 +36,20 @@ def contact_map_diff_monomer(
         vmax_percentile: float = 95.0,
         vdiff: Optional[float] = None,
         vdiff_percentile: float = 95.0,
+        percentile_sample: Optional[int] = None,
         include_nonstandard_residue: bool = False,
         return_maxtrix = False,
         out_path: Optional[str] = None,
         cmap_dist = "RdBu", 
-        cmap_diff = "seismic"
+        cmap_diff = "seismic",
+        preloaded_a: Optional[dict] = None,
+        preloaded_b: Optional[dict] = None,
+        dtype: str = "float32",
+        dist_backend: str = "blas",
+        device: str = "cpu",
+        dpi: int = 300,
+        png_compress_level: int = 1,
+        mmap_dir: Optional[str] = None
 ):
     """
     Description
@@ -54,12 +69,23 @@ def contact_map_diff_monomer(
         vmax_percentile (float): Percentile value to determine vmax if vmax is None. Defaults to 95.0.
         vdiff (float): Maximum absolute difference value for color bar scaling. If None, it will be determined automatically based on the data. Defaults to None.
         vdiff_percentile (float): Percentile value to determine vdiff if vdiff is
+        percentile_sample (int, optional): Estimate the vmax/vdiff percentiles from this many randomly drawn values (fixed seed) of each map
+            instead of all N*N values, e.g. 65536. Faster for large structures, the color limits may shift slightly. Defaults to None (exact).
 
         include_nonstandard_residue (bool): Whether to include non-standard residues like MSE. Defaults to False.
-        return_maxtrix (bool): Whether to return the contact matrices of the selected regions and related information. Defaults to False.
+        return_maxtrix (bool): Whether to return the contact matrices of the selected regions and related information. Defaults to False. The returned distance matrices are read-only (they are memoized in the process), copy them before modifying. With mmap_dir they are np.memmap views of the .npy files instead.
         cmap_dist (str): Colormap for distance maps. Defaults to "RdBu".(red for close, blue for far)
         cmap_diff (str): Colormap for difference maps. Defaults to "seismic".(red for positive, blue for negative)
         out_path (str, optional): Directory to save the output figure. 
+        preloaded_a (dict, optional): Representative atom table of mmcif_file_a (see utils/structure_utils.py), e.g. from the CLI cache. If provided, mmcif_file_a is not parsed again.
+        preloaded_b (dict, optional): The same for mmcif_file_b.
+        dtype (str): Floating point type of the distance matrices, "float32" (default, faster and half the memory) or "float64".
+        dist_backend (str): How distance matrices are computed, "blas" (default), "numba" or "auto", see pairwise_distance() in utils/matrix_utils.py.
+        device (str): "cpu" (default) or "cuda" (needs cupy) for computing distance matrices.
+        dpi (int): Resolution of the PNG output. Default is 300, lower it (e.g. 150) to save faster for very large structures.
+        png_compress_level (int): zlib level of the PNG output (0-9). Default is 1, ~2x faster to write than 6 (the PIL default) for large heatmaps, the file is ~25% larger, the pixels are the same.
+        mmap_dir (str, optional): Directory to write the 4 (N, N) maps to as .npy files (dist_a, dist_b, diff_ab, diff_ba), they are np.memmap views of these files then,
+            so the OS can page them out, for very large structures (N > ~10000) whose maps do not fit in RAM. Files from a previous call with the same mmap_dir are overwritten. Defaults to None (in memory).
 
     Returns
         None: Displays a 2x2 contact difference map.
@@ -90,6 +116,18 @@ def contact_map_diff_monomer(
         job_b = os.path.basename(mmcif_file_b).split(".")[0]
     job_name = f"{job_a}_{'_'.join(chain_a)}_vs_{job_b}_{'_'.join(chain_b)}"
 
+    # float type of the distance matrices
+    if dtype not in ("float32", "float64"):
+        raise ValueError(f"Invalid dtype: {dtype}, should be 'float32' or 'float64'.")
+    dist_dtype = np.dtype(dtype)
+
+    def _mmap_out(name, n):
+        # (n, n) .npy file in mmap_dir opened as a writable memmap, None if the maps are kept in memory
+        if mmap_dir is None:
+            return None
+        os.makedirs(mmap_dir, exist_ok=True)
+        return np.lib.format.open_memmap(os.path.join(mmap_dir, f"{name}.npy"), mode="w+", dtype=dist_dtype, shape=(n, n))
+
     # we need get the correct region index first
     # _parse_region for single region
     def _parse_region(r):
@@ -113,6 +151,15 @@ def contact_map_diff_monomer(
         """
         supporting format like "start1:end1,start2:end2" or "start1-end1,start2-end2"
         """
+        # fast path: one regex match gives all 4 bounds, instead of several split/strip calls
+        m = _REGION_PAIR_RE.fullmatch(pair_str)
+        if m:
+            s1, e1, s2, e2 = map(int, m.groups())
+            if e1 < s1 or e2 < s2:
+                raise ValueError(f"Illegal region pair format: {pair_str}, end < start.")
+            return ((s1, e1), (s2, e2))
+
+        # otherwise fall back to the general parser, which also gives a more specific error message
         pair_str = pair_str.strip()
         sep = "," if "," in pair_str else None
         if not sep:
@@ -128,7 +175,7 @@ def contact_map_diff_monomer(
     # ⚠️ Of course, we can extend this further, choose C1' for nucleotides, Atom 1 for ligands, etc. And we can compare different types of molecules before and after some treatments.
     # And note that each residue should have only one CA atom, so we can directly use residue index to access CA atom
     # For loading representative atoms from mmcif file for different molecule types, please refer to the module: contact_map_vis_no/Track.py
-    def _load_ca(mmcif_file, target_chain=None,include_nonstandard_residue=False, model_index=0):
+    def _load_ca(mmcif_file, target_chain=None,include_nonstandard_residue=False, model_index=0, preloaded=None):
         """
         Description
         -----------
@@ -140,69 +187,63 @@ def contact_map_diff_monomer(
         target_chain: str or None, chain ID to include. If None, all chains are included.
         include_nonstandard_residue: bool, whether to include non-standard residues like MSE
         model_index: int, index of the model to load (default: 0)
+        preloaded: dict or None, representative atom table of this file from utils/structure_utils.py, skips parsing if provided
 
         Notes
         -----
         - 1, For loading representative atoms from mmcif file for different molecule types, please refer to the module: contact_map_vis_no/Track.py
+        - 2, CA atoms are the "Protein" rows of the shared representative atom table, restricted to standard (non-hetero) records.
         """
         
         # for af3, we generally need only the first model, that is model_0
-        parser = MMCIFParser()
-        # According to SMCRA hierarchy, we need to go through Structure -> Model -> Chain -> Residue -> Atom
-        structure = parser.get_structure('struct', mmcif_file)
-        models = list(structure)
-        if not models:
-            raise ValueError(f"No models found in the mmcif file: {mmcif_file}")
-        # Generally, there is only one model in the mmcif file generated by AlphaFold3
-        model = models[model_index]
-
-        ca_coords, ca_info = [], []
-        for chain in model: 
-            # filter by target_chain if provided
-            if target_chain and chain.id != target_chain:
-                continue
-            for res in chain:
-                hetfield, resseq, icode = res.id # or .get_id()
-                if hetfield != " ":
-                    # that means it's a hetero atom, we skip it
-                    continue
-                if not Polypeptide.is_aa(res, standard=not include_nonstandard_residue):
-                    # that means it's a non-standard residues/amino acids, we also skip it
-                    continue
-                if 'CA' not in res:
-                    # that means there is no CA atom in this residue, we skip it
-                    continue
-                ca = res['CA']
-                # get the coordinate of CA atom
-                ca_coords.append(ca.get_coord())
-                ca_info.append(
-                    {
-                        "chain": chain.id, # like "A"
-                        "resname": res.resname, # like "ALA"
-                        "resseq": resseq, # like position 1(1-based)
-                        "icode": (icode if isinstance(icode, str) and icode.strip() else "") # like 'A' for Thr 80 A，Ser 80 B
-                    }
-                )
-
-        if not ca_coords:
+        # without a preloaded table, the parsed file is memoized in memory (see load_representative_atoms_cached())
+        atoms = preloaded if preloaded is not None else load_representative_atoms_cached(
+            mmcif_file, include_nonstandard_residue=include_nonstandard_residue, model_index=model_index
+        )
+
+        # hetero residues (hetfield != " ") and non-standard residues/amino acids are skipped, only CA atoms are kept
+        mask = (atoms["rtype"] == "Protein") & (atoms["hetfield"] == " ")
+        # filter by target_chain if provided
+        if target_chain:
+            mask &= (atoms["chain"] == target_chain)
+        idx = np.flatnonzero(mask)
+
+        if idx.size == 0:
             raise ValueError(f"No CA atoms found in the mmcif file: {mmcif_file}")
+
+        # the selected rows are kept column by column (structure of arrays), one python dict per residue is only
+        # built for the optional returned summary, see _res_info_records() at the end
+        ca_info = {k: atoms[k][idx] for k in ("chain", "resname", "resseq", "icode")}
         # force convert to np.float32 to save memory
-        return np.asarray(ca_coords, dtype=np.float32), ca_info
+        return np.asarray(atoms["coords"][idx], dtype=np.float32), ca_info
     
-    def _pairwise_dist(ca_coords):
+    def _pairwise_dist(ca_coords, name):
         """
         For a protein structure with N residues(equals N CA atoms), compute the pairwise distance matrix of shape (N, N)
         ca_coords: np.ndarray of shape (N, 3), coordinates of CA atoms
+        name: file name (without .npy) of the matrix in mmap_dir, if set
         """
 
         # genarally we may use double for loop to compute pairwise distance matrix
-        # but here we use broadcasting to accelerate the computation
-        diff = ca_coords[:, None, :] - ca_coords[None, :, :]
-        return np.sqrt(np.sum(diff * diff, axis=-1))
+        # broadcasting materializes an (N, N, 3) temporary, so we use the Gram matrix identity (one GEMM) instead, see utils/matrix_utils.py
+        # memoized on the coordinates: scanning other regions of the same structures in one process reuses both maps
+        # (the returned matrix is shared and read-only, see pairwise_distance_cached())
+        if mmap_dir is not None:
+            # written straight into the memmap, not memoized (that would keep an in-memory copy)
+            return pairwise_distance(ca_coords, dtype=dist_dtype, backend=dist_backend, device=device, out=_mmap_out(name, ca_coords.shape[0]))
+        return pairwise_distance_cached(ca_coords, dtype=dist_dtype, backend=dist_backend, device=device)
     
+    # A and B are independent: when neither table is preloaded (direct python calls, the CLI passes both),
+    # parse the 2 files in 2 threads, like the CLI does, so file reads/decompression of one overlap with parsing of the other
+    if preloaded_a is None and preloaded_b is None and os.path.realpath(mmcif_file_a) != os.path.realpath(mmcif_file_b):
+        with ThreadPoolExecutor(max_workers=2) as ex:
+            future_a = ex.submit(load_representative_atoms_cached, mmcif_file_a, include_nonstandard_residue)
+            future_b = ex.submit(load_representative_atoms_cached, mmcif_file_b, include_nonstandard_residue)
+            preloaded_a, preloaded_b = future_a.result(), future_b.result()
+
     # load ca coordinates and info from mmcif files
-    ca_coords_a, ca_info_a = _load_ca(mmcif_file_a, target_chain=chain_a, include_nonstandard_residue=include_nonstandard_residue)
-    ca_coords_b, ca_info_b = _load_ca(mmcif_file_b, target_chain=chain_b, include_nonstandard_residue=include_nonstandard_residue)
+    ca_coords_a, ca_info_a = _load_ca(mmcif_file_a, target_chain=chain_a, include_nonstandard_residue=include_nonstandard_residue, preloaded=preloaded_a)
+    ca_coords_b, ca_info_b = _load_ca(mmcif_file_b, target_chain=chain_b, include_nonstandard_residue=include_nonstandard_residue, preloaded=preloaded_b)
     # calculate the shape of each protein structure
     # cause we are evaluateing the same protein sequence, so Na should be equal to Nb
     Na, Nb = ca_coords_a.shape[0], ca_coords_b.shape[0]
@@ -238,10 +279,17 @@ def contact_map_diff_monomer(
                 raise ValueError(f"Region {r} is out of bounds for protein size {N} (0-based).")
 
     # calculate pairwise distance matrices for both structures
-    dist_a = _pairwise_dist(ca_coords_a)
-    dist_b = _pairwise_dist(ca_coords_b)
-    diff_ab = dist_a - dist_b
-    diff_ba = - diff_ab
+    dist_a = _pairwise_dist(ca_coords_a, "dist_a")
+    dist_b = _pairwise_dist(ca_coords_b, "dist_b")
+    # |A - B| is only needed for the exact vdiff percentile below, get it in the same pass as A - B (see utils/matrix_utils.py)
+    if vdiff is None and percentile_sample is None:
+        # with mmap_dir, |A - B| goes to diff_ba.npy, B - A reuses its buffer below
+        diff_out = None if mmap_dir is None else (_mmap_out("diff_ab", N), _mmap_out("diff_ba", N))
+        diff_ab, abs_ab = diff_and_abs(dist_a, dist_b, use_numba=(dist_backend == "numba"), out=diff_out)
+    else:
+        diff_ab = np.subtract(dist_a, dist_b, out=_mmap_out("diff_ab", N))
+        abs_ab = None
+    # B - A is built after the color limits below, in the buffer of |A - B| (see there)
 
     # calculate the color bar limits
     # Here, we want to compare the distance maps at the same scale, so we should unify vmax from the real data of both max values
@@ -249,33 +297,55 @@ def contact_map_diff_monomer(
     # But considering that there may be some extreme values in the distance maps and they maybe noise, we use the 95th percentile value instead
     # For minimum value, we do not set 5th percentile, because the minimum distance should be 0 anyway, it is rational
     # So we set the vmax_percentile parmeter to contorl the color bar limits, default is 95.0, and 100 means using the real max value
+    # np.partition based percentile (O(N) selection instead of sorting all N*N values), same value as np.nanpercentile
     if vmax is None:
         vmax_use = float(max(
-            np.nanpercentile(dist_a, vmax_percentile),
-            np.nanpercentile(dist_b, vmax_percentile)
+            nanpercentile_partition(dist_a, vmax_percentile, sample=percentile_sample),
+            nanpercentile_partition(dist_b, vmax_percentile, sample=percentile_sample)
         ))
     else:
         vmax_use = float(vmax)
 
     # the same for vdiff (0 centered)
     if vdiff is None:
-        abs_all = np.abs(np.concatenate([diff_ab.ravel(),diff_ba.ravel()]))
-        vdiff_use = float(np.nanpercentile(abs_all, vdiff_percentile))
+        # |diff_ba| == |diff_ab|, so the percentile over both maps is the percentile of |diff_ab| with every value counted twice
+        # repeat=2 gives exactly that, without concatenating the two N*N maps
+        if percentile_sample is None:
+            # abs_ab is a temporary, so it can be partitioned in place
+            vdiff_use = float(nanpercentile_partition(abs_ab, vdiff_percentile, repeat=2, overwrite_input=True))
+        else:
+            # sub-sampled: only the drawn values of A - B are made absolute, no full |A - B| map is built
+            abs_sample = np.abs(sample_values(diff_ab, percentile_sample))
+            vdiff_use = float(nanpercentile_partition(abs_sample, vdiff_percentile, repeat=2, overwrite_input=True))
     else:
         vdiff_use = float(vdiff)
 
+    # B - A = -(A - B), the (partitioned) values of |A - B| are not needed anymore, so its buffer is reused
+    # instead of allocating another (N, N) map: 4 maps at the peak instead of 5
+    diff_ba = np.negative(diff_ab, out=abs_ab) if abs_ab is not None else np.negative(diff_ab, out=_mmap_out("diff_ba", N))
+    del abs_ab
+
     # set 2x2 subplots, better layout with constrained_layout=True
     fig, axes = plt.subplots(2, 2, figsize=(15, 12), constrained_layout=True)
 
+    # for very large structures, each panel draws a strided view of the map instead of all N*N values,
+    # a panel is never wider than half of the figure, see downsample_for_display() in utils/matrix_utils.py
+    max_px = int(np.ceil(fig.get_figwidth() / 2 * dpi))
+    dist_a_show, extent = downsample_for_display(dist_a, max_px)
+    dist_b_show, _ = downsample_for_display(dist_b, max_px)
+    diff_ab_show, _ = downsample_for_display(diff_ab, max_px)
+    diff_ba_show, _ = downsample_for_display(diff_ba, max_px)
+
     # plot distance map of structure 1, protein marked as A/1
     # A/1
     imA = axes[0,0].imshow(
-        dist_a, 
+        dist_a_show, 
         cmap=cmap_dist,
         vmin=0,
         vmax=vmax_use,
         interpolation="nearest",
-        origin="upper"
+        origin="upper",
+        extent=extent
     )
     # Update titles to show Chain ID
     # axes[0,0].set_title(f"A:{os.path.splitext(os.path.basename(mmcif_file_a))[0].split('_')[1]}")
@@ -286,12 +356,13 @@ def contact_map_diff_monomer(
     # plot distance map of structure 2, protein marked as B/2
     # B/2
     imB = axes[0,1].imshow(
-        dist_b,
+        dist_b_show,
         cmap=cmap_dist,
         vmin=0,
         vmax=vmax_use,
         interpolation="nearest",
-        origin="upper"
+        origin="upper",
+        extent=extent
     )
     # axes[0,1].set_title(f"B:{os.path.splitext(os.path.basename(mmcif_file_b))[0].split('_')[1]}")
     title_b = f"B: {job_b}"
@@ -305,22 +376,24 @@ def contact_map_diff_monomer(
     # Customize color mapping rules for zero-bounded difference data
     norm = TwoSlopeNorm(vmin=-vdiff_use, vcenter=0, vmax=vdiff_use)
     imAB = axes[1,0].imshow(
-        diff_ab,
+        diff_ab_show,
         cmap=cmap_diff,
         norm=norm,
         interpolation="nearest",
-        origin="upper"
+        origin="upper",
+        extent=extent
     )
     axes[1,0].set_title("A - B (A->B: Red = closer, blue = farther)")
 
     # plot distance difference map of structure 2 - structure 1, marked as B-A/2-1
     # B-A/2-1
     imBA = axes[1,1].imshow(
-        diff_ba,
+        diff_ba_show,
         cmap=cmap_diff,
         norm=norm,
         interpolation="nearest",
-        origin="upper"
+        origin="upper",
+        extent=extent
     )
     axes[1,1].set_title("B - A (B->A: Red = closer, blue = farther)")
 
@@ -394,26 +467,41 @@ def contact_map_diff_monomer(
     if out_path:
         # save figure
         sel_name = "_".join(region_pairs) if region_pairs else f"{region_1}" if region_2 is None else f"{region_1}_vs_{region_2}"
-        plt.savefig(f"{out_path}/{job_name}_{sel_name}.pdf", bbox_inches='tight')
-        # also save as png, dpi 300
-        plt.savefig(f"{out_path}/{job_name}_{sel_name}.png", bbox_inches='tight', dpi=300)
+        # pdf + png (dpi 300 by default), see utils/figure_utils.py
+        save_pdf_and_png(fig, f"{out_path}/{job_name}_{sel_name}", dpi=dpi, png_compress_level=png_compress_level)
         plt.close(fig)
 
     
     # return the contact matrices if needed
+    # the summary below (incl. per region pair sub-matrices and means) is only used by the caller, so skip it if not requested
+    if not return_maxtrix:
+        return None
+
+    # per-residue info as a list of dicts (public format of "res_ca_info"), from the column arrays of _load_ca()
+    def _res_info_records(info):
+        return [
+            {
+                "chain": str(chain_id), # like "A"
+                "resname": str(resname), # like "ALA"
+                "resseq": int(resseq), # like position 1(1-based)
+                "icode": (str(icode) if str(icode).strip() else "") # like 'A' for Thr 80 A，Ser 80 B
+            }
+            for chain_id, resname, resseq, icode in zip(info["chain"], info["resname"], info["resseq"], info["icode"])
+        ]
+
     # first, we summary the current result 
     result = {
         "A":{
             "file": mmcif_file_a, # file path
             "N_res": Na, # number of residues of whole protein A
             "dist_matrix": dist_a, # array/matrix of pairwise distance of protein A
-            "res_ca_info": ca_info_a # list of dicts of CA atom info for whole protein A
+            "res_ca_info": _res_info_records(ca_info_a) # list of dicts of CA atom info for whole protein A
         },
         "B":{
             "file": mmcif_file_b,
             "N_res": Nb,
             "dist_matrix": dist_b,
-            "res_ca_info": ca_info_b
+            "res_ca_info": _res_info_records(ca_info_b)
         },
         "Dist_diff":{
             "A-B": diff_ab, # array/matrix of distance difference A - B
@@ -440,16 +528,15 @@ def contact_map_diff_monomer(
             "A-B_sub": sub_ab, # sub-matrix of region ra vs region rb in distance difference A - B
             "B-A_sub": sub_ba, # sub-matrix of region ra vs region rb in distance difference B - A
             "shape": sub_a.shape, # shape of the sub-matrix
-            "mean_A_sub": float(np.nanmean(sub_a)), # mean value of the sub-matrix in structure A
-            "mean_B_sub": float(np.nanmean(sub_b)), # mean value of the sub-matrix in structure B
-            "mean_A-B_sub": float(np.nanmean(sub_ab)), # mean value of the sub-matrix in distance difference A - B
-            "mean_B-A_sub": float(np.nanmean(sub_ba)) # mean value of the sub-matrix in distance difference B - A
+            "mean_A_sub": nanmean_fast(sub_a), # mean value of the sub-matrix in structure A
+            "mean_B_sub": nanmean_fast(sub_b), # mean value of the sub-matrix in structure B
+            "mean_A-B_sub": nanmean_fast(sub_ab), # mean value of the sub-matrix in distance difference A - B
+            "mean_B-A_sub": nanmean_fast(sub_ba) # mean value of the sub-matrix in distance difference B - A
         })
     result["Pairs_detail"] = details
 
-    # finally, we return the result if needed
-    if return_maxtrix:
-        return result
+    # finally, we return the result
+    return result
 
 
 
@@ -9,21 +9,24 @@
 # reference: https://biopython.org/docs/1.75/api/Bio.PDB.html
 
 
-from typing import Optional, Tuple, List, Union
-from Bio.PDB import MMCIFParser, Polypeptide
+from typing import Optional, Tuple, List, Union, Sequence
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.colors import TwoSlopeNorm, ListedColormap 
 from matplotlib.patches import Rectangle
 from mpl_toolkits.axes_grid1.axes_divider import make_axes_locatable
 import os
+from concurrent.futures import ThreadPoolExecutor
 import re
+from alphafold3_seqvis_toolkit.utils.structure_utils import load_representative_atoms_cached
+from alphafold3_seqvis_toolkit.utils.matrix_utils import nanpercentile_partition, sample_values, nanmean_fast, pairwise_distance, pairwise_distance_cached, diff_and_abs, downsample_for_display
+from alphafold3_seqvis_toolkit.utils.figure_utils import save_pdf_and_png
 
 def contact_map_diff_multimer(
         mmcif_file_a: str,
         mmcif_file_b: str,
-        chain_a: str, # Can be "A" or "A,B"
-        chain_b: str, # Can be "C" or "C,D"
+        chain_a: Union[str, Sequence[str]], # Can be "A" or "A,B" or ("A", "B")
+        chain_b: Union[str, Sequence[str]], # Can be "C" or "C,D" or ("C", "D")
         region_1: Union[Tuple[int, int], List[int], str] = None,
         region_2: Optional[Union[Tuple[int, int], List[int], str]] = None,  
         region_pairs: Optional[Union[List[Tuple[Tuple[int, int], Tuple[int, int]]], List[str]]] = None,
@@ -31,12 +34,21 @@ def contact_map_diff_multimer(
         vmax_percentile: float = 95.0,
         vdiff: Optional[float] = None,
         vdiff_percentile: float = 95.0,
+        percentile_sample: Optional[int] = None,
         include_nonstandard_residue: bool = False,
         return_maxtrix = False,
         out_path: Optional[str] = None,
         cmap_dist = "RdBu", 
         cmap_diff = "seismic",
-        tick_step: int = 100 
+        tick_step: int = 100,
+        preloaded_a: Optional[dict] = None,
+        preloaded_b: Optional[dict] = None,
+        dtype: str = "float32",
+        dist_backend: str = "blas",
+        device: str = "cpu",
+        dpi: int = 300,
+        png_compress_level: int = 1,
+        mmap_dir: Optional[str] = None
 ):
     """
     Description
@@ -46,8 +58,8 @@ def contact_map_diff_multimer(
     Args
         mmcif_file_a (str): Path to the first mmcif file.
         mmcif_file_b (str): Path to the second mmcif file.
-        chain_a (str): Chain ID to include from the first mmcif file. We currently do not support None/all-chains option here. Please provide a specific chain ID.
-        chain_b (str): Chain ID to include from the second mmcif file. 
+        chain_a (str | Sequence[str]): Chain ID(s) to include from the first mmcif file, comma-separated ("A,B") or already split (("A", "B"), e.g. from the CLI). We currently do not support None/all-chains option here. Please provide a specific chain ID.
+        chain_b (str | Sequence[str]): Chain ID(s) to include from the second mmcif file. 
         region_1 (Tuple[int, int] | List[int, int]): 0-based Region of interest in the first structure (start, end) or list of residue indices.
             for example, (10, 50) or [10, 11, 12, ..., 50], or [10, 50]
         region_2 (Tuple[int, int] | List[int, int], optional): 0-based Region of interest in the second structure (start, end) or list of residue indices. Defaults to None, which means using region_1.
@@ -56,13 +68,24 @@ def contact_map_diff_multimer(
         vmax_percentile (float): Percentile value to determine vmax if vmax is None. Defaults to 95.0.
         vdiff (float): Maximum absolute difference value for color bar scaling. If None, it will be determined automatically based on the data. Defaults to None.
         vdiff_percentile (float): Percentile value to determine vdiff if vdiff is
+        percentile_sample (int, optional): Estimate the vmax/vdiff percentiles from this many randomly drawn values (fixed seed) of each map
+            instead of all N*N values, e.g. 65536. Faster for large structures, the color limits may shift slightly. Defaults to None (exact).
 
         include_nonstandard_residue (bool): Whether to include non-standard residues like MSE. Defaults to False.
-        return_maxtrix (bool): Whether to return the contact matrices of the selected regions and related information. Defaults to False.
+        return_maxtrix (bool): Whether to return the contact matrices of the selected regions and related information. Defaults to False. The returned distance matrices are read-only (they are memoized in the process), copy them before modifying. With mmap_dir they are np.memmap views of the .npy files instead.
         cmap_dist (str): Colormap for distance maps. Defaults to "RdBu".(red for close, blue for far)
         cmap_diff (str): Colormap for difference maps. Defaults to "seismic".(red for positive, blue for negative)
         out_path (str, optional): Directory to save the output figure. 
         tick_step (int): Step size for ticks on the axes. Defaults to 100.
+        preloaded_a (dict, optional): Representative atom table of mmcif_file_a (see utils/structure_utils.py), e.g. from the CLI cache. If provided, mmcif_file_a is not parsed again.
+        preloaded_b (dict, optional): The same for mmcif_file_b.
+        dtype (str): Floating point type of the distance matrices, "float32" (default, faster and half the memory) or "float64".
+        dist_backend (str): How distance matrices are computed, "blas" (default), "numba" or "auto", see pairwise_distance() in utils/matrix_utils.py.
+        device (str): "cpu" (default) or "cuda" (needs cupy) for computing distance matrices.
+        dpi (int): Resolution of the PNG output. Default is 300, lower it (e.g. 150) to save faster for very large structures.
+        png_compress_level (int): zlib level of the PNG output (0-9). Default is 1, ~2x faster to write than 6 (the PIL default) for large heatmaps, the file is ~25% larger, the pixels are the same.
+        mmap_dir (str, optional): Directory to write the 4 (N, N) maps to as .npy files (dist_a, dist_b, diff_ab, diff_ba), they are np.memmap views of these files then,
+            so the OS can page them out, for very large structures (N > ~10000) whose maps do not fit in RAM. Files from a previous call with the same mmap_dir are overwritten. Defaults to None (in memory).
 
     Returns
         None: Displays a 2x2 contact difference map.
@@ -89,16 +112,31 @@ def contact_map_diff_multimer(
         job_a = os.path.basename(mmcif_file_a).split(".")[0]
         job_b = os.path.basename(mmcif_file_b).split(".")[0]
 
+    # then, we parse chain inputs into lists (the CLI passes them already split)
+    chains_a_list = [c.strip() for c in (chain_a.split(",") if isinstance(chain_a, str) else chain_a)]
+    chains_b_list = [c.strip() for c in (chain_b.split(",") if isinstance(chain_b, str) else chain_b)]
+    chain_a = ",".join(chains_a_list)
+    chain_b = ",".join(chains_b_list)
+
     chain_a_str = chain_a.replace(",", "_")
     chain_b_str = chain_b.replace(",", "_")
     job_name = f"{job_a}_{chain_a_str}_vs_{job_b}_{chain_b_str}"
 
-    # then, we parse chain inputs into lists
-    chains_a_list = [c.strip() for c in chain_a.split(",")]
-    chains_b_list = [c.strip() for c in chain_b.split(",")]
     if len(chains_a_list) != len(chains_b_list):
         raise ValueError(f"Number of chains must match! A: {len(chains_a_list)} vs B: {len(chains_b_list)}")
 
+    # float type of the distance matrices
+    if dtype not in ("float32", "float64"):
+        raise ValueError(f"Invalid dtype: {dtype}, should be 'float32' or 'float64'.")
+    dist_dtype = np.dtype(dtype)
+
+    def _mmap_out(name, n):
+        # (n, n) .npy file in mmap_dir opened as a writable memmap, None if the maps are kept in memory
+        if mmap_dir is None:
+            return None
+        os.makedirs(mmap_dir, exist_ok=True)
+        return np.lib.format.open_memmap(os.path.join(mmap_dir, f"{name}.npy"), mode="w+", dtype=dist_dtype, shape=(n, n))
+
     # Finally, we need get the correct region index first
     # _parse_region for single region
     def _parse_region(r, boundaries=None):
@@ -234,7 +272,7 @@ def contact_map_diff_multimer(
     '''
 
     # Generalized atom loading function
-    def _load_representative_atoms(mmcif_file, target_chains_list, include_nonstandard_residue=False, model_index=0):
+    def _load_representative_atoms(mmcif_file, target_chains_list, include_nonstandard_residue=False, model_index=0, preloaded=None):
         """
         Description
         -----------
@@ -247,107 +285,78 @@ def contact_map_diff_multimer(
         target_chains_list: list of str, chain IDs to include in the specific order provided. If None, all chains are included.
         include_nonstandard_residue: bool, whether to include non-standard residues like MSE
         model_index: int, index of the model to load (default: 0)
+        preloaded: dict or None, representative atom table of this file from utils/structure_utils.py, skips parsing if provided
 
         Notes
         -----
         - 1, For loading representative atoms from mmcif file for different molecule types, please refer to the module: contact_map_vis_no/Track.py
+        - 2, The parsing itself is shared with other modules, see load_representative_atoms() in utils/structure_utils.py
         """
         
         # for af3, we generally need only the first model, that is model_0
-        parser = MMCIFParser()
-        # According to SMCRA hierarchy, we need to go through Structure -> Model -> Chain -> Residue -> Atom
-        structure = parser.get_structure('struct', mmcif_file)
-        models = list(structure)
-        if not models:
-            raise ValueError(f"No models found in the mmcif file: {mmcif_file}")
-        # Generally, there is only one model in the mmcif file generated by AlphaFold3
-        model = models[model_index]
+        # without a preloaded table, the parsed file is memoized in memory (see load_representative_atoms_cached())
+        atoms = preloaded if preloaded is not None else load_representative_atoms_cached(
+            mmcif_file, include_nonstandard_residue=include_nonstandard_residue, model_index=model_index
+        )
+        model_chains = set(atoms["model_chains"].tolist())
 
-        all_coords = []
-        all_info = []
+        selected = [] # row indices into the atom table, in the user-provided chain order
         chain_boundaries = [] # store (chain_id, start_idx, end_idx)
-
         current_idx = 0
-        # Create a lookup dict for chains to avoid repeated looping over the model
-        model_chains = {chain.id: chain for chain in model}
 
         # Iterate strictly according to the user-provided order
         for target_chain_id in target_chains_list:
             if target_chain_id not in model_chains:
                 raise ValueError(f"Chain {target_chain_id} not found in {mmcif_file}")
-            
-            chain = model_chains[target_chain_id]
-            chain_start_idx = current_idx
-
-            for res in chain:
-                # Skip water
-                if res.id[0] == "W": 
-                    continue
-
-                rep_atom = None
-                rtype = "Unknown"
-
-                # 1. Protein -> CA
-                if Polypeptide.is_aa(res, standard=not include_nonstandard_residue):
-                    if 'CA' in res:
-                        rep_atom = res['CA']
-                        rtype = "Protein"
-                
-                # 2. Nucleic Acid -> C1'
-                elif "C1'" in res:
-                    rep_atom = res["C1'"]
-                    rname = res.resname.strip()
-                    if rname in ['DA', 'DT', 'DG', 'DC']: rtype = "DNA"
-                    elif rname in ['A', 'U', 'G', 'C']: rtype = "RNA"
-                    else: rtype = "Nucleic"
-                
-                # 3. Others (Ligands/Ions) -> First Atom
-                else:
-                    # Only include if we want to be permissive, or check specific types
-                    # For comparison, usually we want everything in the chain
-                    atoms = list(res.get_atoms())
-                    if len(atoms) > 0:
-                        rep_atom = atoms[0]
-                        rtype = "Ligand"
-
-                if rep_atom:
-                    all_coords.append(rep_atom.get_coord())
-                    all_info.append({
-                        "chain": chain.id,
-                        "resname": res.resname,
-                        "resseq": res.id[1],
-                        "icode": res.id[2],
-                        "type": rtype
-                    })
-                    current_idx += 1
 
+            rows = np.flatnonzero(atoms["chain"] == target_chain_id)
             # Record boundary if atoms were added for this chain
-            if current_idx > chain_start_idx:
-                chain_boundaries.append((target_chain_id, chain_start_idx, current_idx - 1))
+            if rows.size > 0:
+                selected.append(rows)
+                chain_boundaries.append((target_chain_id, current_idx, current_idx + rows.size - 1))
+                current_idx += rows.size
             else:
                 print(f"Warning: Chain {target_chain_id} found but no valid representative atoms loaded.")
         
-        if not all_coords: 
+        if not selected: 
             raise ValueError(f"No valid atoms found for chains {target_chains_list}.")
+
+        idx = np.concatenate(selected)
+        # the selected rows are kept column by column (structure of arrays), one python dict per residue is only
+        # built for the optional returned summary, see _res_info_records() at the end
+        all_info = {k: atoms[k][idx] for k in ("chain", "resname", "resseq", "icode", "rtype")}
         
-        return np.asarray(all_coords, dtype=np.float32), all_info, chain_boundaries
+        return np.asarray(atoms["coords"][idx], dtype=np.float32), all_info, chain_boundaries
 
 
 
-    def _pairwise_dist(ca_coords):
+    def _pairwise_dist(ca_coords, name):
         """
         For a protein structure with N residues(equals N CA atoms), compute the pairwise distance matrix of shape (N, N)
         ca_coords: np.ndarray of shape (N, 3), coordinates of CA atoms
+        name: file name (without .npy) of the matrix in mmap_dir, if set
         """
 
         # genarally we may use double for loop to compute pairwise distance matrix
-        # but here we use broadcasting to accelerate the computation
-        diff = ca_coords[:, None, :] - ca_coords[None, :, :]
-        return np.sqrt(np.sum(diff * diff, axis=-1))
+        # broadcasting materializes an (N, N, 3) temporary, so we use the Gram matrix identity (one GEMM) instead, see utils/matrix_utils.py
+        # memoized on the coordinates: scanning other regions of the same structures in one process reuses both maps
+        # (the returned matrix is shared and read-only, see pairwise_distance_cached())
+        if mmap_dir is not None:
+            # written straight into the memmap, not memoized (that would keep an in-memory copy)
+            return pairwise_distance(ca_coords, dtype=dist_dtype, backend=dist_backend, device=device, out=_mmap_out(name, ca_coords.shape[0]))
+        return pairwise_distance_cached(ca_coords, dtype=dist_dtype, backend=dist_backend, device=device)
     
+    # A and B are independent: when neither table is preloaded (direct python calls, the CLI passes both),
+    # parse the 2 files in 2 threads, like the CLI does, so file reads/decompression of one overlap with parsing of the other
+    if preloaded_a is None and preloaded_b is None and os.path.realpath(mmcif_file_a) != os.path.realpath(mmcif_file_b):
+        with ThreadPoolExecutor(max_workers=2) as ex:
+            future_a = ex.submit(load_representative_atoms_cached, mmcif_file_a, include_nonstandard_residue)
+            future_b = ex.submit(load_representative_atoms_cached, mmcif_file_b, include_nonstandard_residue)
+            preloaded_a, preloaded_b = future_a.result(), future_b.result()
+
     # load representative atom coordinates and info from mmcif files
-    ca_coords_a, ca_info_a, boundaries_a = _load_representative_atoms(mmcif_file_a, chains_a_list, include_nonstandard_residue=include_nonstandard_residue)
-    ca_coords_b, ca_info_b, boundaries_b = _load_representative_atoms(mmcif_file_b, chains_b_list, include_nonstandard_residue=include_nonstandard_residue)
+    ca_coords_a, ca_info_a, boundaries_a = _load_representative_atoms(mmcif_file_a, chains_a_list, include_nonstandard_residue=include_nonstandard_residue, preloaded=preloaded_a)
+    ca_coords_b, ca_info_b, boundaries_b = _load_representative_atoms(mmcif_file_b, chains_b_list, include_nonstandard_residue=include_nonstandard_residue, preloaded=preloaded_b)
     
     # Validate lengths per chain pair
     # Since we are comparing A+B vs C+D, we expect len(A)=len(C) and len(B)=len(D)
@@ -403,10 +412,17 @@ def contact_map_diff_multimer(
                 raise ValueError(f"Region {r} is out of bounds for protein size {N} (0-based).")
 
     # calculate pairwise distance matrices for both structures
-    dist_a = _pairwise_dist(ca_coords_a)
-    dist_b = _pairwise_dist(ca_coords_b)
-    diff_ab = dist_a - dist_b
-    diff_ba = - diff_ab
+    dist_a = _pairwise_dist(ca_coords_a, "dist_a")
+    dist_b = _pairwise_dist(ca_coords_b, "dist_b")
+    # |A - B| is only needed for the exact vdiff percentile below, get it in the same pass as A - B (see utils/matrix_utils.py)
+    if vdiff is None and percentile_sample is None:
+        # with mmap_dir, |A - B| goes to diff_ba.npy, B - A reuses its buffer below
+        diff_out = None if mmap_dir is None else (_mmap_out("diff_ab", N), _mmap_out("diff_ba", N))
+        diff_ab, abs_ab = diff_and_abs(dist_a, dist_b, use_numba=(dist_backend == "numba"), out=diff_out)
+    else:
+        diff_ab = np.subtract(dist_a, dist_b, out=_mmap_out("diff_ab", N))
+        abs_ab = None
+    # B - A is built after the color limits below, in the buffer of |A - B| (see there)
 
     # calculate the color bar limits
     # Here, we want to compare the distance maps at the same scale, so we should unify vmax from the real data of both max values
@@ -414,25 +430,46 @@ def contact_map_diff_multimer(
     # But considering that there may be some extreme values in the distance maps and they maybe noise, we use the 95th percentile value instead
     # For minimum value, we do not set 5th percentile, because the minimum distance should be 0 anyway, it is rational
     # So we set the vmax_percentile parmeter to contorl the color bar limits, default is 95.0, and 100 means using the real max value
+    # np.partition based percentile (O(N) selection instead of sorting all N*N values), same value as np.nanpercentile
     if vmax is None:
         vmax_use = float(max(
-            np.nanpercentile(dist_a, vmax_percentile),
-            np.nanpercentile(dist_b, vmax_percentile)
+            nanpercentile_partition(dist_a, vmax_percentile, sample=percentile_sample),
+            nanpercentile_partition(dist_b, vmax_percentile, sample=percentile_sample)
         ))
     else:
         vmax_use = float(vmax)
 
     # the same for vdiff (0 centered)
     if vdiff is None:
-        abs_all = np.abs(np.concatenate([diff_ab.ravel(),diff_ba.ravel()]))
-        vdiff_use = float(np.nanpercentile(abs_all, vdiff_percentile))
+        # |diff_ba| == |diff_ab|, so the percentile over both maps is the percentile of |diff_ab| with every value counted twice
+        # repeat=2 gives exactly that, without concatenating the two N*N maps
+        if percentile_sample is None:
+            # abs_ab is a temporary, so it can be partitioned in place
+            vdiff_use = float(nanpercentile_partition(abs_ab, vdiff_percentile, repeat=2, overwrite_input=True))
+        else:
+            # sub-sampled: only the drawn values of A - B are made absolute, no full |A - B| map is built
+            abs_sample = np.abs(sample_values(diff_ab, percentile_sample))
+            vdiff_use = float(nanpercentile_partition(abs_sample, vdiff_percentile, repeat=2, overwrite_input=True))
     else:
         vdiff_use = float(vdiff)
 
+    # B - A = -(A - B), the (partitioned) values of |A - B| are not needed anymore, so its buffer is reused
+    # instead of allocating another (N, N) map: 4 maps at the peak instead of 5
+    diff_ba = np.negative(diff_ab, out=abs_ab) if abs_ab is not None else np.negative(diff_ab, out=_mmap_out("diff_ba", N))
+    del abs_ab
+
     # ----PLOTTING SECTION----
     # set 2x2 subplots, better layout with constrained_layout=True
     fig, axes = plt.subplots(2, 2, figsize=(20, 15))
 
+    # for very large structures, each panel draws a strided view of the map instead of all N*N values,
+    # a panel is never wider than half of the figure, see downsample_for_display() in utils/matrix_utils.py
+    max_px = int(np.ceil(fig.get_figwidth() / 2 * dpi))
+    dist_a_show, extent = downsample_for_display(dist_a, max_px)
+    dist_b_show, _ = downsample_for_display(dist_b, max_px)
+    diff_ab_show, _ = downsample_for_display(diff_ab, max_px)
+    diff_ba_show, _ = downsample_for_display(diff_ba, max_px)
+
     # Titles for each subplot
     title_a = f"A: {job_a}"
     if chain_a: 
@@ -453,12 +490,13 @@ def contact_map_diff_multimer(
     # plot distance map of structure 1, protein marked as A/1
     # A/1
     imA = axes[0,0].imshow(
-        dist_a, 
+        dist_a_show, 
         cmap=cmap_dist,
         vmin=0,
         vmax=vmax_use,
         interpolation="nearest",
-        origin="upper"
+        origin="upper",
+        extent=extent
     )
     # Update titles to show Chain ID
     # axes[0,0].set_title(f"A:{os.path.splitext(os.path.basename(mmcif_file_a))[0].split('_')[1]}")
@@ -469,12 +507,13 @@ def contact_map_diff_multimer(
     # plot distance map of structure 2, protein marked as B/2
     # B/2
     imB = axes[0,1].imshow(
-        dist_b,
+        dist_b_show,
         cmap=cmap_dist,
         vmin=0,
         vmax=vmax_use,
         interpolation="nearest",
-        origin="upper"
+        origin="upper",
+        extent=extent
     )
     # axes[0,1].set_title(f"B:{os.path.splitext(os.path.basename(mmcif_file_b))[0].split('_')[1]}")
     # title_b = f"B: {job_b}"
@@ -488,22 +527,24 @@ def contact_map_diff_multimer(
     # Customize color mapping rules for zero-bounded difference data
     norm = TwoSlopeNorm(vmin=-vdiff_use, vcenter=0, vmax=vdiff_use)
     imAB = axes[1,0].imshow(
-        diff_ab,
+        diff_ab_show,
         cmap=cmap_diff,
         norm=norm,
         interpolation="nearest",
-        origin="upper"
+        origin="upper",
+        extent=extent
     )
     # axes[1,0].set_title("A - B (A->B: Red = closer, blue = farther)")
 
     # plot distance difference map of structure 2 - structure 1, marked as B-A/2-1
     # B-A/2-1
     imBA = axes[1,1].imshow(
-        diff_ba,
+        diff_ba_show,
         cmap=cmap_diff,
         norm=norm,
         interpolation="nearest",
-        origin="upper"
+        origin="upper",
+        extent=extent
     )
     # axes[1,1].set_title("B - A (B->A: Red = closer, blue = farther)")
 
@@ -608,19 +649,22 @@ def contact_map_diff_multimer(
     '''
 
 
-    # Helper: Add Chain Bars & Title
-    def _add_chain_bars_and_title(ax, boundaries, title_text):
-        divider = make_axes_locatable(ax)
+    # Helper: colormap + chain index row of the chain bars, built once per structure (not once per subplot)
+    def _chain_bar_inputs(boundaries):
         n_chains = len(boundaries)
         if n_chains <= 20:
             cmap = plt.get_cmap("tab20", n_chains)
         else:
             cmap = ListedColormap(plt.get_cmap("gist_rainbow")(np.linspace(0.1, 0.9, n_chains)))
 
-        total_len = boundaries[-1][2] + 1
-        chain_row = np.zeros((1, total_len))
-        for i, (_, s, e) in enumerate(boundaries):
-            chain_row[0, s:e+1] = i
+        # boundaries are contiguous from 0, so the row is each chain index repeated over its length
+        lengths = [e - s + 1 for _, s, e in boundaries]
+        chain_row = np.repeat(np.arange(n_chains, dtype=float), lengths)[None, :]
+        return cmap, chain_row
+
+    # Helper: Add Chain Bars & Title
+    def _add_chain_bars_and_title(ax, boundaries, title_text, cmap, chain_row):
+        divider = make_axes_locatable(ax)
             
         # Top Bar
         ax_top = divider.append_axes("top", size="5%", pad=0.05)
@@ -668,6 +712,10 @@ def contact_map_diff_multimer(
         ax.set_yticks([]) 
 
     
+    # the 4 subplots only use 2 sets of boundaries (A for A and the diff maps, B for B)
+    bar_inputs_a = _chain_bar_inputs(boundaries_a)
+    bar_inputs_b = _chain_bar_inputs(boundaries_b)
+
     # Plotting Loop
     for i, ax in enumerate(axes.ravel()):
         # Only mark pairs if NOT default full length
@@ -680,9 +728,10 @@ def contact_map_diff_multimer(
         # Row 1 (Diff) -> boundaries_a (Assuming alignment is perfect, A's boundaries apply)
         
         current_boundaries = boundaries_b if ax == axes[0, 1] else boundaries_a
+        bar_cmap, bar_row = bar_inputs_b if ax == axes[0, 1] else bar_inputs_a
         
         # Add bars and pass title to be set on top axis
-        _add_chain_bars_and_title(ax, current_boundaries, titles[i])
+        _add_chain_bars_and_title(ax, current_boundaries, titles[i], bar_cmap, bar_row)
         
         # Set custom ticks
         _set_custom_ticks(ax, current_boundaries, tick_step)
@@ -708,26 +757,42 @@ def contact_map_diff_multimer(
     if out_path:
         # save figure
         sel_name = "_".join(region_pairs) if region_pairs else f"{region_1}" if region_2 is None else f"{region_1}_vs_{region_2}"
-        plt.savefig(f"{out_path}/{job_name}_{sel_name}.pdf", bbox_inches='tight')
-        # also save as png, dpi 300
-        plt.savefig(f"{out_path}/{job_name}_{sel_name}.png", bbox_inches='tight', dpi=300)
+        # pdf + png (dpi 300 by default), see utils/figure_utils.py
+        save_pdf_and_png(fig, f"{out_path}/{job_name}_{sel_name}", dpi=dpi, png_compress_level=png_compress_level)
         plt.close(fig)
 
     
     # return the contact matrices if needed
+    # the summary below (incl. per region pair sub-matrices and means) is only used by the caller, so skip it if not requested
+    if not return_maxtrix:
+        return None
+
+    # per-residue info as a list of dicts (public format of "res_ca_info"), from the column arrays of _load_representative_atoms()
+    def _res_info_records(info):
+        return [
+            {
+                "chain": str(chain_id),
+                "resname": str(resname),
+                "resseq": int(resseq),
+                "icode": str(icode),
+                "type": str(rtype)
+            }
+            for chain_id, resname, resseq, icode, rtype in zip(info["chain"], info["resname"], info["resseq"], info["icode"], info["rtype"])
+        ]
+
     # first, we summary the current result 
     result = {
         "A":{
             "file": mmcif_file_a, # file path
             "N_res": Na, # number of residues of whole protein A
             "dist_matrix": dist_a, # array/matrix of pairwise distance of protein A
-            "res_ca_info": ca_info_a # list of dicts of CA atom info for whole protein A
+            "res_ca_info": _res_info_records(ca_info_a) # list of dicts of CA atom info for whole protein A
         },
         "B":{
             "file": mmcif_file_b,
             "N_res": Nb,
             "dist_matrix": dist_b,
-            "res_ca_info": ca_info_b
+            "res_ca_info": _res_info_records(ca_info_b)
         },
         "Dist_diff":{
             "A-B": diff_ab, # array/matrix of distance difference A - B
@@ -754,16 +819,15 @@ def contact_map_diff_multimer(
             "A-B_sub": sub_ab, # sub-matrix of region ra vs region rb in distance difference A - B
             "B-A_sub": sub_ba, # sub-matrix of region ra vs region rb in distance difference B - A
             "shape": sub_a.shape, # shape of the sub-matrix
-            "mean_A_sub": float(np.nanmean(sub_a)), # mean value of the sub-matrix in structure A
-            "mean_B_sub": float(np.nanmean(sub_b)), # mean value of the sub-matrix in structure B
-            "mean_A-B_sub": float(np.nanmean(sub_ab)), # mean value of the sub-matrix in distance difference A - B
-            "mean_B-A_sub": float(np.nanmean(sub_ba)) # mean value of the sub-matrix in distance difference B - A
+            "mean_A_sub": nanmean_fast(sub_a), # mean value of the sub-matrix in structure A
+            "mean_B_sub": nanmean_fast(sub_b), # mean value of the sub-matrix in structure B
+            "mean_A-B_sub": nanmean_fast(sub_ab), # mean value of the sub-matrix in distance difference A - B
+            "mean_B-A_sub": nanmean_fast(sub_ba) # mean value of the sub-matrix in distance difference B - A
         })
     result["Pairs_detail"] = details
 
-    # finally, we return the result if needed
-    if return_maxtrix:
-        return result
+    # finally, we return the result
+    return result
 
 
 
@@ -3,7 +3,8 @@ import re
 import json
 import numpy as np
 from typing import Optional, List, Union, Dict, Any
-from Bio.PDB import MMCIFParser, Polypeptide
+from alphafold3_seqvis_toolkit.utils.structure_utils import load_representative_atoms_cached
+from alphafold3_seqvis_toolkit.utils.matrix_utils import pairwise_distance_cached, downsample_for_display, contact_distance
 from matplotlib.colors import ListedColormap
 import matplotlib.pyplot as plt
 
@@ -12,6 +13,7 @@ import matplotlib.pyplot as plt
 
 import matplotlib.gridspec as gridspec
 from alphafold3_seqvis_toolkit.utils.track_utils import parse_bed_to_track_data
+from alphafold3_seqvis_toolkit.utils.figure_utils import save_pdf_and_png
 
 def contact_map_vis_with_track(
     mmcif_file: str,
@@ -20,7 +22,14 @@ def contact_map_vis_with_track(
     cmap: str = "RdBu", # Set RdBu so Red is close (contact), Blue is far, or coolwarm_r
     track_bed_file: Optional[str] = None,
     color_config: Optional[str] = "tab10",
-    tick_step: int = 100
+    tick_step: int = 100,
+    preloaded: Optional[Dict[str, Any]] = None,
+    dist_backend: str = "blas",
+    device: str = "cpu",
+    dpi: int = 300,
+    png_compress_level: int = 1,
+    dtype: str = "float32",
+    contact_cutoff: Optional[float] = None
 ):
     """
     Description
@@ -45,6 +54,13 @@ def contact_map_vis_with_track(
               or {"IDR": "red", "Domain": "tab10"}
         Anyway, we will input something whose format like above to parameter color in parse_bed_to_track_data() function in track_utils.py.
         tick_step (int): Step size for ticks on the axes. Default is 100.
+        preloaded (dict, optional): Representative atom table of mmcif_file (see utils/structure_utils.py), e.g. from the CLI cache. If provided, mmcif_file is not parsed again.
+        dist_backend (str): How the distance matrix is computed, "blas" (default), "numba" or "auto", see pairwise_distance() in utils/matrix_utils.py.
+        device (str): "cpu" (default) or "cuda" (needs cupy) for computing the distance matrix.
+        dpi (int): Resolution of the PNG output. Default is 300, lower it (e.g. 150) to save faster for very large structures.
+        png_compress_level (int): zlib level of the PNG output (0-9). Default is 1, ~2x faster to write than 6 (the PIL default) for large heatmaps, the file is ~25% larger, the pixels are the same.
+        dtype (str): Floating point type of the distance matrix, "float32" (default, coordinates are parsed as float32) or "float64".
+        contact_cutoff (float, optional): Contact distance (Angstrom). If set, only pairs within it are computed (KD-tree) and the colors saturate at it, see contact_distance() in utils/matrix_utils.py.
     
     Notes
     ------
@@ -63,6 +79,7 @@ def contact_map_vis_with_track(
                 "track_type": "categiorical" or "numerical",
                 "color": "red" or {"A": "red", "B": "blue"} or "tab10",
                 "track_data": {"A": [0.1, ...], "B": [0.5, ...]}, # Lists must match residue count
+                "categories": ["Domain1", ...], # categorical tracks: track_data holds integer codes into this list, -1 for none
             }]
     - 5, The track bed file must be 0-based indexed!
     - 6, The track data is bed format, and color config data is either colormap name or json file path.
@@ -77,76 +94,35 @@ def contact_map_vis_with_track(
         job_name = os.path.basename(mmcif_file).split(".")[0]
 
     # for computing contact map, we need to load the structure and extract representative atoms
-    def _load_representative_atoms(mmcif_path, target_chains=None):
-        parser = MMCIFParser(QUIET=True)
-        structure = parser.get_structure('struct', mmcif_path)
+    def _load_representative_atoms(mmcif_path, target_chains=None, preloaded=None):
+        # parsing is shared with other modules, see load_representative_atoms() in utils/structure_utils.py
         # AF3 usually has model 0
-        model = structure[0]
+        # Note that HETATM residues are included here, cause Zn2+ is HETATM, so we don't skip them (water is skipped)
+        # without a preloaded table, the parsed file is memoized in memory (see load_representative_atoms_cached()),
+        # plotting the same structure again in this process (other chains, tracks or settings) skips parsing
+        atoms = preloaded if preloaded is not None else load_representative_atoms_cached(mmcif_path)
 
-        coords = []
-        chain_labels = [] 
-        res_types = [] # Track type for info   
-        res_ids = [] # Store residue IDs for chain-based indexing if needed           
-        
         # Normalize target_chains
         if isinstance(target_chains, str):
             target_chains = {target_chains}
         elif isinstance(target_chains, (list, tuple)):
             target_chains = set(target_chains)
-        
-        found_chains = set()
 
-        for chain in model:
-            if target_chains is not None and chain.id not in target_chains:
-                continue
-            
-            for res in chain:
-                # Skip water 
-                if res.id[0] == "W": continue   
-                # Note that HETATM residues are included here, cause Zn2+ is HETATM, so we don't skip them
-                # but if we want to skip other HETATMs, we can add more conditions here.
-                # like: if res.id[0].startswith("H_"): continue
- 
-                rep_atom = None      
-                rtype = "Unknown"
-
-                # 1. Protein -> CA
-                if Polypeptide.is_aa(res, standard=True):
-                    if 'CA' in res:
-                        rep_atom = res['CA']
-                        rtype = "Protein"
-                
-                # 2. Nucleic Acid -> C1' (Distinguish DNA/RNA)
-                elif "C1'" in res:
-                    rep_atom = res["C1'"]
-                    rname = res.resname.strip()
-                    if rname in ['DA', 'DT', 'DG', 'DC']:
-                        rtype = "DNA"
-                    elif rname in ['A', 'U', 'G', 'C']:
-                        rtype = "RNA"
-                    else:
-                        rtype = "Nucleic" # Fallback for modified bases
-                
-                # 3. Others (Ligands/Ions) -> First Atom
-                else:
-                    atoms = list(res.get_atoms())
-                    if len(atoms) > 0:
-                        rep_atom = atoms[0]
-                        rtype = "Ligand"
-
-                if rep_atom:
-                    coords.append(rep_atom.get_coord())
-                    chain_labels.append(chain.id)
-                    res_types.append(rtype)
-                    res_ids.append(res.id[1]) # residue sequence number, 1-based
-                    found_chains.add(chain.id)
-
-        if not coords:
+        if target_chains is not None:
+            idx = np.flatnonzero(np.isin(atoms["chain"], list(target_chains)))
+        else:
+            idx = np.arange(atoms["chain"].shape[0])
+
+        if idx.size == 0:
             msg = f"No valid atoms found in {mmcif_path}."
             if target_chains: msg += f" (Searched for chains: {target_chains})"
             raise ValueError(msg)
 
-        return np.array(coords, dtype=np.float32), chain_labels, res_ids, sorted(list(found_chains))
+        chain_labels = atoms["chain"][idx].tolist()
+        res_ids = atoms["resseq"][idx].tolist() # residue sequence number, 1-based
+        found_chains = set(chain_labels)
+
+        return np.asarray(atoms["coords"][idx], dtype=np.float32), chain_labels, res_ids, sorted(list(found_chains))
 
 
     # We need 1D track data support here 
@@ -165,57 +141,60 @@ def contact_map_vis_with_track(
         Notes
         -----
         - 1, The track_cfg is 0-based index !
+        - 2, Returns float64 values (nan for missing) for numerical tracks,
+        integer category codes (-1 for missing) for categorical tracks, see parse_bed_to_track_data().
         """
         
         # check first
         if not track_cfg or "track_data" not in track_cfg:
             return None
         
-        full_data = []
         # our data
         raw_data = track_cfg["track_data"]
 
-        # we traverse all residues in the structure
-        current_chain = None
-        res_counter = 0
-
-        # Align data, we calculate residue index per chain
-        for cid in chain_labels_list:
-            if cid != current_chain:
-                current_chain = cid
-                res_counter = 0 # Note that track_cfg is 0-based index!
-            else:
-                res_counter += 1
-
-            # default value is nan
-            val = np.nan
-
-            # check the raw_data
-            if cid in raw_data:
-                chain_data = raw_data[cid]
-                # get bed value, default is nan
-                # ⚠️ res_counter is 0-based index, chain_data is from track bed file, also 0-based index
-                val = chain_data.get(res_counter, np.nan)
-
-            # now we get the value for this residue
-            full_data.append(val)
+        # the residue counter restarts at every change of chain id, so each run of equal chain ids is one chain:
+        # only the runs are visited, and only the bed entries of a run are written (nan everywhere else)
+        labels = np.asarray(chain_labels_list)
+        if track_cfg.get("track_type") == "categorical":
+            full_data = np.full(labels.size, -1, dtype=np.int64)
+        else:
+            full_data = np.full(labels.size, np.nan, dtype=np.float64)
+        if labels.size == 0:
+            return full_data
+        starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+        ends = np.r_[starts[1:], labels.size]
+
+        for s, e in zip(starts, ends):
+            chain_data = raw_data.get(labels[s])
+            if chain_data is None:
+                continue
+            # ⚠️ chain_data is indexed by the 0-based residue index within the chain (bed file), the same as the restarted counter,
+            # so the run is one slice copy (nan / -1 where the bed has no value, like the default)
+            n = min(len(chain_data), e - s)
+            full_data[s:s + n] = chain_data[:n]
         # full_data now contains aligned values for all residues/rep atoms in the structure, whether the chain is present in track_data or not
-        # that means, full_data is bed value aligned to chains in config_track, and nan for missing data
-        # value column in track data can be numerical or categorical (str), so we just keep it 
-        return np.asarray(full_data, dtype=object)
+        # that means, full_data is bed value (or category code) aligned to chains in config_track, and nan (-1) for missing data
+        return full_data
+
 
 
+    if dtype not in ("float32", "float64"):
+        raise ValueError(f"Invalid dtype: {dtype}, should be 'float32' or 'float64'.")
 
     # 1. Load Data
     # ⚠️ Note that res_ids from mmCIF are 1-based residue numbers ！
-    coords, chain_labels, res_ids, loaded_chains = _load_representative_atoms(mmcif_file, chains)
+    coords, chain_labels, res_ids, loaded_chains = _load_representative_atoms(mmcif_file, chains, preloaded=preloaded)
     N = coords.shape[0] # number of tokens/representative atoms/residues
     print(f"Loaded {N} tokens from chains: {loaded_chains}")
 
     # 2. Compute Distance Matrix
-    # shape (N, 1, 3) - (1, N, 3) -> (N, N, 3)
-    diff = coords[:, None, :] - coords[None, :, :]
-    dist_matrix = np.sqrt(np.sum(diff**2, axis=-1))
+    # Gram matrix identity (one GEMM) instead of the (N, N, 3) broadcast temporary, see utils/matrix_utils.py
+    # memoized: plotting the same chains again in this process (e.g. other tick_step/cmap) skips the recomputation
+    if contact_cutoff is not None:
+        # contacts only: the pairs within the cutoff from a KD-tree, every other cell is the cutoff (same color anyway)
+        dist_matrix = contact_distance(coords, contact_cutoff, dtype=np.dtype(dtype))
+    else:
+        dist_matrix = pairwise_distance_cached(coords, dtype=np.dtype(dtype), backend=dist_backend, device=device)
 
     # 3. Prepare Tracks
     # first, we parse the color config if it's a json file path
@@ -292,35 +271,38 @@ def contact_map_vis_with_track(
     # Logic similar to confidence_metrics_plot.py
     # we parametrize tick_step for flexibility
     # tick_step = 100 # Show tick every 100 residues
-    xticks_loc = []
-    xticks_labels = []
-    
-    # Note again, res_ids from _load_representative_atoms() are 1-based residue numbers !
-    for i, (r_id, c_id) in enumerate(zip(res_ids, chain_labels)):
-        # Check if it is the start of a new chain
-        is_chain_start = (i == 0) or (chain_labels[i] != chain_labels[i-1])
-        
-        # now we calculate 0-based index
-        r_id_0b = r_id - 1
-
-        # Add tick if it's chain start or a multiple of tick_step
-        # for example, residue 0-99, and res 100 is another 100-length segment, so we need to put tick at res 0 and res 100
-        if is_chain_start or (r_id_0b % tick_step == 0):
-            xticks_loc.append(i)
-            xticks_labels.append(str(r_id_0b))
+    # a tick at every chain start and at every multiple of tick_step (0-based residue number), over the whole residue array at once
+    # (numpy uses floored modulo for ints like Python, so negative residue numbers get the same ticks)
+    chain_arr = np.asarray(chain_labels)
+    res_0b = np.asarray(res_ids, dtype=np.int64) - 1 # 0-based residue numbers
+    is_chain_start = np.ones(res_0b.size, dtype=bool)
+    is_chain_start[1:] = chain_arr[1:] != chain_arr[:-1]
+    keep = is_chain_start | (res_0b % tick_step == 0)
+    xticks_loc = np.flatnonzero(keep).tolist()
+    xticks_labels = [str(r) for r in res_0b[keep].tolist()]
 
 
 
     # --- Plot Main Heatmap ---
     ax_main = fig.add_subplot(gs[main_row_idx, main_col_idx])
+    # very large maps are drawn as a strided view (>= 1 value per output pixel) instead of all N*N values,
+    # see downsample_for_display() in utils/matrix_utils.py, the heatmap is never wider than the figure
+    dist_show, extent = downsample_for_display(dist_matrix, int(np.ceil(fig.get_figwidth() * dpi)))
     im = ax_main.imshow(
-        dist_matrix,
+        dist_show,
         cmap=cmap,
         origin="upper",
         vmin=0,
+        # the cutoff for contact maps, otherwise the automatic vmax of the full map (the strided view may miss the maximum)
+        vmax=(contact_cutoff if contact_cutoff is not None else None if extent is None else float(np.nanmax(dist_matrix))),
         interpolation="nearest",
-        aspect='auto' # Important for GridSpec
+        aspect='auto', # Important for GridSpec
+        extent=extent
     )
+    if extent is not None:
+        # same framing as the full map, the strided view can cover a few cells beyond N
+        ax_main.set_xlim(-0.5, dist_matrix.shape[1] - 0.5)
+        ax_main.set_ylim(dist_matrix.shape[0] - 0.5, -0.5)
     ax_main.set_yticks([]) # Hide Y ticks
     ax_main.set_xlabel("Residue Index", fontsize=12)
     ax_main.set_xticks(xticks_loc)
@@ -332,16 +314,14 @@ def contact_map_vis_with_track(
     cbar.set_label("Distance (Å)", fontsize=12)
 
     # --- Prepare Chain Blocks ---
-    chain_blocks = []
-    start = 0
-    for i in range(1, N + 1):
-        if i == N or chain_labels[i] != chain_labels[start]:
-            chain_blocks.append((chain_labels[start], start, i - 1))
-            start = i
+    # runs of equal chain labels from the chain changes (chain_arr from the ticks above), one python step per chain
+    # instead of per residue, same (chain, start, end) tuples
+    bounds = np.r_[0, np.flatnonzero(chain_arr[1:] != chain_arr[:-1]) + 1, N].tolist()
+    chain_blocks = [(chain_labels[s], s, e - 1) for s, e in zip(bounds[:-1], bounds[1:])]
     
-    unique_chains = sorted(list(set(chain_labels)))
-    chain_to_int = {cid: i for i, cid in enumerate(unique_chains)}
-    chain_row = np.array([chain_to_int[c] for c in chain_labels]).reshape(1, -1)
+    # sorted unique chain ids and the index of each residue's chain in one C pass (same order as sorted(set(...)))
+    unique_chains, chain_codes = np.unique(np.asarray(chain_labels), return_inverse=True)
+    chain_row = chain_codes.reshape(1, -1)
     
     if len(unique_chains) <= 20: 
         cmap_chains = plt.get_cmap("tab20", len(unique_chains))
@@ -403,20 +383,18 @@ def contact_map_vis_with_track(
             # Use imshow for categorical data (cleaner than bar)
             # 1. Map categories to integers
             # Handle NaNs by assigning them to -1 or a specific index
-            str_vals = [str(v) for v in track_vals]
-            # Get color map
+            # track_vals are codes into the sorted track categories (-1 for background), only the categories present in
+            # this structure get a color, renumbered 0.. in sorted order ("nan" values in the bed count as background)
+            categories = track_cfg.get("categories", [])
             color_map = t_color if isinstance(t_color, dict) else {}
-            
-            # Create a list of colors for the colormap
-            # We need to ensure the integer mapping matches the colormap order
-            unique_cats = sorted(list(set([v for v in str_vals if v != "nan"])))
-            cat_to_int = {cat: i for i, cat in enumerate(unique_cats)}
-            
+            present = np.unique(track_vals[track_vals >= 0])
+            present = present[np.array([categories[c] != "nan" for c in present], dtype=bool)].astype(np.int64)
+            unique_cats = [categories[c] for c in present]
+
             # Create integer array for imshow
             int_row = np.full((1, N), -1) # -1 for background/nan
-            for idx, v in enumerate(str_vals):
-                if v in cat_to_int:
-                    int_row[0, idx] = cat_to_int[v]
+            hit = np.isin(track_vals, present)
+            int_row[0, hit] = np.searchsorted(present, track_vals[hit])
             
             # Create Colormap
             # Colors must match the integer indices
@@ -549,6 +527,6 @@ def contact_map_vis_with_track(
     # Title (Set on the top-most track axes or figure)
     fig.suptitle(f"Contact Map: {job_name}", fontsize=16, y=0.9) # default y=0.98
 
-    plt.savefig(f"{out_path}/{job_name}_contact_map.pdf", bbox_inches='tight')
-    plt.savefig(f"{out_path}/{job_name}_contact_map.png", bbox_inches='tight', dpi=300)
+    # pdf + png (dpi 300 by default), see utils/figure_utils.py
+    save_pdf_and_png(fig, f"{out_path}/{job_name}_contact_map", dpi=dpi, png_compress_level=png_compress_level)
     plt.close(fig)
@@ -2,7 +2,9 @@ import os
 import re
 import numpy as np
 from typing import Optional, List, Union, Dict, Any
-from Bio.PDB import MMCIFParser, Polypeptide
+from alphafold3_seqvis_toolkit.utils.structure_utils import load_representative_atoms_cached
+from alphafold3_seqvis_toolkit.utils.matrix_utils import pairwise_distance_cached, downsample_for_display, contact_distance
+from alphafold3_seqvis_toolkit.utils.figure_utils import save_pdf_and_png
 from matplotlib.colors import ListedColormap
 import matplotlib.pyplot as plt
 from mpl_toolkits.axes_grid1.axes_divider import make_axes_locatable
@@ -12,7 +14,14 @@ def contact_map_vis_without_track(
     chains: Optional[Union[str, List[str]]] = None,
     out_path: Optional[str] = None,
     cmap: str = "RdBu", # Reversed RdBu_r so Red is close (contact), Blue is far
-    tick_step: int = 100
+    tick_step: int = 100,
+    preloaded: Optional[Dict[str, Any]] = None,
+    dist_backend: str = "blas",
+    device: str = "cpu",
+    dpi: int = 300,
+    png_compress_level: int = 1,
+    dtype: str = "float32",
+    contact_cutoff: Optional[float] = None
 ):
     """
     Description
@@ -29,6 +38,13 @@ def contact_map_vis_without_track(
         out_path (str, optional): Path to save the output plot (e.g., "/data2").
         cmap (str): Colormap to use. Default is "RdBu" (Red=Close, Blue=Far).
         tick_step (int): Step size for ticks on the axes. Default is 100.
+        preloaded (dict, optional): Representative atom table of mmcif_file (see utils/structure_utils.py), e.g. from the CLI cache. If provided, mmcif_file is not parsed again.
+        dist_backend (str): How the distance matrix is computed, "blas" (default), "numba" or "auto", see pairwise_distance() in utils/matrix_utils.py.
+        device (str): "cpu" (default) or "cuda" (needs cupy) for computing the distance matrix.
+        dpi (int): Resolution of the PNG output. Default is 300, lower it (e.g. 150) to save faster for very large structures.
+        png_compress_level (int): zlib level of the PNG output (0-9). Default is 1, ~2x faster to write than 6 (the PIL default) for large heatmaps, the file is ~25% larger, the pixels are the same.
+        dtype (str): Floating point type of the distance matrix, "float32" (default, coordinates are parsed as float32) or "float64".
+        contact_cutoff (float, optional): Contact distance (Angstrom). If set, only pairs within it are computed (KD-tree) and the colors saturate at it, see contact_distance() in utils/matrix_utils.py.
     
     Notes
     ------
@@ -43,87 +59,53 @@ def contact_map_vis_without_track(
         # fallback to general naming in case it is not standard AF3 mmcif file
         job_name = os.path.basename(mmcif_file).split(".")[0]
 
-    def _load_representative_atoms(mmcif_path, target_chains=None):
-        parser = MMCIFParser(QUIET=True)
-        structure = parser.get_structure('struct', mmcif_path)
+    def _load_representative_atoms(mmcif_path, target_chains=None, preloaded=None):
+        # parsing is shared with other modules, see load_representative_atoms() in utils/structure_utils.py
         # AF3 usually has model 0
-        model = structure[0]
+        # Note that HETATM residues are included here, cause Zn2+ is HETATM, so we don't skip them (water is skipped)
+        # without a preloaded table, the parsed file is memoized in memory (see load_representative_atoms_cached()),
+        # plotting the same structure again in this process (other chains, tracks or settings) skips parsing
+        atoms = preloaded if preloaded is not None else load_representative_atoms_cached(mmcif_path)
 
-        coords = []
-        chain_labels = [] 
-        res_types = [] # Track type for info    
-        res_ids = [] # Store residue IDs for tick labeling          
-        
         # Normalize target_chains
         if isinstance(target_chains, str):
             target_chains = {target_chains}
         elif isinstance(target_chains, (list, tuple)):
             target_chains = set(target_chains)
-        
-        found_chains = set()
 
-        for chain in model:
-            if target_chains is not None and chain.id not in target_chains:
-                continue
-            
-            for res in chain:
-                # Skip water 
-                if res.id[0] == "W": continue   
-                # Note that HETATM residues are included here, cause Zn2+ is HETATM, so we don't skip them
-                # but if we want to skip other HETATMs, we can add more conditions here.
-                # like: if res.id[0].startswith("H_"): continue
- 
-                rep_atom = None      
-                rtype = "Unknown"
-
-                # 1. Protein -> CA
-                if Polypeptide.is_aa(res, standard=True):
-                    if 'CA' in res:
-                        rep_atom = res['CA']
-                        rtype = "Protein"
-                
-                # 2. Nucleic Acid -> C1' (Distinguish DNA/RNA)
-                elif "C1'" in res:
-                    rep_atom = res["C1'"]
-                    rname = res.resname.strip()
-                    if rname in ['DA', 'DT', 'DG', 'DC']:
-                        rtype = "DNA"
-                    elif rname in ['A', 'U', 'G', 'C']:
-                        rtype = "RNA"
-                    else:
-                        rtype = "Nucleic" # Fallback for modified bases
-                
-                # 3. Others (Ligands/Ions) -> First Atom
-                else:
-                    atoms = list(res.get_atoms())
-                    if len(atoms) > 0:
-                        rep_atom = atoms[0]
-                        rtype = "Ligand"
-
-                if rep_atom:
-                    coords.append(rep_atom.get_coord())
-                    chain_labels.append(chain.id)
-                    res_types.append(rtype)
-                    res_ids.append(res.id[1]) # Capture 1-based residue ID
-                    found_chains.add(chain.id)
-
-        if not coords:
+        if target_chains is not None:
+            idx = np.flatnonzero(np.isin(atoms["chain"], list(target_chains)))
+        else:
+            idx = np.arange(atoms["chain"].shape[0])
+
+        if idx.size == 0:
             msg = f"No valid atoms found in {mmcif_path}."
             if target_chains: msg += f" (Searched for chains: {target_chains})"
             raise ValueError(msg)
 
-        return np.array(coords, dtype=np.float32), chain_labels, res_ids, sorted(list(found_chains))
+        chain_labels = atoms["chain"][idx].tolist()
+        res_ids = atoms["resseq"][idx].tolist() # residue sequence number, 1-based
+        found_chains = set(chain_labels)
+
+        return np.asarray(atoms["coords"][idx], dtype=np.float32), chain_labels, res_ids, sorted(list(found_chains))
+
+    if dtype not in ("float32", "float64"):
+        raise ValueError(f"Invalid dtype: {dtype}, should be 'float32' or 'float64'.")
 
     # 1. Load Data
     # ⚠️ Note that res_ids are 1-based residue numbers from the mmCIF file
-    coords, chain_labels, res_ids, loaded_chains = _load_representative_atoms(mmcif_file, chains)
+    coords, chain_labels, res_ids, loaded_chains = _load_representative_atoms(mmcif_file, chains, preloaded=preloaded)
     N = coords.shape[0] # number of tokens/representative atoms/residues
     print(f"Loaded {N} tokens from chains: {loaded_chains}")
 
     # 2. Compute Distance Matrix
-    # shape (N, 1, 3) - (1, N, 3) -> (N, N, 3)
-    diff = coords[:, None, :] - coords[None, :, :]
-    dist_matrix = np.sqrt(np.sum(diff**2, axis=-1))
+    # Gram matrix identity (one GEMM) instead of the (N, N, 3) broadcast temporary, see utils/matrix_utils.py
+    # memoized: plotting the same chains again in this process (e.g. other tick_step/cmap) skips the recomputation
+    if contact_cutoff is not None:
+        # contacts only: the pairs within the cutoff from a KD-tree, every other cell is the cutoff (same color anyway)
+        dist_matrix = contact_distance(coords, contact_cutoff, dtype=np.dtype(dtype))
+    else:
+        dist_matrix = pairwise_distance_cached(coords, dtype=np.dtype(dtype), backend=dist_backend, device=device)
 
     # 3. Plotting
     fig, ax = plt.subplots(figsize=(15, 12))
@@ -131,28 +113,33 @@ def contact_map_vis_without_track(
     # Calculate Ticks Logic (Same as in with_track module)
     # we parametrize tick_step for flexibility
     # tick_step = 100 # Show tick every 100 residues
-    xticks_loc = []
-    xticks_labels = []
-
-    for i, (r_id, c_id) in enumerate(zip(res_ids, chain_labels)):
-        # Check if it is the start of a new chain
-        is_chain_start = (i == 0) or (chain_labels[i] != chain_labels[i-1])
-        
-        # Convert to 0-based index (PDB is 1-based)
-        r_id_0b = r_id - 1
-
-        # Add tick if it's chain start or a multiple of tick_step
-        if is_chain_start or (r_id_0b % tick_step == 0):
-            xticks_loc.append(i)
-            xticks_labels.append(str(r_id_0b))
+    # a tick at every chain start and at every multiple of tick_step (0-based residue number), over the whole residue array at once
+    # (numpy uses floored modulo for ints like Python, so negative residue numbers get the same ticks)
+    chain_arr = np.asarray(chain_labels)
+    res_0b = np.asarray(res_ids, dtype=np.int64) - 1 # 0-based residue numbers
+    is_chain_start = np.ones(res_0b.size, dtype=bool)
+    is_chain_start[1:] = chain_arr[1:] != chain_arr[:-1]
+    keep = is_chain_start | (res_0b % tick_step == 0)
+    xticks_loc = np.flatnonzero(keep).tolist()
+    xticks_labels = [str(r) for r in res_0b[keep].tolist()]
     
+    # very large maps are drawn as a strided view (>= 1 value per output pixel) instead of all N*N values,
+    # see downsample_for_display() in utils/matrix_utils.py, the heatmap is never wider than the figure
+    dist_show, extent = downsample_for_display(dist_matrix, int(np.ceil(fig.get_figwidth() * dpi)))
     im = ax.imshow(
-        dist_matrix,
+        dist_show,
         cmap=cmap,
         origin="upper",
         vmin=0,
-        interpolation="nearest" 
+        # the cutoff for contact maps, otherwise the automatic vmax of the full map (the strided view may miss the maximum)
+        vmax=(contact_cutoff if contact_cutoff is not None else None if extent is None else float(np.nanmax(dist_matrix))),
+        interpolation="nearest",
+        extent=extent
     )
+    if extent is not None:
+        # same framing as the full map, the strided view can cover a few cells beyond N
+        ax.set_xlim(-0.5, dist_matrix.shape[1] - 0.5)
+        ax.set_ylim(dist_matrix.shape[0] - 0.5, -0.5)
     
     # Create divider for existing axes instance
     divider = make_axes_locatable(ax)
@@ -173,16 +160,14 @@ def contact_map_vis_without_track(
     cbar.set_label("Distance (Å)", fontsize=12)
 
     # Prepare chain blocks and colors
-    chain_blocks = []
-    start = 0
-    for i in range(1, N + 1):
-        if i == N or chain_labels[i] != chain_labels[start]:
-            chain_blocks.append((chain_labels[start], start, i - 1))
-            start = i
+    # runs of equal chain labels from the chain changes (chain_arr from the ticks above), one python step per chain
+    # instead of per residue, same (chain, start, end) tuples
+    bounds = np.r_[0, np.flatnonzero(chain_arr[1:] != chain_arr[:-1]) + 1, N].tolist()
+    chain_blocks = [(chain_labels[s], s, e - 1) for s, e in zip(bounds[:-1], bounds[1:])]
             
-    unique_chains = sorted(list(set(chain_labels)))
-    chain_to_int = {cid: i for i, cid in enumerate(unique_chains)}
-    chain_row = np.array([chain_to_int[c] for c in chain_labels]).reshape(1, -1)
+    # sorted unique chain ids and the index of each residue's chain in one C pass (same order as sorted(set(...)))
+    unique_chains, chain_codes = np.unique(np.asarray(chain_labels), return_inverse=True)
+    chain_row = chain_codes.reshape(1, -1)
     
     # Use tab20 for distinct chain colors
     if len(unique_chains) <= 20:
@@ -228,7 +213,6 @@ def contact_map_vis_without_track(
     ax.set_ylabel("Residue Index", fontsize=12) 
 
     # 4. Save Output 
-    plt.savefig(f"{out_path}/{job_name}_contact_map.pdf", bbox_inches='tight') 
-    # also save as png, dpi 300 
-    plt.savefig(f"{out_path}/{job_name}_contact_map.png", bbox_inches='tight', dpi=300) 
+    # pdf + png (dpi 300 by default), see utils/figure_utils.py
+    save_pdf_and_png(fig, f"{out_path}/{job_name}_contact_map", dpi=dpi, png_compress_level=png_compress_level)
     plt.close(fig) 
\ No newline at end of file
@@ -0,0 +1,35 @@
+# shared figure saving for the plotting modules
+
+# *** PDF and PNG of one figure ***
+# -1. every plot is written as <base>.pdf (vector) and <base>.png (Agg raster, 300 dpi by default), one after the other
+# in this process: forking a child for the pdf is not safe once numba/OpenMP/BLAS thread pools exist in the process
+# (the child can deadlock on a lock held by one of those threads), and a Figure is not thread-safe
+# -2. plt.savefig() redraws the whole canvas after every save, which is skipped here (one full Agg draw less per file),
+# except for figures with a layout engine (constrained_layout=True): the engine re-runs at every draw, so their png
+# depends on that redraw, and they keep the exact plt.savefig() sequence
+
+
+# 1, save one figure as <base>.pdf and <base>.png
+def save_pdf_and_png(fig, base, dpi=300, png_compress_level=1, bbox_inches="tight"):
+    """
+    Description
+    -----------
+    save a figure as <base>.pdf and <base>.png.
+
+    Args
+    ----
+    fig (matplotlib.figure.Figure): figure to save.
+    base (str): output path without extension.
+    dpi (int): resolution of the png file. Default is 300.
+    png_compress_level (int): zlib level of the png file (0-9). Default is 1, faster to write than the PIL default 6, same pixels.
+    bbox_inches (str or Bbox): passed to both savefig calls, "tight" by default.
+
+    Notes
+    -----
+    - 1, same files as plt.savefig(pdf) followed by plt.savefig(png), without the canvas redraw after each save (see -2. above).
+    - 2, the figure is not closed here, the caller still closes it (plt.close(fig)).
+    """
+    fig.savefig(f"{base}.pdf", bbox_inches=bbox_inches)
+    if fig.get_layout_engine() is not None:
+        fig.canvas.draw_idle()
+    fig.savefig(f"{base}.png", bbox_inches=bbox_inches, dpi=dpi, pil_kwargs={"compress_level": png_compress_level})
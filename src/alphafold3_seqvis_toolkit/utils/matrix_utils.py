@@ -0,0 +1,467 @@
+# shared numeric helpers for the (N, N) distance matrices of the contact map modules
+from functools import lru_cache
+from typing import Optional, Tuple
+import numpy as np
+
+# backends of pairwise_distance()
+DIST_BACKENDS = ("auto", "blas", "numba")
+# below this many points, the numba kernel beats GEMM + the (N, N) elementwise passes (if numba is installed)
+NUMBA_MAX_N = 300
+# devices of pairwise_distance(), "cuda" needs cupy
+DIST_DEVICES = ("cpu", "cuda")
+
+# *** Percentiles by selection instead of sorting ***
+# -1. color scaling only needs 1 or 2 order statistics of the matrix, not the whole sorted matrix
+# -2. np.partition (introselect) puts the k-th element in place in O(N), the rest of the array stays unsorted
+
+# 1, percentile of a matrix, ignoring NaN
+def nanpercentile_partition(
+        arr: np.ndarray,
+        percentile: float,
+        repeat: int = 1,
+        overwrite_input: bool = False,
+        sample: Optional[int] = None
+) -> float:
+    """
+    Description
+    -----------
+    Same value as np.nanpercentile(arr, percentile) (default 'linear' interpolation), computed with np.partition.
+
+    Args
+    ----
+    arr (np.ndarray): Input array of any shape, it is flattened.
+    percentile (float): Percentile in [0, 100].
+    repeat (int): Treat every value as if it appeared `repeat` times, e.g. repeat=2 gives the percentile of
+        np.concatenate([arr, arr]) without building the concatenated array.
+    overwrite_input (bool): Allow partitioning arr in place (its values are reordered), saves one copy for temporary arrays.
+    sample (int, optional): If set and arr has more values, estimate the percentile from this many values drawn uniformly
+        (with replacement, fixed seed) instead of all of them. Default None means exact.
+
+    Returns
+    -------
+    float: The percentile value, NaN if arr is empty or all NaN.
+
+    Notes
+    -----
+    - 1, Only the 2 neighbouring order statistics around the percentile position are selected, then linearly interpolated.
+    - 2, The input is not modified unless overwrite_input=True (and arr has no NaN), np.partition works on a copy.
+    - 3, sample is meant for color scaling of large maps: for a 4000 x 4000 distance map, 65536 values give the 95th percentile
+    within ~0.02 % in a few ms, against ~0.25 s for the exact selection. The seed is fixed, so the same input gives the same value.
+    """
+
+    if not 0 <= percentile <= 100:
+        raise ValueError(f"Percentile must be in [0, 100], got {percentile}")
+    if sample is not None and sample < 1:
+        raise ValueError(f"sample must be a positive integer, got {sample}")
+
+    # uniform sub-sample, drawn before the NaN check so that no pass over the full array is needed
+    flat = sample_values(arr, sample)
+    # np.min propagates NaN, a cheap check that avoids building the boolean mask when there is no NaN (the usual case)
+    if flat.dtype.kind == "f" and flat.size and np.isnan(flat.min()):
+        flat = flat[~np.isnan(flat)]
+    if flat.size == 0:
+        return float("nan")
+
+    # position in the (virtually repeated) sorted array, see numpy 'linear' method: (n - 1) * q
+    n = flat.size * repeat
+    pos = percentile / 100.0 * (n - 1)
+    lo = int(np.floor(pos))
+    hi = min(lo + 1, n - 1)
+    # map virtual indices back to indices of the original values (each value occupies `repeat` slots)
+    k_lo, k_hi = lo // repeat, hi // repeat
+
+    kth = sorted({k_lo, k_hi})
+    if overwrite_input and np.shares_memory(flat, arr):
+        # flat is a view of arr (contiguous input), reorder it in place instead of partitioning a copy
+        flat.partition(kth)
+        part = flat
+    else:
+        part = np.partition(flat, kth)
+    v_lo, v_hi = float(part[k_lo]), float(part[k_hi])
+    frac = pos - lo
+    return v_lo + (v_hi - v_lo) * frac
+
+
+# 1.1, the sub-sample used by nanpercentile_partition(sample=...)
+def sample_values(arr: np.ndarray, sample: Optional[int] = None) -> np.ndarray:
+    """
+    Flattened arr, or `sample` of its values drawn uniformly with replacement (fixed seed) if it has more than that.
+    The same input size gives the same indices, so e.g. np.abs(sample_values(diff, k)) is the sample of |diff|
+    without computing |diff| for the whole matrix.
+    """
+    flat = np.asarray(arr).ravel()
+    if sample is not None and flat.size > sample:
+        flat = flat[np.random.default_rng(0).integers(0, flat.size, int(sample))]
+    return flat
+
+
+# 1.2, np.nanmean of a (sub-)matrix without the NaN mask when there is no NaN
+def nanmean_fast(arr: np.ndarray) -> float:
+    """
+    float(np.nanmean(arr)), bit for bit. np.nanmean sums a contiguous copy of arr with NaN replaced by 0 and divides
+    by the count of non-NaN values, here the same copy is summed directly and the mask (plus its count) is only
+    built if the sum is NaN, ~3x faster for the NaN-free distance maps.
+    """
+    arr = np.asarray(arr)
+    if arr.dtype.kind != "f" or arr.size == 0:
+        return float(np.nanmean(arr))
+    # same C-order copy as np.nanmean makes, so the pairwise summation adds the values in the same order
+    tot = np.sum(np.array(arr))
+    if np.isnan(tot):
+        return float(np.nanmean(arr))
+    # same rounding as np.nanmean: scalar sum / intp count, cast back to the dtype of the sum
+    return float(tot.dtype.type(tot / np.intp(arr.size)))
+
+
+# *** Pairwise distances with one matrix product ***
+# -1. ||xi - xj||^2 = ||xi||^2 + ||xj||^2 - 2 * xi.xj, the cross term for all pairs is a single X @ X.T (BLAS GEMM)
+# -2. no (N, N, 3) temporary like the broadcast version coords[:, None, :] - coords[None, :, :]
+
+# 2, (N, N) euclidean distance matrix of (N, 3) coordinates
+def pairwise_distance(
+        coords: np.ndarray,
+        dtype = np.float32,
+        backend: str = "blas",
+        device: str = "cpu",
+        out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Description
+    -----------
+    Compute the pairwise euclidean distance matrix of a set of points, using the Gram matrix identity
+    D^2 = s[:, None] + s[None, :] - 2 * X @ X.T, where s = (X * X).sum(1).
+
+    Args
+    ----
+    coords (np.ndarray): (N, 3) coordinates, e.g. representative atoms of N residues.
+    dtype: Floating point type of the computation and of the result, np.float32 (default, SGEMM) or np.float64.
+    backend (str): One of DIST_BACKENDS.
+        - "blas" (default): Gram matrix identity below.
+        - "numba": JIT-compiled loop over the upper triangle, needs numba (pip install alphafold3-seqvis-toolkit[numba]).
+        - "auto": "numba" for N < NUMBA_MAX_N if numba is installed, "blas" otherwise.
+    device (str): "cpu" (default) or "cuda". "cuda" runs the same identity with CuPy (cuBLAS GEMM) on the GPU
+        and copies the (N, N) result back, backend is ignored then. Needs cupy (pip install alphafold3-seqvis-toolkit[cuda]).
+    out (np.ndarray, optional): C-contiguous (N, N) array of dtype to write the result into and return, e.g. a np.memmap of a .npy file.
+
+    Returns
+    -------
+    np.ndarray: (N, N) symmetric distance matrix with an exact 0 diagonal.
+
+    Notes
+    -----
+    - 1, Coordinates are centered first: the identity subtracts large numbers when points are far from the origin,
+    centering keeps ||x||^2 small so float32 rounding stays well below 0.01 Angstrom for protein-sized coordinates.
+    - 2, The result is exactly symmetric by construction (no triu/mirror pass needed), and tiny negative values from rounding are clamped to 0 before the square root.
+    - 3, If "numba" is requested but numba is not installed, a warning is printed and "blas" is used.
+    - 4, The same for device="cuda" without cupy or without a usable GPU, the CPU path is used then.
+    """
+
+    if backend not in DIST_BACKENDS:
+        raise ValueError(f"Invalid backend: {backend}, should be one of {DIST_BACKENDS}.")
+    if device not in DIST_DEVICES:
+        raise ValueError(f"Invalid device: {device}, should be one of {DIST_DEVICES}.")
+
+    X = np.asarray(coords, dtype=dtype)
+    if X.ndim != 2:
+        raise ValueError(f"coords must be a 2D array of shape (N, d), got shape {X.shape}")
+    if out is not None and (out.shape != (X.shape[0], X.shape[0]) or out.dtype != X.dtype or not out.flags.c_contiguous):
+        raise ValueError(f"out must be a C-contiguous {(X.shape[0], X.shape[0])} {X.dtype} array, got {out.shape} {out.dtype}.")
+    if X.shape[0] == 0:
+        return np.zeros((0, 0), dtype=X.dtype) if out is None else out
+
+    # cuda path
+    if device == "cuda":
+        D = _pairwise_distance_cuda(X)
+        if D is not None:
+            if out is None:
+                return D
+            out[...] = D
+            return out
+
+    # numba path: direct differences, so no centering is needed
+    if backend == "auto":
+        backend = "numba" if (X.shape[0] < NUMBA_MAX_N and _get_numba_kernel() is not None) else "blas"
+    if backend == "numba":
+        kernel = _get_numba_kernel()
+        if kernel is not None:
+            D = np.empty((X.shape[0], X.shape[0]), dtype=X.dtype) if out is None else out
+            kernel(np.ascontiguousarray(X), D)
+            return D
+        print("Warning: numba is not installed, falling back to the 'blas' distance backend.")
+
+    # blas path
+    X = np.ascontiguousarray(X - X.mean(axis=0, dtype=X.dtype))
+
+    s = np.einsum("ij,ij->i", X, X)
+    # numpy dispatches X @ X.T to BLAS SYRK, which computes only one triangle and mirrors it (exactly symmetric)
+    d2 = X @ X.T if out is None else np.matmul(X, X.T, out=out)
+    # the elementwise passes run over blocks of rows (~DIST_BLOCK_BYTES each) instead of the whole matrix: a block stays in
+    # cache through all of them, and the outer sum is a (rows, N) temporary instead of (N, N). Same operations per element
+    # in the same order, so the result is bit-identical to the whole-matrix passes this replaced
+    N = d2.shape[0]
+    rows = max(1, DIST_BLOCK_BYTES // (N * d2.itemsize))
+    for i0 in range(0, N, rows):
+        blk = d2[i0:i0 + rows]
+        blk *= -2.0
+        # s_i + s_j == s_j + s_i exactly, adding the outer sum in one step keeps d2 exactly symmetric,
+        # (adding s[:, None] and s[None, :] one after the other rounds (i, j) and (j, i) differently)
+        blk += np.add.outer(s[i0:i0 + rows], s)
+        # clamp fp noise, zero the diagonal, then take the sqrt in place
+        np.maximum(blk, 0, out=blk)
+        np.fill_diagonal(blk[:, i0:i0 + rows], 0)
+        np.sqrt(blk, out=blk)
+    return d2
+
+
+# size of the row blocks pairwise_distance() post-processes the Gram matrix in, ~L2 cache sized
+DIST_BLOCK_BYTES = 1 << 20
+
+
+# 2.1, memoized pairwise_distance(), for callers that plot the same structure again in one process
+def pairwise_distance_cached(
+        coords: np.ndarray,
+        dtype = np.float32,
+        backend: str = "blas",
+        device: str = "cpu"
+) -> np.ndarray:
+    """
+    Description
+    -----------
+    Same as pairwise_distance(), but the last few results are kept in memory, keyed on the coordinate values
+    (plus dtype/backend/device). Plotting the same chains of the same structure again in one python process
+    (notebooks, scripts calling contact_map_vis_* in a loop over settings) reuses the (N, N) matrix.
+
+    Notes
+    -----
+    - 1, The key is the raw bytes of coords, hashing them is O(N) against the O(N^2) distance matrix.
+    - 2, The returned matrix is shared between calls and therefore read-only, copy it before modifying it.
+    - 3, Only PAIRWISE_CACHE_SIZE matrices are kept, (N, N) float32 is already ~100 MB for N = 5000.
+    """
+
+    X = np.ascontiguousarray(coords)
+    return _pairwise_distance_memo(X.tobytes(), X.dtype.str, X.shape, np.dtype(dtype).str, backend, device)
+
+
+# number of (N, N) matrices kept by pairwise_distance_cached()
+PAIRWISE_CACHE_SIZE = 4
+
+@lru_cache(maxsize=PAIRWISE_CACHE_SIZE)
+def _pairwise_distance_memo(buf, src_dtype, shape, dtype, backend, device):
+    D = pairwise_distance(np.frombuffer(buf, dtype=src_dtype).reshape(shape), dtype=np.dtype(dtype), backend=backend, device=device)
+    D.flags.writeable = False
+    return D
+
+
+# 3, numba kernel for pairwise_distance(backend="numba"), compiled on first use
+@lru_cache(maxsize=None)
+def _get_numba_kernel():
+    """
+    Return the compiled kernel, or None if numba is not installed.
+    numba is imported lazily here, importing it costs ~0.5 s even when the kernel is never used.
+    """
+    try:
+        from numba import njit, prange
+    except ImportError:
+        return None
+
+    # only the upper triangle is computed, each value is written to (i, j) and (j, i)
+    # rows are distributed over threads with prange, every cell is written by exactly one thread
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _pdist_upper(X, D):
+        N, d = X.shape
+        for i in prange(N):
+            D[i, i] = 0.0
+            for j in range(i + 1, N):
+                acc = 0.0
+                for k in range(d):
+                    t = X[i, k] - X[j, k]
+                    acc += t * t
+                v = np.sqrt(acc)
+                D[i, j] = v
+                D[j, i] = v
+
+    return _pdist_upper
+
+
+# 4, CuPy version of the blas path of pairwise_distance(device="cuda")
+def _pairwise_distance_cuda(X: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Same computation as the blas path of pairwise_distance(), on the GPU. Returns None (after a warning) if cupy
+    is not installed or no CUDA device can be used, so that the caller falls back to the CPU.
+    """
+    try:
+        import cupy as cp
+    except ImportError:
+        print("Warning: cupy is not installed, computing distances on the CPU.")
+        return None
+
+    try:
+        Xg = cp.asarray(X)
+        Xg -= Xg.mean(axis=0)
+        s = (Xg * Xg).sum(axis=1)
+        d2 = Xg @ Xg.T
+        d2 *= -2.0
+        d2 += cp.add.outer(s, s)
+        cp.maximum(d2, 0, out=d2)
+        cp.fill_diagonal(d2, 0)
+        cp.sqrt(d2, out=d2)
+        return cp.asnumpy(d2)
+    except cp.cuda.runtime.CUDARuntimeError as e:
+        print(f"Warning: CUDA is not usable ({e}), computing distances on the CPU.")
+        return None
+
+
+# *** Difference maps in one pass ***
+# -1. A - B and |A - B| are needed together (the plot and the vdiff color limit), computing them separately reads A and B
+# and writes/reads the difference again, the numba kernel does it in one streaming pass
+
+# 5, (A - B, |A - B|) of two distance matrices
+def diff_and_abs(
+        dist_a: np.ndarray,
+        dist_b: np.ndarray,
+        use_numba: bool = False,
+        out: Optional[Tuple[np.ndarray, np.ndarray]] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Description
+    -----------
+    Return (dist_a - dist_b, |dist_a - dist_b|) as two new arrays, or written into the two arrays of out (e.g. np.memmap).
+
+    Notes
+    -----
+    - 1, With use_numba=True (and numba installed) a fused kernel computes both in one pass over memory,
+    otherwise numpy ufuncs are used (same values). numba is opt-in because its first call pays for JIT compilation.
+    """
+
+    if dist_a.shape != dist_b.shape:
+        raise ValueError(f"Shapes do not match: {dist_a.shape} vs {dist_b.shape}")
+
+    kernel = _get_numba_diff_kernel() if (use_numba and dist_a.ndim == 2) else None
+    if kernel is not None:
+        a = np.ascontiguousarray(dist_a)
+        b = np.ascontiguousarray(dist_b, dtype=a.dtype)
+        diff, abs_diff = (np.empty_like(a), np.empty_like(a)) if out is None else out
+        kernel(a, b, diff, abs_diff)
+        return diff, abs_diff
+
+    if out is None:
+        diff = np.subtract(dist_a, dist_b)
+        return diff, np.abs(diff)
+    diff = np.subtract(dist_a, dist_b, out=out[0])
+    return diff, np.abs(diff, out=out[1])
+
+
+# 6, numba kernel for diff_and_abs(), compiled on first use
+@lru_cache(maxsize=None)
+def _get_numba_diff_kernel():
+    """
+    Return the compiled kernel, or None if numba is not installed.
+    """
+    try:
+        from numba import njit, prange
+    except ImportError:
+        return None
+
+    @njit(parallel=True, cache=True)
+    def _fused_diff(Da, Db, out_diff, out_abs):
+        N, M = Da.shape
+        for i in prange(N):
+            for j in range(M):
+                v = Da[i, j] - Db[i, j]
+                out_diff[i, j] = v
+                out_abs[i, j] = abs(v)
+
+    return _fused_diff
+
+
+# 7, strided view of an (N, N) map for imshow, for maps much larger than the output image
+def downsample_for_display(
+        mat: np.ndarray,
+        max_px: int
+) -> Tuple[np.ndarray, Optional[Tuple[float, float, float, float]]]:
+    """
+    Description
+    -----------
+    Return (view, extent) to pass to imshow(view, extent=extent): mat itself and None if it fits, otherwise every
+    `block`-th row/column of mat, with the extent that puts each kept value at its original (row, col) position.
+
+    Args
+    ----
+    mat (np.ndarray): 2D array, like a distance matrix.
+    max_px (int): Upper bound of the number of pixels the image is drawn on (per axis), e.g. figure width * dpi.
+
+    Notes
+    -----
+    - 1, Only maps with more than 2 * max_px rows/columns are strided, block = N // max_px, so at least max_px values per
+    axis (>= 1 per output pixel) are kept. Smaller maps are drawn exactly as before.
+    - 2, With interpolation="nearest", matplotlib maps every value of the full array to RGBA before resampling it to the output
+    size, for N = 8000 (2x2 figure, 300 dpi) that is ~34 s against ~7 s for the strided views. Values between the kept rows/columns
+    are skipped instead of averaged, like nearest-neighbour downsampling does anyway.
+    - 3, The view is a numpy view (no copy), the extent covers ceil(N / block) * block rows/columns, set the axis limits
+    to (0, N - 1) afterwards as usual.
+    """
+
+    n = max(mat.shape)
+    if n <= 2 * max_px:
+        return mat, None
+    block = n // max_px
+    view = mat[::block, ::block]
+    # (left, right, bottom, top) for origin="upper", each value covers block x block cells of the original map
+    extent = (-0.5, view.shape[1] * block - 0.5, view.shape[0] * block - 0.5, -0.5)
+    return view, extent
+
+
+# *** Contacts only, without the dense distance computation ***
+# -1. a contact map thresholded at a cutoff only needs the pairs closer than the cutoff, every other cell shows the same color
+# -2. a KD-tree finds those k pairs in O(N log N + k), k ~ N * (residues within the cutoff) << N^2 for large complexes
+
+# 8, (N, N) distance matrix with every distance above cutoff set to cutoff
+def contact_distance(
+        coords: np.ndarray,
+        cutoff: float,
+        dtype = np.float32
+) -> np.ndarray:
+    """
+    Description
+    -----------
+    Same as np.minimum(pairwise_distance(coords), cutoff), but only the pairs within cutoff are computed, with
+    BioPython's C KD-tree (Bio.PDB.kdtrees, no extra dependency) instead of the N^2 distances.
+
+    Args
+    ----
+    coords (np.ndarray): (N, 3) coordinates.
+    cutoff (float): Contact distance (Angstrom), > 0.
+    dtype: Floating point type of the result, np.float32 (default) or np.float64.
+
+    Returns
+    -------
+    np.ndarray: (N, N) symmetric matrix, 0 on the diagonal, exact distances <= cutoff, cutoff everywhere else.
+
+    Notes
+    -----
+    - 1, For N = 8000 and a 12 Angstrom cutoff (~240k pairs) this takes ~0.2 s against ~0.6 s for the GEMM path, most of it
+    filling the (N, N) result, which is still needed by imshow.
+    - 2, The distances are computed in float64 by the KD-tree, so they can differ from the float32 GEMM path by its rounding (< 0.01 Angstrom).
+    """
+
+    from Bio.PDB.kdtrees import KDTree
+
+    if cutoff <= 0:
+        raise ValueError(f"cutoff must be > 0, got {cutoff}.")
+    X = np.ascontiguousarray(coords, dtype=np.float64)
+    if X.ndim != 2 or X.shape[1] != 3:
+        raise ValueError(f"coords must have shape (N, 3), got {X.shape}.")
+    N = X.shape[0]
+    D = np.full((N, N), cutoff, dtype=dtype)
+    np.fill_diagonal(D, 0)
+    if N < 2:
+        return D
+
+    neighbors = KDTree(X, 10).neighbor_search(float(cutoff))
+    k = len(neighbors)
+    i = np.fromiter((nb.index1 for nb in neighbors), dtype=np.intp, count=k)
+    j = np.fromiter((nb.index2 for nb in neighbors), dtype=np.intp, count=k)
+    d = np.fromiter((nb.radius for nb in neighbors), dtype=np.float64, count=k)
+    D[i, j] = d
+    D[j, i] = d
+    return D
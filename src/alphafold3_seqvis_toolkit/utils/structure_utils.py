@@ -0,0 +1,582 @@
+# shared mmCIF loading for the contact map modules (comparison + visualization)
+import io
+import os
+import gzip
+import shutil
+import hashlib
+from functools import lru_cache
+from typing import Dict, Optional
+import numpy as np
+from Bio.PDB import MMCIFParser
+from Bio.PDB.MMCIF2Dict import MMCIF2Dict
+from Bio.Data.PDBData import protein_letters_3to1, protein_letters_3to1_extended
+
+# *** One representative atom per residue, stored column by column ***
+# -1. every contact map module only needs (chain, residue, representative atom coordinate)
+# -2. column arrays can be saved/loaded (memory-mapped) with numpy directly, so the parse result can be cached on disk
+
+# keys of the dict returned by load_representative_atoms()
+ATOM_TABLE_KEYS = ("coords", "chain", "resseq", "icode", "resname", "hetfield", "rtype", "model_chains")
+
+
+# mmcif parsers supported by load_representative_atoms()
+# - "gemmi": C++ parser, fastest (optional dependency)
+# - "mmcif2dict": BioPython's MMCIF2Dict tokenizer, the _atom_site columns are read as lists, no Structure/Atom objects
+# - "biopython": MMCIFParser, builds the full SMCRA object tree
+STRUCTURE_PARSERS = ("auto", "gemmi", "mmcif2dict", "biopython")
+
+# gemmi is optional (pip install alphafold3-seqvis-toolkit[gemmi]), it parses mmcif files in C++ without building
+# one python object per atom, several times faster than BioPython for large complexes
+try:
+    import gemmi
+except ImportError:
+    gemmi = None
+
+# msgpack is optional too (pip install alphafold3-seqvis-toolkit[bcif]), only needed to read BinaryCIF files (.bcif / .bcif.gz),
+# which store the atom_site columns as typed binary arrays instead of text
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+BCIF_SUFFIXES = (".bcif", ".bcif.gz")
+
+# nucleotide residue names (stripped), to tell DNA from RNA among the residues with a C1' atom
+DNA_RESNAMES = frozenset({"DA", "DT", "DG", "DC"})
+RNA_RESNAMES = frozenset({"A", "U", "G", "C"})
+
+
+# 1, parse the mmcif file into the representative atom table
+def load_representative_atoms(
+        mmcif_file: str,
+        include_nonstandard_residue: bool = False,
+        model_index: int = 0,
+        parser: str = "auto"
+) -> Dict[str, np.ndarray]:
+    """
+    Description
+    -----------
+    Load representative atoms (CA for protein, C1' for nucleic acids, first atom for others) of ALL chains
+    in a mmcif file, in file order.
+
+    Args
+    ----
+    mmcif_file (str): Path to the mmcif file (.cif / .cif.gz), or a BinaryCIF file (.bcif / .bcif.gz, needs msgpack).
+    include_nonstandard_residue (bool): Whether non-standard amino acids (like MSE) are treated as protein residues.
+    model_index (int): Index of the model to load, AF3 usually has only model 0.
+    parser (str): One of STRUCTURE_PARSERS, "auto" (default) uses gemmi if installed, otherwise "mmcif2dict".
+
+    Returns
+    -------
+    Dict[str, np.ndarray]: one entry per representative atom (row), with keys:
+        - coords (N, 3) float32, coordinates of the representative atom
+        - chain (N,) str, chain id, like "A"
+        - resseq (N,) int32, 1-based residue number from the mmcif file
+        - icode (N,) str, insertion code (raw, " " if empty)
+        - resname (N,) str, like "ALA"
+        - hetfield (N,) str, " " for standard records, "H_XXX" for hetero residues
+        - rtype (N,) str, one of "Protein", "DNA", "RNA", "Nucleic", "Ligand"
+        - model_chains (M,) str, all chain ids in the model, even chains without any representative atom
+
+    Notes
+    -----
+    - 1, Water is always skipped.
+    - 2, An amino acid without CA atom is skipped, it does NOT fall back to other atoms.
+    - 3, Each module selects its own chains/molecule types from this table, see contact_map_comparison_*.py and contact_map_visualization_*.py
+    - 4, All parsers give the same table (same BioPython amino acid tables, auth chain ids and residue numbers).
+    - 5, BinaryCIF files (e.g. downloaded from RCSB) are decoded column by column with numpy, see _iter_residues_bcif().
+    """
+
+    reader = _resolve_parser(mmcif_file, parser)
+    if parser == "gemmi" and reader != "gemmi":
+        print("Warning: gemmi is not installed, falling back to the BioPython MMCIF2Dict reader.")
+    if reader == "bcif":
+        rows, model_chains = _iter_residues_bcif(mmcif_file, model_index)
+    elif reader == "gemmi":
+        rows, model_chains = _iter_residues_gemmi(mmcif_file, model_index)
+    elif reader == "biopython":
+        rows, model_chains = _iter_residues_biopython(mmcif_file, model_index)
+    else:
+        rows, model_chains = _iter_residues_mmcif2dict(mmcif_file, model_index)
+
+    # amino acid check, same tables as Bio.PDB.Polypeptide.is_aa(res, standard=not include_nonstandard_residue)
+    aa_names = protein_letters_3to1_extended if include_nonstandard_residue else protein_letters_3to1
+
+    coords, chains, resseqs, icodes, resnames, hetfields, rtypes = [], [], [], [], [], [], []
+
+    for chain_id, hetfield, resseq, icode, resname, atoms in rows:
+        # Skip water
+        if hetfield == "W":
+            continue
+
+        rep_coord = None
+        rtype = "Unknown"
+
+        # 1. Protein -> CA
+        if f"{resname:<3s}".upper() in aa_names:
+            if 'CA' in atoms:
+                rep_coord = atoms['CA']
+                rtype = "Protein"
+
+        # 2. Nucleic Acid -> C1' (Distinguish DNA/RNA)
+        elif "C1'" in atoms:
+            rep_coord = atoms["C1'"]
+            rname = resname.strip()
+            if rname in DNA_RESNAMES: rtype = "DNA"
+            elif rname in RNA_RESNAMES: rtype = "RNA"
+            else: rtype = "Nucleic" # Fallback for modified bases
+
+        # 3. Others (Ligands/Ions) -> First Atom
+        elif len(atoms) > 0:
+            rep_coord = next(iter(atoms.values()))
+            rtype = "Ligand"
+
+        if rep_coord is not None:
+            coords.append(rep_coord)
+            chains.append(chain_id)
+            resseqs.append(resseq)
+            icodes.append(icode)
+            resnames.append(resname)
+            hetfields.append(hetfield)
+            rtypes.append(rtype)
+
+    return {
+        "coords": np.asarray(coords, dtype=np.float32).reshape(-1, 3),
+        "chain": np.asarray(chains, dtype=str),
+        "resseq": np.asarray(resseqs, dtype=np.int32),
+        "icode": np.asarray(icodes, dtype=str),
+        "resname": np.asarray(resnames, dtype=str),
+        "hetfield": np.asarray(hetfields, dtype=str),
+        "rtype": np.asarray(rtypes, dtype=str),
+        "model_chains": np.asarray(model_chains, dtype=str),
+    }
+
+
+# residue iterators for load_representative_atoms(), both yield
+# (chain_id, hetfield, resseq, icode, resname, {atom_name: coord}) per residue in file order, plus the chain ids of the model
+# only atom names and coordinates are needed downstream, so both of them stop at that level
+# 1.1, the reader load_representative_atoms() actually uses for a file, also part of the disk cache key below
+def _resolve_parser(mmcif_file, parser="auto"):
+    """
+    Returns one of "bcif", "gemmi", "biopython", "mmcif2dict" for the given file and parser option.
+    """
+    if parser not in STRUCTURE_PARSERS:
+        raise ValueError(f"Invalid parser: {parser}, should be one of {STRUCTURE_PARSERS}.")
+    if mmcif_file.lower().endswith(BCIF_SUFFIXES):
+        # BinaryCIF has its own decoder, the parser option only applies to text mmcif
+        return "bcif"
+    if parser in ("auto", "gemmi") and gemmi is not None:
+        return "gemmi"
+    if parser == "biopython":
+        return "biopython"
+    # "mmcif2dict", or "auto"/"gemmi" without gemmi installed
+    return "mmcif2dict"
+
+
+def _iter_residues_biopython(mmcif_file, model_index=0):
+    parser = MMCIFParser(QUIET=True)
+    # According to SMCRA hierarchy, we need to go through Structure -> Model -> Chain -> Residue -> Atom
+    with _open_structure_file(mmcif_file) as fh:
+        structure = parser.get_structure('struct', fh)
+    models = list(structure)
+    if not models:
+        raise ValueError(f"No models found in the mmcif file: {mmcif_file}")
+    model = models[model_index]
+
+    rows = []
+    model_chains = []
+    for chain in model:
+        model_chains.append(chain.id)
+        for res in chain:
+            hetfield, resseq, icode = res.id
+            # residue[name] of a disordered atom is its selected (highest occupancy) altloc, as before
+            atoms = {atom.get_id(): atom.get_coord() for atom in res}
+            rows.append((chain.id, hetfield, resseq, icode, res.resname, atoms))
+    return rows, model_chains
+
+
+def _iter_residues_gemmi(mmcif_file, model_index=0):
+    # auth chain ids/residue numbers, like MMCIFParser
+    structure = gemmi.read_structure(mmcif_file)
+    if len(structure) == 0:
+        raise ValueError(f"No models found in the mmcif file: {mmcif_file}")
+    model = structure[model_index]
+
+    rows = []
+    model_chains = []
+    for chain in model:
+        model_chains.append(chain.name)
+        for res in chain:
+            # BioPython hetfield convention: "W" for water, "H_XXX" for other HETATM residues, " " otherwise
+            if res.het_flag == "H":
+                hetfield = "W" if res.name in ("HOH", "WAT") else f"H_{res.name}"
+            else:
+                hetfield = " "
+            # only the atoms load_representative_atoms() can pick are looked up (first atom, CA, C1'), in C++ by find_atom(),
+            # instead of a python loop over every atom, the first atom stays the first key (used for ligands)
+            atoms = {}
+            if len(res) > 0:
+                for name in (res[0].name, "CA", "C1'"):
+                    if name not in atoms:
+                        pos = _gemmi_atom_pos(res, name)
+                        if pos is not None:
+                            atoms[name] = pos
+            rows.append((chain.name, hetfield, res.seqid.num, res.seqid.icode, res.name, atoms))
+    return rows, model_chains
+
+
+def _gemmi_atom_pos(res, name):
+    atom = res.find_atom(name, "*")
+    if atom is None:
+        return None
+    if atom.has_altloc():
+        # altlocs: keep the highest occupancy one (first one on ties), like BioPython's DisorderedAtom
+        for other in res:
+            if other.name == name and other.occ > atom.occ:
+                atom = other
+    return (atom.pos.x, atom.pos.y, atom.pos.z)
+
+
+def _iter_residues_bcif(mmcif_file, model_index=0):
+    if msgpack is None:
+        raise ImportError("Reading BinaryCIF needs msgpack: pip install alphafold3-seqvis-toolkit[bcif]")
+    with _open_structure_file(mmcif_file, binary=True) as fh:
+        doc = msgpack.unpackb(fh.read(), raw=False)
+
+    blocks = doc.get("dataBlocks") or []
+    if not blocks:
+        raise ValueError(f"No data block found in the BinaryCIF file: {mmcif_file}")
+    category = next((c for c in blocks[0]["categories"] if c["name"].lower() == "_atom_site"), None)
+    if category is None:
+        raise ValueError(f"No _atom_site category found in the BinaryCIF file: {mmcif_file}")
+    columns = {c["name"]: c for c in category["columns"]}
+
+    def _col(*names, default=None):
+        # first available column, with masked values ('.' and '?') as None
+        for name in names:
+            if name in columns:
+                values = _bcif_decode(columns[name]["data"])
+                mask = columns[name].get("mask")
+                if mask is not None:
+                    mask = _bcif_decode(mask)
+                    return [None if m else v for v, m in zip(values.tolist(), mask.tolist())]
+                return values.tolist()
+        return [default] * category["rowCount"]
+
+    # same columns as MMCIFParser: auth chain id/residue number, label atom/residue names
+    chain_ids = _col("auth_asym_id", "label_asym_id")
+    resseqs = _col("auth_seq_id", "label_seq_id")
+    icodes = _col("pdbx_PDB_ins_code")
+    resnames = _col("label_comp_id", "auth_comp_id")
+    atom_names = _col("label_atom_id", "auth_atom_id")
+    groups = _col("group_PDB", default="ATOM")
+    occupancies = _col("occupancy", default=1.0)
+    model_nums = _col("pdbx_PDB_model_num", default=1)
+    xyz = np.stack([_bcif_decode(columns[f"Cartn_{a}"]["data"]) for a in "xyz"], axis=1)
+
+    return _rows_from_atom_site(
+        chain_ids, resseqs, icodes, resnames, atom_names, groups, occupancies, model_nums, xyz, model_index, mmcif_file
+    )
+
+
+def _iter_residues_mmcif2dict(mmcif_file, model_index=0):
+    # MMCIF2Dict is the tokenizer MMCIFParser runs first, building the Structure/Chain/Residue/Atom objects afterwards
+    # is skipped, the _atom_site loop is used as columns (lists of str) directly
+    with _open_structure_file(mmcif_file) as fh:
+        cif = MMCIF2Dict(fh)
+    if "_atom_site.Cartn_x" not in cif:
+        raise ValueError(f"No _atom_site category found in the mmcif file: {mmcif_file}")
+    n_atoms = len(cif["_atom_site.Cartn_x"])
+
+    def _col(*names, default=None):
+        # first available column, with '.' and '?' (missing values) as None
+        for name in names:
+            values = cif.get(f"_atom_site.{name}")
+            if values is not None:
+                return [None if v in (".", "?") else v for v in values]
+        return [default] * n_atoms
+
+    # same columns as MMCIFParser: auth chain id/residue number, label atom/residue names
+    chain_ids = _col("auth_asym_id", "label_asym_id")
+    resseqs = _col("auth_seq_id", "label_seq_id")
+    icodes = _col("pdbx_PDB_ins_code")
+    resnames = _col("label_comp_id", "auth_comp_id")
+    atom_names = _col("label_atom_id", "auth_atom_id")
+    groups = _col("group_PDB", default="ATOM")
+    occupancies = [None if o is None else float(o) for o in _col("occupancy", default=1.0)]
+    model_nums = _col("pdbx_PDB_model_num", default=1)
+    # one C-level str -> float conversion per column
+    xyz = np.stack([np.asarray(cif[f"_atom_site.Cartn_{a}"], dtype=np.float64) for a in "xyz"], axis=1).astype(np.float32)
+
+    return _rows_from_atom_site(
+        chain_ids, resseqs, icodes, resnames, atom_names, groups, occupancies, model_nums, xyz, model_index, mmcif_file
+    )
+
+
+# residue rows from _atom_site columns (one list/array entry per atom), shared by the BinaryCIF and MMCIF2Dict readers
+# same grouping as MMCIFParser builds into its object tree
+def _rows_from_atom_site(chain_ids, resseqs, icodes, resnames, atom_names, groups, occupancies, model_nums, xyz,
+                         model_index, mmcif_file):
+    model_ids = list(dict.fromkeys(model_nums))
+    if not model_ids:
+        raise ValueError(f"No models found in the mmcif file: {mmcif_file}")
+    model_id = model_ids[model_index]
+
+    # residues are grouped per chain in first-seen order, like BioPython/gemmi: ligands of chain A listed after
+    # chain B in atom_site (usual in PDB entries) still end up in chain A
+    residues = {}  # chain id -> {residue key -> (row, occupancies)}
+    for i in range(len(model_nums)):
+        if model_nums[i] != model_id:
+            continue
+        chain_id, resname = chain_ids[i], resnames[i]
+        icode = icodes[i] or " "
+        if groups[i] == "HETATM":
+            # BioPython hetfield convention: "W" for water, "H_XXX" for other HETATM residues, " " otherwise
+            hetfield = "W" if resname in ("HOH", "WAT") else f"H_{resname}"
+        else:
+            hetfield = " "
+        key = (hetfield, int(resseqs[i]), icode)
+        chain_res = residues.setdefault(chain_id, {})
+        if key not in chain_res:
+            chain_res[key] = ((chain_id, hetfield, key[1], icode, resname, {}), {})
+        (_, _, _, _, _, atoms), occ = chain_res[key]
+        # altlocs: keep the highest occupancy one (first one on ties), like BioPython's DisorderedAtom
+        name = atom_names[i]
+        o = occupancies[i] if occupancies[i] is not None else 1.0
+        if name not in atoms or o > occ[name]:
+            atoms[name] = xyz[i]
+            occ[name] = o
+
+    rows = [row for chain_res in residues.values() for row, _ in chain_res.values()]
+    return rows, list(residues)
+
+
+# read buffer of _open_structure_file(), AF3 multimer mmcif files are tens of MB
+STRUCTURE_READ_BUFFER = 1 << 20
+
+def _open_structure_file(path, binary=False):
+    """
+    Open a structure file for one sequential read with a 1 MiB buffer (fewer read syscalls than the default 8 KiB),
+    gzip-compressed files (.gz) are decompressed on the fly. Text mode (for MMCIFParser) unless binary=True.
+    gemmi opens files itself (and also reads .gz), it does not go through here.
+    """
+    if path.lower().endswith(".gz"):
+        raw = io.BufferedReader(gzip.open(path, "rb"), buffer_size=STRUCTURE_READ_BUFFER)
+    else:
+        raw = open(path, "rb", buffering=STRUCTURE_READ_BUFFER)
+    return raw if binary else io.TextIOWrapper(raw, encoding="utf-8")
+
+
+# BinaryCIF ByteArray type codes -> little-endian numpy dtypes
+_BCIF_DTYPES = {1: "<i1", 2: "<i2", 3: "<i4", 4: "<u1", 5: "<u2", 6: "<u4", 32: "<f4", 33: "<f8"}
+
+def _bcif_decode(encoded):
+    """
+    Decode one BinaryCIF column ({"data": bytes, "encoding": [...]}), the encodings are undone in reverse order.
+    See https://github.com/molstar/BinaryCIF/blob/master/encoding.md for the format.
+    """
+    data = encoded["data"]
+    for enc in reversed(encoded["encoding"]):
+        kind = enc["kind"]
+        if kind == "ByteArray":
+            data = np.frombuffer(data, dtype=_BCIF_DTYPES[enc["type"]])
+        elif kind == "FixedPoint":
+            data = (data / enc["factor"]).astype(_BCIF_DTYPES[enc["srcType"]])
+        elif kind == "IntervalQuantization":
+            step = (enc["max"] - enc["min"]) / (enc["numSteps"] - 1)
+            data = (enc["min"] + step * data).astype(_BCIF_DTYPES[enc["srcType"]])
+        elif kind == "RunLength":
+            data = np.repeat(data[0::2], data[1::2]).astype(_BCIF_DTYPES[enc["srcType"]])
+        elif kind == "Delta":
+            data = data.astype(_BCIF_DTYPES[enc["srcType"]])
+            if data.size:
+                data[0] += enc["origin"]
+                data = np.cumsum(data, dtype=data.dtype)
+        elif kind == "IntegerPacking":
+            data = _bcif_unpack_integers(data, enc["byteCount"], enc["isUnsigned"], enc["srcSize"])
+        elif kind == "StringArray":
+            strings = enc["stringData"]
+            offsets = _bcif_decode({"data": enc["offsets"], "encoding": enc["offsetEncoding"]})
+            indices = _bcif_decode({"data": data, "encoding": enc["dataEncoding"]})
+            table = [strings[offsets[k]:offsets[k + 1]] for k in range(len(offsets) - 1)]
+            data = np.array([table[k] if k >= 0 else "" for k in indices.tolist()], dtype=object)
+        else:
+            raise ValueError(f"Unsupported BinaryCIF encoding: {kind}")
+    return data
+
+
+def _bcif_unpack_integers(packed, byte_count, is_unsigned, size):
+    # values that do not fit in 1/2 bytes are stored as a run of saturated values (upper/lower limit) plus a remainder,
+    # so every output value is the sum of the packed values up to and including the first non-saturated one
+    bits = 8 * byte_count
+    upper = (1 << bits) - 1 if is_unsigned else (1 << (bits - 1)) - 1
+    lower = 0 if is_unsigned else -(1 << (bits - 1))
+    packed = packed.astype(np.int64)
+    ends = np.flatnonzero((packed != upper) & ((packed != lower) | is_unsigned))
+    csum = np.cumsum(packed)
+    out = csum[ends]
+    out[1:] -= csum[ends[:-1]]
+    return out[:size].astype(np.int32)
+
+
+# 2, disk cache for the table above, used by the CLI
+# version of the cached table, part of the cache key: bump it whenever the columns (ATOM_TABLE_KEYS) or what a reader
+# puts into them change, so entries written by an older build are never served again (they are pruned like any old entry)
+CACHE_FORMAT_VERSION = 2
+# number of cache entries (parsed files) kept in the cache directory, the least recently used ones are removed beyond it
+CACHE_MAX_ENTRIES = 256
+
+def get_cache_dir() -> str:
+    """
+    Cache directory, $XDG_CACHE_HOME/af3-vis (default ~/.cache/af3-vis)
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "af3-vis")
+
+
+def load_or_cache(
+        mmcif_file: str,
+        include_nonstandard_residue: bool = False,
+        cache_dir: Optional[str] = None,
+        parser: str = "auto"
+) -> Dict[str, np.ndarray]:
+    """
+    Description
+    -----------
+    Same as load_representative_atoms(), but the parsed table is stored on disk as one .npy file per column,
+    so the next run on the same (unchanged) file skips mmcif parsing.
+
+    Args
+    ----
+    mmcif_file (str): Path to the mmcif file.
+    include_nonstandard_residue (bool): see load_representative_atoms().
+    cache_dir (str, optional): Where to store the cache files. Default is get_cache_dir().
+    parser (str): see load_representative_atoms().
+
+    Notes
+    -----
+    - 1, The cache key is (CACHE_FORMAT_VERSION, reader actually used, real path, mtime in ns, file size, include_nonstandard_residue),
+    so editing or replacing the mmcif file, or upgrading to a build with another table format, invalidates its cache entry.
+    - 2, If the cache directory is not writable, we just parse the file as usual.
+    - 3, On a cache hit the columns are memory-mapped read-only (np.load(mmap_mode="r")): nothing is decompressed or
+    copied up front, the OS page cache serves only the pages that are actually indexed. Do not modify them in place.
+    - 4, Within one python process the loaded table is also memoized (same key as above), repeated calls do not touch the disk again.
+    The returned arrays are read-only in both cases.
+    - 5, At most CACHE_MAX_ENTRIES entries are kept, the least recently used ones are removed when a new entry is written.
+    """
+
+    cache_dir = cache_dir or get_cache_dir()
+    st = os.stat(mmcif_file)
+    return _load_or_cache_entry(
+        os.path.realpath(mmcif_file), st.st_mtime_ns, st.st_size, bool(include_nonstandard_residue), cache_dir,
+        _resolve_parser(mmcif_file, parser)
+    )
+
+
+# in-process memo on top of the disk cache: a second call on the same unchanged file in the same python process
+# (typer.testing, notebooks, a batch driver calling the CLI functions) returns the already loaded table.
+# (path, mtime, size) are part of the arguments, so an edited file is a new entry, like on disk
+@lru_cache(maxsize=32)
+def _load_or_cache_entry(
+        mmcif_file: str,
+        mtime_ns: int,
+        size: int,
+        include_nonstandard_residue: bool,
+        cache_dir: str,
+        reader: str
+) -> Dict[str, np.ndarray]:
+    key = f"v{CACHE_FORMAT_VERSION}|{reader}|{mmcif_file}|{mtime_ns}|{size}|{int(include_nonstandard_residue)}"
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+    # one directory per cache entry, one {column}.npy file per column
+    entry_dir = os.path.join(cache_dir, digest)
+
+    # cache hit
+    if os.path.isdir(entry_dir):
+        try:
+            atoms = {k: np.load(os.path.join(entry_dir, f"{k}.npy"), mmap_mode="r") for k in ATOM_TABLE_KEYS}
+            # the directory mtime is the "last used" time for _prune_cache()
+            os.utime(entry_dir)
+            return atoms
+        except Exception as e:
+            # broken/old cache entry, we just rebuild it below
+            print(f"Warning: ignoring unreadable cache entry {entry_dir}: {e}")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+
+    # cache miss, the reader is resolved already ("bcif" files ignore the parser option anyway)
+    atoms = load_representative_atoms(
+        mmcif_file, include_nonstandard_residue=include_nonstandard_residue, parser="auto" if reader == "bcif" else reader
+    )
+    # the same dict is returned by every later call of this process, so it is read-only like the memory-mapped one
+    for arr in atoms.values():
+        arr.flags.writeable = False
+    tmp_dir = f"{entry_dir}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(tmp_dir, exist_ok=True)
+        for k in ATOM_TABLE_KEYS:
+            np.save(os.path.join(tmp_dir, f"{k}.npy"), atoms[k])
+        # write into a temporary directory first and rename it, so that a crash never leaves a half-written cache entry
+        os.rename(tmp_dir, entry_dir)
+    except OSError as e:
+        # also happens if a concurrent run created the same entry first, which is fine
+        if not os.path.isdir(entry_dir):
+            print(f"Warning: could not write cache entry {entry_dir}: {e}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    _prune_cache(cache_dir, CACHE_MAX_ENTRIES)
+    return atoms
+
+
+def _prune_cache(cache_dir: str, max_entries: int):
+    """
+    Remove the least recently used cache entries (directory mtime, see _load_or_cache_entry()) beyond max_entries.
+    Left-over temporary directories of crashed runs are entries too and are removed the same way.
+    """
+    try:
+        entries = [e for e in os.scandir(cache_dir) if e.is_dir(follow_symlinks=False)]
+    except OSError:
+        return
+    if len(entries) <= max_entries:
+        return
+    entries.sort(key=lambda e: e.stat(follow_symlinks=False).st_mtime, reverse=True)
+    for e in entries[max_entries:]:
+        shutil.rmtree(e.path, ignore_errors=True)
+
+
+# 2.1, in-process memo of load_representative_atoms() without the disk cache, used by the modules when they are
+# called directly from python (scanning region pairs / chain pairs over the same files in a loop or a notebook)
+def load_representative_atoms_cached(
+        mmcif_file: str,
+        include_nonstandard_residue: bool = False,
+        model_index: int = 0,
+        parser: str = "auto"
+) -> Dict[str, np.ndarray]:
+    """
+    Description
+    -----------
+    Same as load_representative_atoms(), but the last STRUCTURE_MEMO_SIZE tables are kept in memory,
+    so calling a module again on the same (unchanged) file skips mmcif parsing.
+
+    Notes
+    -----
+    - 1, The key is (real path, mtime in ns, file size, include_nonstandard_residue, model_index, parser),
+    like load_or_cache(), so editing or replacing the mmcif file is a new entry.
+    - 2, The returned table is shared between calls and therefore read-only, copy an array before modifying it.
+    - 3, Nothing is written to disk, see load_or_cache() for the persistent cache used by the CLI.
+    """
+
+    st = os.stat(mmcif_file)
+    return _load_representative_atoms_memo(
+        os.path.realpath(mmcif_file), st.st_mtime_ns, st.st_size, bool(include_nonstandard_residue), int(model_index), parser
+    )
+
+
+# number of atom tables kept by load_representative_atoms_cached(), a table is only ~40 bytes per residue
+STRUCTURE_MEMO_SIZE = 16
+
+@lru_cache(maxsize=STRUCTURE_MEMO_SIZE)
+def _load_representative_atoms_memo(mmcif_file, mtime_ns, size, include_nonstandard_residue, model_index, parser):
+    atoms = load_representative_atoms(
+        mmcif_file, include_nonstandard_residue=include_nonstandard_residue, model_index=model_index, parser=parser
+    )
+    for arr in atoms.values():
+        arr.flags.writeable = False
+    return atoms
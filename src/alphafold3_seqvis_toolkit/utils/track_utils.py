@@ -1,6 +1,7 @@
 # the function defined here is modified to support 1D track data visualization alongside 2D matrix
 from typing import Literal, Optional, List, Union, Dict, Any
 import os
+import numpy as np
 import pandas as pd
 from matplotlib.colors import ListedColormap, to_hex
 import matplotlib.pyplot as plt
@@ -34,6 +35,10 @@ def parse_bed_to_track_data(
     ------
     List[Dict[str, Any]]: A list of track data dictionaries for visualization. 
     Each track dictionary corresponds to a unique track in the BED file.
+    Its "track_data" is {chain_id: np.ndarray}, one value per 0-based residue index of the chain (up to the last bed end):
+        - numerical tracks: float64 values, nan where no bed range covers the residue
+        - categorical tracks: integer codes (int8 for < 128 categories) into the sorted "categories" list of the track,
+        -1 where no bed range covers the residue
 
     Notes
     -----
@@ -79,36 +84,43 @@ def parse_bed_to_track_data(
         track_dict = {}
         all_categories = set()
 
+        # categorical values are stored as small integer codes into one sorted category list shared by all chains of the track
+        # (1 byte per residue for < 128 categories instead of an object pointer to a str), -1 where no range covers the residue
+        categories = sorted({str(v) for v in track_df.iloc[:, 4]}) if track_val_type != "numerical" else []
+        cat_to_code = {cat: i for i, cat in enumerate(categories)}
+        code_dtype = np.min_scalar_type(-len(categories))
+
         # Group by Chain ID
         for chain_id, group in track_df.groupby(track_df.columns[0]):
-            # here we use the second strategy
-            chain_vals = {}
-            
-            # note that group is still a dataframe
-            # and for dataframe we iterate rows using iterrows()
-            for _, row in group.iterrows():
-                # note that _ is the index, row is the actual row data, index is useless here
-                start = int(row.iloc[2])
-                end = int(row.iloc[3])
-                raw_val = row.iloc[4]
-
-                # numerical value, like disorder score
-                if track_val_type == "numerical":
-                    # actually float is enough for int values
-                    value = float(raw_val)
-                else:
-                    # str type, categorical value, like hydrophobic, polar, charged
-                    value = str(raw_val)
-                    # NOTE AGAIN HERE! we treat all str values as categorical values
-                    all_categories.add(value)
-
-                # then we fill in the track_dict
-                for i in range(start, end + 1):
-                    # we assume here the bed range is closure [start, end]
-                    chain_vals[i] = value
+            # the bed rows of this chain as columns, all [start, end] ranges are expanded at once instead of residue by residue
+            starts = group.iloc[:, 2].to_numpy(dtype=np.int64)
+            ends = group.iloc[:, 3].to_numpy(dtype=np.int64)
+            values = np.empty(len(group), dtype=object)
+            # numerical value, like disorder score (float is enough for int values)
+            if track_val_type == "numerical":
+                values[:] = [float(v) for v in group.iloc[:, 4]]
+            # str type, categorical value, like hydrophobic, polar, charged
+            # NOTE AGAIN HERE! we treat all str values as categorical values
+            else:
+                str_vals = [str(v) for v in group.iloc[:, 4]]
+                all_categories.update(str_vals)
+                values[:] = [cat_to_code[v] for v in str_vals]
+
+            # one dense array per chain instead of a {residue: value} dict (~8 bytes per residue instead of a dict entry),
+            # indexed by the 0-based residue index of the bed file, nan where no range covers the residue
+            length = max(int(ends.max()) + 1, 0) if len(ends) else 0
+            if track_val_type == "numerical":
+                chain_vals = np.full(length, np.nan, dtype=np.float64)
+            else:
+                chain_vals = np.full(length, -1, dtype=code_dtype)
+            for start, end, value in zip(starts.tolist(), ends.tolist(), values):
+                # we assume here the bed range is closure [start, end], a later row overwrites an earlier overlapping one
+                lo = max(start, 0)
+                if end >= lo:
+                    chain_vals[lo:end + 1] = value
             
             # finally, we add this chain's data to track_dict
-            # Now we have {res: bed value} -> chain_id -> track 
+            # Now we have [bed value per res] -> chain_id -> track 
             track_dict[chain_id] = chain_vals 
         
         # For color settings, we will deal with it further
@@ -147,7 +159,8 @@ def parse_bed_to_track_data(
             "track_name": track_name,
             "track_type": track_val_type,
             "color": final_color,
-            "track_data": track_dict
+            "track_data": track_dict,
+            "categories": categories # code -> category for categorical tracks, empty for numerical ones
         }
 
     # ------- Main Logic: Group by Track Name (Column 1) -------